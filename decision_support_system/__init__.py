@@ -1,2 +1 @@
-from geographic_estimations import *
-from decision_support import *
+from decision_support import DetectionMerger, create_executor, parse_coordinates
@@ -0,0 +1,183 @@
+import copy
+import json
+import os
+import time
+from collections import deque
+
+import decision_support
+import ingest
+
+# JSON files of the sensors of a recorded set, in the order of the sensor paths of the DetectionMerger
+sensor_files = ("On-board_rgb1.json", "On-board_rgb4.json", "On-board_mono.json", "On-board_thermal.json",
+                "On-board_swir.json", "UAV.json")
+# JSON file with the train's GPS fixes of a recorded set, e.g.
+#   {"train_current": "53.0861622, 8.7816742", "train_prev": "53.086040, 8.781514"}
+train_file = "train.json"
+output_formats = ("jsonl", "parquet")
+
+
+def is_set_directory(directory):
+    """Returns whether the directory holds the JSON files of all sensors of a recorded set."""
+    return all(os.path.isfile(os.path.join(directory, name)) for name in sensor_files)
+
+
+def find_sets(root):
+    """
+    Returns the directories of the recorded sets in the given root directory, in sorted order. The root directory is
+    returned itself if it is a recorded set.
+    """
+    if is_set_directory(root):
+        return [root]
+    directories = (os.path.join(root, name) for name in sorted(os.listdir(root)))
+    return [directory for directory in directories if os.path.isdir(directory) and is_set_directory(directory)]
+
+
+def read_train_positions(directory, train_current=None, train_prev=None):
+    """
+    Returns the train's current and previous position of a recorded set from its train file, or the given positions
+    if the set has no train file.
+    """
+    path = os.path.join(directory, train_file)
+    if os.path.isfile(path):
+        positions = decision_support.read_json(path)
+        train_current, train_prev = positions["train_current"], positions.get("train_prev")
+    if train_current is None or train_prev is None:
+        raise ValueError(f"No train positions for the set {directory}, expected them in its {train_file}")
+    return train_current, train_prev
+
+
+def merge_set(merger, directory, train_current=None, train_prev=None):
+    """
+    Merge set
+
+    This function reads the sensor files of one recorded set and merges its detections with a copy of the merger's
+    configuration, so that sets can be merged concurrently. The time spent reading and merging the set is measured.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is used to merge the set.
+    directory (str): The directory of the set.
+    train_current (str or tuple): The current position of the train if the set has no train file.
+    train_prev (str or tuple): The previous position of the train if the set has no train file.
+
+    Returns:
+    dict: The result record of the set, with its name, the train's current position, the merged detections and the
+    timing of the set.
+    """
+    start = time.perf_counter()
+    train_current, train_prev = read_train_positions(directory, train_current, train_prev)
+    sensor_data = [ingest.read_sensor(os.path.join(directory, name)) for name in sensor_files]
+    read_time = time.perf_counter()
+    merger = copy.copy(merger)
+    results = merger.merge_frame(sensor_data, train_current, train_prev)
+    merge_time = time.perf_counter()
+    return {"set": os.path.basename(os.path.normpath(directory)), "train_current": merger.train_current,
+            "results": results,
+            "timing": {"detections": len(merger.detections), "results": len(results),
+                       "read_s": read_time - start, "merge_s": merge_time - read_time}}
+
+
+def merge_sets(merger, directories, executor=None, train_current=None, train_prev=None, read_ahead=16):
+    """
+    Merge sets
+
+    This function merges the recorded sets in the given directories and yields the result record of each set in the
+    order of the directories. If an executor is given, the sets are read and merged concurrently on its workers, each
+    set with its own copy of the merger's configuration. At most read_ahead sets are merged ahead of the set whose
+    result is yielded next, so the memory held by pending sets is bounded however many sets there are.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is used to merge the sets.
+    directories (list): The directories of the sets.
+    executor (Executor): Thread or process pool used to merge the sets concurrently.
+    train_current (str or tuple): The current position of the train for sets without train file.
+    train_prev (str or tuple): The previous position of the train for sets without train file.
+    read_ahead (int): The maximum number of sets being merged at the same time.
+
+    Returns:
+    generator: The result records of the sets.
+    """
+    if executor is None:
+        for directory in directories:
+            yield merge_set(merger, directory, train_current, train_prev)
+        return
+    pending = deque()
+    for directory in directories:
+        pending.append(executor.submit(merge_set, merger, directory, train_current, train_prev))
+        if len(pending) >= read_ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def write_jsonl(records, path):
+    """Writes the sets' merged detections as one line of JSON per set and returns the timing of each set."""
+    timings = []
+    with open(path, "w") as f:
+        for record in records:
+            record = dict(record)
+            timings.append({"set": record["set"], **record.pop("timing")})
+            f.write(json.dumps(record) + "\n")
+    return timings
+
+
+def write_parquet(records, path):
+    """
+    Writes the merged detections of all sets into a Parquet file with one row per detection, with the columns set,
+    objectclass, latitude and longitude, and returns the timing of each set. Requires pyarrow.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Writing Parquet files requires pyarrow, install it with 'pip install pyarrow'")
+    timings = []
+    columns = {"set": [], "objectclass": [], "latitude": [], "longitude": []}
+    for record in records:
+        timings.append({"set": record["set"], **record["timing"]})
+        for result in record["results"]:
+            for objectclass, (latitude, longitude) in result.items():
+                columns["set"].append(record["set"])
+                columns["objectclass"].append(objectclass)
+                columns["latitude"].append(latitude)
+                columns["longitude"].append(longitude)
+    pyarrow.parquet.write_table(pyarrow.table(columns), path)
+    return timings
+
+
+def run_batch(merger, root, output_file, timing_file=None, output_format=None, executor=None, train_current=None,
+              train_prev=None, read_ahead=16):
+    """
+    Run batch
+
+    This function replays all recorded sets in a root directory with one DetectionMerger configuration in a single
+    process, optionally on a pool of workers, and writes the merged detections of all sets into one results file. The
+    time spent reading and merging each set and the total time are written to the timing file as JSON.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is used to merge the sets.
+    root (str): The root directory of the sets, see find_sets.
+    output_file (str): Path of the results file.
+    timing_file (str): Path of the timing file; Default is the results file with the extension .timing.json.
+    output_format (str): One of output_formats; Default is parquet if the results file ends with .parquet, else jsonl.
+    executor (Executor): Thread or process pool used to merge the sets concurrently.
+    train_current (str or tuple): The current position of the train for sets without train file.
+    train_prev (str or tuple): The previous position of the train for sets without train file.
+    read_ahead (int): The maximum number of sets being merged at the same time, see merge_sets.
+
+    Returns:
+    list: The timing of each set.
+    """
+    if output_format is None:
+        output_format = "parquet" if output_file.endswith(".parquet") else "jsonl"
+    if output_format not in output_formats:
+        raise ValueError(f"Unknown output format '{output_format}', expected one of {output_formats}")
+    if timing_file is None:
+        timing_file = os.path.splitext(output_file)[0] + ".timing.json"
+    directories = find_sets(root)
+    start = time.perf_counter()
+    records = merge_sets(merger, directories, executor, train_current, train_prev, read_ahead)
+    write = write_parquet if output_format == "parquet" else write_jsonl
+    timings = write(records, output_file)
+    with open(timing_file, "w") as f:
+        json.dump({"sets": len(timings), "total_s": time.perf_counter() - start, "timing": timings}, f, indent=2)
+    return timings
@@ -0,0 +1,93 @@
+#!/usr/bin/python3
+"""
+Benchmark of the grouping of similar detections by angle.
+
+Times DetectionMerger.group_similar_detections_by_angle against the previous implementation, which scanned every range
+for every detection and dropped the detections at the end of the last range, and checks that both agree where the
+previous one kept all detections and that every detection is in exactly one group, within the range of its key. The
+degenerate cases are checked by tests/test_angle_groups.py.
+
+    python3 decision_support_system/benchmarks/bench_angle_groups.py --detections 2000 --angle_threshold 1
+"""
+import os
+import sys
+import argparse
+import random
+import time
+from collections import defaultdict
+from math import ceil
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import detection_table
+
+
+def reference_group_by_angle(angle_threshold, similar_detections_dict, zone_detections):
+    bearings = zone_detections.relative_bearing.tolist()
+    grouped_dict = defaultdict(list)
+    for objectclass, detections in similar_detections_dict.items():
+        min_bearing = min(bearings[d] for d in detections)
+        max_bearing = max(bearings[d] for d in detections)
+        num_ranges = ceil((max_bearing - min_bearing) / angle_threshold)
+        for d in detections:
+            for i in range(num_ranges):
+                range_start = min_bearing + i * angle_threshold
+                range_end = range_start + angle_threshold
+                if range_start <= bearings[d] < range_end:
+                    grouped_dict[(range_start, range_end)].append(d)
+    return grouped_dict
+
+
+def group(merger, bearings, objectclasses=None):
+    objectclasses = [0] * len(bearings) if objectclasses is None else objectclasses
+    table = detection_table.DetectionTable(objectclass=objectclasses, relative_bearing=bearings)
+    similar_detections = {}
+    for index, objectclass in enumerate(objectclasses):
+        similar_detections.setdefault(objectclass, []).append(index)
+    return table, similar_detections, merger.group_similar_detections_by_angle(similar_detections, table)
+
+
+def check_groups(table, groups):
+    """Returns whether every detection is in exactly one group and within the range of the group's key."""
+    grouped = sorted(index for indices in groups.values() for index in indices)
+    within = all(start <= table.relative_bearing[index] < end for (start, end), indices in groups.items()
+                 for index in indices)
+    return grouped == list(range(len(table))) and within
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the grouping of similar detections by angle')
+    parser.add_argument('--detections', help='Number of similar detections', type=int, default=2000)
+    parser.add_argument('--classes', help='Number of object classes', type=int, default=4)
+    parser.add_argument('--angle_threshold', help='Width of the angle ranges in degrees', type=float, default=1)
+    parser.add_argument('--seed', help='Seed of the random angles', type=int, default=0)
+    args = parser.parse_args()
+
+    merger = decision_support.DetectionMerger()
+    merger.angle_threshold = args.angle_threshold
+    rng = random.Random(args.seed)
+    bearings = [rng.uniform(-90, 90) for _ in range(args.detections)]
+    objectclasses = [rng.randrange(args.classes) for _ in range(args.detections)]
+    table, similar_detections, _ = group(merger, bearings, objectclasses)
+    start = time.perf_counter()
+    reference = reference_group_by_angle(args.angle_threshold, similar_detections, table)
+    reference_time = time.perf_counter() - start
+    start = time.perf_counter()
+    groups = merger.group_similar_detections_by_angle(similar_detections, table)
+    elapsed = time.perf_counter() - start
+    # the previous implementation drops the detections at the maximum angle of each class
+    dropped = args.detections - sum(map(len, reference.values()))
+    kept = {key: [index for index in indices if any(index in group for group in reference.values())]
+            for key, indices in groups.items()}
+    agree = {key: indices for key, indices in kept.items() if indices} == dict(reference)
+    print(f"{args.detections} detections: scan {reference_time * 1e3:8.2f} ms, direct {elapsed * 1e3:8.2f} ms, "
+          f"speedup {reference_time / elapsed:6.1f}x; scan dropped {dropped}, agree otherwise: {agree}; "
+          f"all grouped: {check_groups(table, groups)}")
+    passed = agree and check_groups(table, groups)
+    print("all checks passed" if passed else "CHECKS FAILED")
+    return 0 if passed else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,156 @@
+#!/usr/bin/python3
+"""
+Benchmark of the COCO annotation pipeline of geographic_estimations.
+
+Builds a synthetic COCO dataset with random bounding boxes and estimates the coordinates of all annotations with
+prepare_annotations, append_detection_angles, append_detection_coordinates and format_annotations, once with the
+previous per-annotation loops (on the first --reference_annotations annotations only, because the previous
+prepare_annotations scans all images for every annotation), once with the indexed and vectorized functions on the
+loaded dataset and once streamed from the JSON file with coco.stream_annotation_coordinates. Reports the time and the
+peak memory of each and checks that the coordinates agree.
+
+    python3 decision_support_system/benchmarks/bench_annotations.py --annotations 100000 --images 2000
+"""
+import os
+import sys
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geographic_estimations.geographic_estimations as geographic_estimations
+import geographic_estimations.coco as coco
+
+train_coordinates = (53.0861622, 8.7816742)
+train_bearing = 143.5
+
+
+def reference_pipeline(data, detections):
+    annotations = []
+    for annotation in data['annotations']:
+        for image in data['images']:
+            if annotation['image_id'] == image['id']:
+                image_height = image['height']
+                image_width = image['width']
+        annotations.append({'id': annotation['id'], 'bbox': annotation['bbox'], 'image_id': annotation['image_id'],
+                            'category_id': annotation['category_id'], 'image_height': image_height,
+                            'image_width': image_width})
+    for annotation in annotations:
+        left, bottom, right, top = annotation['bbox']
+        x = (left + right) / 2 - annotation["image_width"] / 2
+        y = annotation["image_height"] - bottom
+        annotation['detection_bearing'] = geographic_estimations.get_angle_to_detected_obj(x, y) + train_bearing
+    for annotation, detection in zip(annotations, detections):
+        annotation['coordinates'] = geographic_estimations.calculate_destination_coordinates(
+            train_coordinates, detection["distance"], annotation["detection_bearing"])
+    for annotation in annotations:
+        annotation['object_class'] = geographic_estimations.categories[annotation["category_id"] - 1]
+        for key in ("bbox", "image_id", "image_height", "image_width", "detection_bearing", "category_id"):
+            annotation.pop(key)
+    return annotations
+
+
+def indexed_pipeline(path, detections):
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    annotations = geographic_estimations.prepare_annotations(data)
+    geographic_estimations.append_detection_angles(annotations, train_bearing)
+    geographic_estimations.append_detection_coordinates(annotations, detections, train_coordinates)
+    return geographic_estimations.format_annotations(annotations)
+
+
+def streaming_pipeline(path, detections, chunk_size):
+    # the results are consumed one by one like by a writer of the results, only their number is kept
+    count = 0
+    for _ in coco.stream_annotation_coordinates(path, detections, train_coordinates, train_bearing, chunk_size):
+        count += 1
+    return count
+
+
+def generate_dataset(annotations, images, seed):
+    rng = random.Random(seed)
+    image_data = [{"id": image_id, "file_name": f"{image_id:06d}.png", "height": 1349, "width": 2495}
+                  for image_id in range(1, images + 1)]
+    annotation_data = []
+    for annotation_id in range(1, annotations + 1):
+        left = rng.randint(0, 2400)
+        bottom = rng.randint(100, 1300)
+        annotation_data.append({"id": annotation_id, "image_id": rng.randint(1, images),
+                                "category_id": rng.randint(1, len(geographic_estimations.categories)),
+                                "bbox": [left, bottom, left + rng.randint(5, 95), bottom - rng.randint(5, 95)],
+                                "area": 100, "iscrowd": 0})
+    detections = [{"distance": rng.uniform(5, 1000)} for _ in range(annotations)]
+    return {"info": {"description": "synthetic"}, "images": image_data, "annotations": annotation_data,
+            "categories": [{"id": index, "name": name}
+                           for index, name in enumerate(geographic_estimations.categories, 1)]}, detections
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def peak_memory(function, *args):
+    tracemalloc.start()
+    function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def coordinates_of(annotations):
+    return np.array([annotation["coordinates"] for annotation in annotations])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the COCO annotation pipeline')
+    parser.add_argument('--annotations', help='Number of annotations', type=int, default=100000)
+    parser.add_argument('--images', help='Number of images', type=int, default=2000)
+    parser.add_argument('--reference_annotations', help='Number of annotations of the previous loops', type=int,
+                        default=5000)
+    parser.add_argument('--chunk_size', help='Number of annotations processed at once when streaming', type=int,
+                        default=4096)
+    parser.add_argument('--seed', help='Seed of the random dataset', type=int, default=0)
+    args = parser.parse_args()
+
+    data, detections = generate_dataset(args.annotations, args.images, args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "annotations.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        print(f"{args.annotations} annotations of {args.images} images, {os.path.getsize(path) / 1e6:.1f} MB JSON")
+
+        subset = dict(data, annotations=data["annotations"][:args.reference_annotations])
+        reference, reference_time = timed(reference_pipeline, subset, detections)
+        reference_time *= args.annotations / len(subset["annotations"])
+        indexed, indexed_time = timed(indexed_pipeline, path, detections)
+        streamed = list(coco.stream_annotation_coordinates(path, detections, train_coordinates, train_bearing,
+                                                           args.chunk_size))
+        _, streaming_time = timed(streaming_pipeline, path, detections, args.chunk_size)
+        del data
+
+        indexed_peak = peak_memory(indexed_pipeline, path, detections)
+        streaming_peak = peak_memory(streaming_pipeline, path, detections, args.chunk_size)
+
+    print(f"{'loops':18s} {reference_time:8.3f} s (extrapolated from {len(reference)} annotations)")
+    print(f"{'indexed':18s} {indexed_time:8.3f} s  speedup {reference_time / indexed_time:8.1f}x  "
+          f"peak {indexed_peak / 1e6:8.1f} MB")
+    print(f"{'streaming':18s} {streaming_time:8.3f} s  speedup {reference_time / streaming_time:8.1f}x  "
+          f"peak {streaming_peak / 1e6:8.1f} MB")
+    difference = np.abs(coordinates_of(indexed[:len(reference)]) - coordinates_of(reference)).max()
+    same_records = [[(annotation["id"], annotation["object_class"]) for annotation in annotations]
+                    for annotations in (indexed[:len(reference)], reference)]
+    print(f"indexed and loops: max difference {difference:.2e} degrees, "
+          f"same ids and classes: {same_records[0] == same_records[1]}")
+    print(f"indexed and streaming identical: {indexed == streamed}")
+
+
+if __name__ == '__main__':
+    main()
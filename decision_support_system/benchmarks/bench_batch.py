@@ -0,0 +1,64 @@
+#!/usr/bin/python3
+"""
+Benchmark of the batch replay.
+
+Copies the recorded sensor set into a number of set directories and compares the wall clock of starting one run_dss.py
+process per set, which pays the interpreter start and the imports for every set, against replaying all sets in one
+run_dss.py --batch process. The results of every set in batch mode are checked against the per-set runs.
+
+    python3 decision_support_system/benchmarks/bench_batch.py --sets 20 --workers 0 2
+"""
+import os
+import sys
+import argparse
+import json
+import shutil
+import subprocess
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import batch
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "data", "set_2")
+run_dss = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "run_dss.py")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batch replay')
+    parser.add_argument('--sets', help='Number of recorded sets', type=int, default=20)
+    parser.add_argument('--workers', help='Numbers of workers of the batch mode', type=int, nargs='+', default=[0])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        for index in range(args.sets):
+            shutil.copytree(data_dir, os.path.join(root, "sets", f"set_{index:04d}"))
+        directories = batch.find_sets(os.path.join(root, "sets"))
+
+        start = time.perf_counter()
+        expected = []
+        for index, directory in enumerate(directories):
+            positions = batch.read_train_positions(directory)
+            output_file = os.path.join(root, f"results_{index}.json")
+            subprocess.run([sys.executable, run_dss, *[os.path.join(directory, name) for name in batch.sensor_files],
+                            *positions, "--output_file", output_file], check=True)
+            with open(output_file) as f:
+                expected.append(json.load(f))
+        elapsed = time.perf_counter() - start
+        print(f"process per set: {elapsed:.3f}s, {elapsed / len(directories) * 1e3:.1f} ms/set")
+
+        for workers in args.workers:
+            output_file = os.path.join(root, f"results_{workers}.jsonl")
+            start = time.perf_counter()
+            subprocess.run([sys.executable, run_dss, "--batch", os.path.join(root, "sets"), "--output_file",
+                            output_file, "--workers", str(workers)], check=True)
+            elapsed = time.perf_counter() - start
+            with open(output_file) as f:
+                matches = [json.loads(line)["results"] for line in f] == expected
+            print(f"batch, {workers} workers: {elapsed:.3f}s, {elapsed / len(directories) * 1e3:.1f} ms/set, "
+                  f"results match: {matches}")
+
+
+if __name__ == '__main__':
+    main()
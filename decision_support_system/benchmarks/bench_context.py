@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""
+Benchmark of the per-frame geodetic context.
+
+Estimates the coordinates and bearings of the detections of synthetic frames image by image, once computing the heading
+and trigonometry of the train's position for every image as before and once sharing a GeodeticContext over the frame,
+and checks that both give exactly the same coordinates and bearings.
+
+    python3 decision_support_system/benchmarks/bench_context.py --frames 500 --objects 50
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ingest
+import synthetic
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+
+def estimate(frames, shared):
+    results = []
+    start = time.perf_counter()
+    for train_current, train_prev, sensors in frames:
+        context = geographic_estimations.GeodeticContext(train_current, train_prev) if shared else None
+        for sensor in sensors:
+            table = sensor.table
+            coordinates = geographic_estimations.calculate_coordinates_from_image_boxes(
+                table.x_min, table.x_max, table.y_max, table.distance, sensor.imagesize, train_current, train_prev,
+                context)
+            if shared:
+                bearings = context.bearings(coordinates)
+            else:
+                bearings = geographic_estimations.calculate_compass_bearings(train_current, coordinates)
+            results.append((coordinates, bearings))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the per-frame geodetic context')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=500)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--repeat', help='Number of repetitions, the best time is reported', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = []
+    for frame in synthetic.FrameGenerator(objects=args.objects).generate_frames(args.frames):
+        sensors = [ingest.as_sensor_record(sensor) for sensor in frame["sensors"] if sensor["camera"] != "UAV"]
+        frames.append((tuple(frame["train_current"]), tuple(frame["train_prev"]),
+                       [sensor for sensor in sensors if len(sensor.table)]))
+
+    best = {}
+    results = {}
+    for _ in range(args.repeat):
+        for name, shared in (("per image", False), ("shared context", True)):
+            results[name], elapsed = estimate(frames, shared)
+            best[name] = min(best.get(name, float("inf")), elapsed)
+    equal = all(np.array_equal(a[0], b[0]) and np.array_equal(a[1], b[1])
+                for a, b in zip(results["per image"], results["shared context"]))
+    for name, elapsed in best.items():
+        print(f"{name:16s} {elapsed / args.frames * 1e6:8.1f} us/frame  speedup {best['per image'] / elapsed:5.2f}x")
+    print(f"results identical: {equal}")
+
+
+if __name__ == '__main__':
+    main()
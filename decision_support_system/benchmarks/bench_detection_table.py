@@ -0,0 +1,75 @@
+#!/usr/bin/python3
+"""
+Benchmark of the memory used per detection.
+
+Compares the memory of detections kept as the JSON dictionaries of the sensor data, with the fields added by the
+previous pipeline (estimated_coordinates, relative_bearing, camera), against the columns of a DetectionTable, and the
+time to parse the string encoded numbers once into the table.
+
+    python3 decision_support_system/benchmarks/bench_detection_table.py --detections 100000
+"""
+import os
+import sys
+import argparse
+import json
+import random
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import detection_table
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+
+def generate_sensor_json(num_detections, seed=0):
+    """Generates the JSON text of an on-board sensor with the given number of detections."""
+    rng = random.Random(seed)
+    objects = []
+    for _ in range(num_detections):
+        x_min = rng.uniform(0, 2400)
+        y_min = rng.uniform(0, 1300)
+        objects.append({"objectclass": rng.choice(geographic_estimations.categories),
+                        "x_min": str(round(x_min, 4)), "y_min": str(round(y_min, 4)),
+                        "x_max": str(round(x_min + 50, 4)), "y_max": str(round(y_min + 40, 4)),
+                        "height": "40.0", "width": "50.0", "confidence": str(round(rng.random(), 3)),
+                        "distance": str(round(rng.uniform(1, 2000), 1)), "entering_ROI": True, "moving": False,
+                        "actual_coordinates": "(53.086364, 8.781687)"})
+    return json.dumps({"sensorId": "onboard", "camera": "RGB1",
+                       "imagesize": {"image_height": 1349, "image_width": 2495}, "objects": objects})
+
+
+def measure(function):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+
+def dict_detections(text):
+    sensor = json.loads(text)
+    for detection in sensor["objects"]:
+        detection["estimated_coordinates"] = (53.0, 8.0)
+        detection["relative_bearing"] = 0.0
+        detection["camera"] = sensor["camera"]
+    return sensor
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the memory used per detection')
+    parser.add_argument('--detections', help='Number of detections', type=int, default=100000)
+    args = parser.parse_args()
+
+    text = generate_sensor_json(args.detections)
+    sensor, dict_size, dict_time = measure(lambda: dict_detections(text))
+    table, _, table_time = measure(lambda: detection_table.DetectionTable.from_onboard_sensor(sensor))
+    print(f"dictionaries: {dict_size / args.detections:8.1f} bytes/detection (json.loads {dict_time:.3f}s)")
+    print(f"table:        {table.nbytes / args.detections:8.1f} bytes/detection (parse {table_time:.3f}s)")
+    print(f"reduction:    {dict_size / table.nbytes:8.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/python3
+"""
+Benchmark of the distance methods in geographic_estimations.
+
+Times calculate_distance and calculate_distances for every distance method on pairs of coordinates within the 0-2 km
+ranges of the DSS zones and reports the error of each method against the geodesic distance.
+
+    python3 decision_support_system/benchmarks/bench_distance.py --size 20000
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+train_current = (53.0861622, 8.7816742)
+
+
+def random_coordinates(rng, size):
+    return geographic_estimations.calculate_destinations(train_current, rng.uniform(0, 2000, size),
+                                                         rng.uniform(0, 360, size))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the distance methods')
+    parser.add_argument('--size', help='Number of coordinate pairs', type=int, default=20000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    coordinates_1 = random_coordinates(rng, args.size)
+    # half of the pairs are far apart, the other half are within the 20 m merge threshold
+    half = args.size // 2
+    close_coordinates = geographic_estimations.calculate_destinations(
+        coordinates_1[half:], rng.uniform(0, 20, args.size - half), rng.uniform(0, 360, args.size - half))
+    coordinates_2 = np.concatenate((random_coordinates(rng, half), close_coordinates))
+    pairs = list(zip(map(tuple, coordinates_1.tolist()), map(tuple, coordinates_2.tolist())))
+    reference = np.array([geographic_estimations.calculate_distance(a, b) for a, b in pairs])
+
+    print(f"{'method':>16} {'scalar [us]':>12} {'speedup':>8} {'array [us]':>11} {'max error [m]':>14} "
+          f"{'max rel error':>14}")
+    geodesic_time = None
+    for method in geographic_estimations.distance_methods:
+        start = time.perf_counter()
+        distances = [geographic_estimations.calculate_distance(a, b, method, train_current) for a, b in pairs]
+        scalar_time = (time.perf_counter() - start) / len(pairs)
+        start = time.perf_counter()
+        geographic_estimations.calculate_distances(coordinates_1, coordinates_2, method, train_current)
+        array_time = (time.perf_counter() - start) / len(pairs)
+        geodesic_time = geodesic_time or scalar_time
+        error = np.abs(np.array(distances) - reference)
+        print(f"{method:>16} {scalar_time * 1e6:>12.2f} {geodesic_time / scalar_time:>8.1f} {array_time * 1e6:>11.3f} "
+              f"{error.max():>14.4f} {(error / np.maximum(reference, 1e-9)).max():>14.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/python3
+"""
+Benchmark of DetectionMerger.find_similar_detections.
+
+Generates zones with a growing number of synthetic detections at a constant density of obstacles along the track and
+times merging the zone with the grid based search against the previous all-pairs search over detection dictionaries.
+For the sizes where the all-pairs search is still feasible, the merged results of both are compared.
+
+    python3 decision_support_system/benchmarks/bench_find_similar.py --sizes 100 1000 10000
+"""
+import os
+import sys
+import argparse
+import copy
+import math
+import itertools
+import random
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import detection_table
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+train_current = (53.0861622, 8.7816742)
+train_prev = (53.086040, 8.781514)
+cameras = ["RGB1", "RGB4", "Monochrome", "Thermal", "SWIR", "UAV"]
+# number of obstacles per square kilometer
+obstacle_density = 2000
+
+
+def generate_zone_detections(num_detections, seed=0):
+    """Generates detections of obstacles seen by one to three sensors with a few meters of estimation noise."""
+    rng = random.Random(seed)
+    detections = []
+    side = (num_detections / 2 / obstacle_density) ** 0.5 * 1000
+    while len(detections) < num_detections:
+        objectclass = rng.choice(geographic_estimations.categories)
+        north = rng.uniform(0, side)
+        east = rng.uniform(-side / 2, side / 2)
+        for camera in rng.sample(cameras, rng.randint(1, 3)):
+            distance = ((north + rng.gauss(0, 3)) ** 2 + (east + rng.gauss(0, 3)) ** 2) ** 0.5
+            bearing = (geographic_estimations.calculate_compass_bearing(train_prev, train_current)
+                       + math.degrees(math.atan2(east, north)))
+            coordinates = geographic_estimations.calculate_destination_coordinates(train_current, distance, bearing)
+            relative_bearing = geographic_estimations.calculate_compass_bearing(train_current, coordinates)
+            detections.append({"objectclass": objectclass,
+                               "camera": camera,
+                               "distance": distance,
+                               "estimated_coordinates": coordinates,
+                               "relative_bearing": relative_bearing if relative_bearing < 180
+                               else relative_bearing - 360})
+    return detections[:num_detections]
+
+
+def create_table(detections):
+    """Creates a detection table from detection dictionaries."""
+    return detection_table.DetectionTable(
+        objectclass=[detection_table.object_classes.code(d["objectclass"]) for d in detections],
+        camera=[detection_table.cameras.code(d["camera"]) for d in detections],
+        distance=[d["distance"] for d in detections],
+        latitude=[d["estimated_coordinates"][0] for d in detections],
+        longitude=[d["estimated_coordinates"][1] for d in detections],
+        relative_bearing=[d["relative_bearing"] for d in detections])
+
+
+def merge_zone_all_pairs(merger, zone_detections, zone_id):
+    """The previous implementation of merging a zone, comparing every possible pair of detection dictionaries."""
+    similar_detections = {}
+    for a, b in itertools.combinations(zone_detections, 2):
+        if not a['camera'] == b["camera"]:
+            if a["objectclass"] == b["objectclass"]:
+                gap = geographic_estimations.calculate_distance(a["estimated_coordinates"],
+                                                                b["estimated_coordinates"])
+                angle_dif = abs(a["relative_bearing"] - b["relative_bearing"])
+                if gap < merger.distance_threshold:
+                    if angle_dif < merger.angle_threshold:
+                        objectclass = a["objectclass"]
+                        if objectclass not in similar_detections.keys():
+                            similar_detections[objectclass] = []
+                        if a not in similar_detections[objectclass]:
+                            similar_detections[objectclass].append(a)
+                            zone_detections.remove(a)
+                        if b not in similar_detections[objectclass]:
+                            similar_detections[objectclass].append(b)
+                            zone_detections.remove(b)
+    merged = []
+    grouped_dict = defaultdict(list)
+    for objectclass, detections in similar_detections.items():
+        min_bearing = min(d['relative_bearing'] for d in detections)
+        max_bearing = max(d['relative_bearing'] for d in detections)
+        num_ranges = math.ceil((max_bearing - min_bearing) / merger.angle_threshold)
+        for d in detections:
+            for i in range(num_ranges):
+                range_start = min_bearing + i * merger.angle_threshold
+                range_end = range_start + merger.angle_threshold
+                if range_start <= d['relative_bearing'] < range_end:
+                    grouped_dict[(range_start, range_end)].append(d)
+    for angle_range, detections in grouped_dict.items():
+        accumulated_weight = 0
+        latitude = 0
+        longitude = 0
+        objectclass = None
+        for det in detections:
+            objectclass = det["objectclass"]
+            weight = merger.weights[det["camera"]][zone_id - 1]
+            latitude = latitude + det["estimated_coordinates"][0] * weight
+            longitude = longitude + det["estimated_coordinates"][1] * weight
+            accumulated_weight += weight
+        merged.append({objectclass: (latitude / accumulated_weight, longitude / accumulated_weight)})
+    return merged + [{d["objectclass"]: d["estimated_coordinates"]} for d in zone_detections]
+
+
+def create_merger(clustering="angle"):
+    return decision_support.DetectionMerger(train_current=train_current, train_prev=train_prev, clustering=clustering)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the search for similar detections within a zone')
+    parser.add_argument('--sizes', help='Numbers of detections in the zone', type=int, nargs='+',
+                        default=[100, 300, 1000, 3000, 10000])
+    parser.add_argument('--max_all_pairs', help='Largest zone for which the all-pairs search is run', type=int,
+                        default=1000)
+    parser.add_argument('--clustering', help='Strategy to cluster similar detections into groups', default="angle",
+                        choices=decision_support.clustering_strategies)
+    args = parser.parse_args()
+
+    print(f"{'detections':>10} {'grid [s]':>10} {'us/det':>8} {'all-pairs [s]':>14} {'match':>6}")
+    for size in args.sizes:
+        detections = generate_zone_detections(size)
+        merger = create_merger(args.clustering)
+        zone_detections = create_table(detections)
+        start = time.perf_counter()
+        grid_results = merger.merge_zone(1, zone_detections)
+        grid_time = time.perf_counter() - start
+        all_pairs_time, match = float("nan"), "-"
+        if size <= args.max_all_pairs and args.clustering == "angle":
+            start = time.perf_counter()
+            all_pairs_results = merge_zone_all_pairs(create_merger(), copy.deepcopy(detections), 1)
+            all_pairs_time = time.perf_counter() - start
+            match = "yes" if grid_results == all_pairs_results else "NO"
+        print(f"{size:>10} {grid_time:>10.4f} {grid_time / size * 1e6:>8.1f} {all_pairs_time:>14.4f} {match:>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+#!/usr/bin/python3
+"""
+Benchmark of the array geodesy kernels in geographic_estimations.
+
+Times the array kernels against per-detection loops over the previous math based scalar functions and checks that both
+agree to within 1e-9 degrees (and 1 mm for distances).
+
+    python3 decision_support_system/benchmarks/bench_geodesy.py --size 100000
+"""
+import os
+import sys
+import argparse
+import math
+import time
+
+import geopy.distance
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+train_current = (53.0861622, 8.7816742)
+train_prev = (53.086040, 8.781514)
+im_size = {"image_height": 1349, "image_width": 2495}
+
+
+def reference_compass_bearing(start_point, end_point):
+    start_latitude = math.radians(start_point[0])
+    end_latitude = math.radians(end_point[0])
+    delta_longitude = math.radians(end_point[1] - start_point[1])
+    x = math.sin(delta_longitude) * math.cos(end_latitude)
+    y = math.cos(start_latitude) * math.sin(end_latitude) - (math.sin(start_latitude) * math.cos(end_latitude)
+                                                             * math.cos(delta_longitude))
+    return (math.degrees(math.atan2(x, y)) + 360) % 360
+
+
+def reference_destination_coordinates(starting_point, distance, angle):
+    earth_radius = 6372795.477598
+    start_lat = math.radians(starting_point[0])
+    start_long = math.radians(starting_point[1])
+    angle = math.radians(angle)
+    delta = distance / earth_radius
+    des_lat = math.asin((math.sin(start_lat) * math.cos(delta)) + (math.cos(start_lat) * math.sin(delta)
+                                                                   * math.cos(angle)))
+    des_long = start_long + math.atan2(math.sin(angle) * math.sin(delta) * math.cos(start_lat),
+                                       math.cos(delta) - math.sin(start_lat) * math.sin(des_lat))
+    return math.degrees(des_lat), math.degrees(des_long)
+
+
+def reference_coordinates_from_image_data(x_min, x_max, y_max, distance):
+    x = ((int(x_min) + int(x_max)) / 2) - (im_size["image_width"] / 2)
+    y = im_size["image_height"] - int(y_max)
+    angle = math.degrees(math.atan(x / y)) + reference_compass_bearing(train_prev, train_current)
+    return reference_destination_coordinates(train_current, distance, angle)
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark and check the array geodesy kernels')
+    parser.add_argument('--size', help='Number of detections', type=int, default=100000)
+    parser.add_argument('--distance_size', help='Number of detections for the geopy distance loop', type=int,
+                        default=10000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    x_min = rng.integers(0, im_size["image_width"] - 100, args.size).astype(float)
+    x_max = x_min + rng.integers(1, 100, args.size)
+    y_max = rng.integers(0, im_size["image_height"] - 1, args.size).astype(float)
+    distances = rng.uniform(1, 2000, args.size)
+
+    loop_time, expected = timed(lambda: np.array([reference_coordinates_from_image_data(*row) for row in zip(
+        x_min.tolist(), x_max.tolist(), y_max.tolist(), distances.tolist())]))
+    array_time, coordinates = timed(geographic_estimations.calculate_coordinates_from_image_boxes, x_min, x_max,
+                                    y_max, distances, im_size, train_current, train_prev)
+    error = np.abs(coordinates - expected).max()
+    print(f"coordinates: loop {loop_time:.4f}s, array {array_time:.4f}s, max error {error:.2e} deg")
+    assert error < 1e-9
+
+    loop_time, expected = timed(lambda: np.array([reference_compass_bearing(train_current, c)
+                                                  for c in coordinates.tolist()]))
+    array_time, bearings = timed(geographic_estimations.calculate_compass_bearings, train_current, coordinates)
+    error = np.abs(bearings - expected).max()
+    print(f"bearings:    loop {loop_time:.4f}s, array {array_time:.4f}s, max error {error:.2e} deg")
+    assert error < 1e-9
+
+    subset = coordinates[:args.distance_size]
+    loop_time, expected = timed(lambda: np.array([geopy.distance.distance(train_current, c).m
+                                                  for c in subset.tolist()]))
+    array_time, gaps = timed(geographic_estimations.calculate_distances, train_current, subset)
+    error = np.abs(gaps - expected).max()
+    print(f"distances:   loop {loop_time:.4f}s, array {array_time:.4f}s, max error {error:.2e} m "
+          f"({len(subset)} detections)")
+    assert error < 1e-3
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+#!/usr/bin/python3
+"""
+Benchmark of the JSON ingestion of the sensor data.
+
+Compares the time to decode the JSON text of a sensor into a DetectionTable with the standard library json module and
+the float() conversion of every field, against orjson and the typed decoding of msgspec, which converts the string
+encoded numbers while decoding. Only the installed decoders are measured, and the tables of all decoders are checked to
+be equal.
+
+    python3 decision_support_system/benchmarks/bench_ingest.py --detections 10000 100000
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import detection_table
+import ingest
+from bench_detection_table import generate_sensor_json
+
+
+def best_time(function, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the JSON ingestion of the sensor data')
+    parser.add_argument('--detections', help='Numbers of detections of the sensor', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', help='Number of repetitions, the best time is reported', type=int, default=5)
+    args = parser.parse_args()
+
+    for num_detections in args.detections:
+        data = generate_sensor_json(num_detections).encode()
+        print(f"{num_detections} detections ({len(data) / 1e6:.1f} MB):")
+        reference = None
+        # the standard library is measured first as the reference of the speedup and of the decoded tables
+        for backend in reversed(ingest.backends):
+            record, elapsed = best_time(lambda: ingest.decode_sensor(data, backend), args.repeat)
+            columns = [getattr(record.table, name) for name in detection_table.column_types]
+            if reference is None:
+                reference, reference_time = columns, elapsed
+            equal = all(np.array_equal(a, b, equal_nan=True) for a, b in zip(columns, reference))
+            print(f"  {backend:8s} {elapsed * 1e3:9.2f} ms  {num_detections / elapsed / 1e6:6.2f} M detections/s  "
+                  f"speedup {reference_time / elapsed:5.2f}x  equal {equal}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Benchmark of the overhead of the instrumentation.
+
+Merges the same synthetic frames with a DetectionMerger without metrics, which is the default, and with
+instrumentation.Metrics collecting the stage times and counters, with and without counting the allocated memory blocks,
+and reports the time per frame of each. The results of all are checked to be equal.
+
+    python3 decision_support_system/benchmarks/bench_instrumentation.py --frames 200 --objects 50
+"""
+import os
+import sys
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import instrumentation
+import synthetic
+
+
+def merge_frames(merger, frames):
+    start = time.perf_counter()
+    results = [merger.merge_frame(frame["sensors"], frame["train_current"], frame["train_prev"]) for frame in frames]
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the overhead of the instrumentation')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=200)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="haversine")
+    parser.add_argument('--repeat', help='Number of repetitions, the best time is reported', type=int, default=3)
+    args = parser.parse_args()
+
+    frames = list(synthetic.FrameGenerator(objects=args.objects).generate_frames(args.frames))
+    frame_counts = []
+    mergers = {"disabled": decision_support.DetectionMerger(distance_method=args.distance_method)}
+    for name, allocations in (("metrics", False), ("metrics+allocations", True)):
+        metrics = instrumentation.Metrics(callback=frame_counts.append, allocations=allocations)
+        mergers[name] = decision_support.DetectionMerger(distance_method=args.distance_method, metrics=metrics)
+    best = {name: float("inf") for name in mergers}
+    results = {}
+    merge_frames(mergers["disabled"], frames[:1])
+    for _ in range(args.repeat):
+        for name, merger in mergers.items():
+            results[name], elapsed = merge_frames(merger, frames)
+            best[name] = min(best[name], elapsed)
+    for name, elapsed in best.items():
+        print(f"{name:20s} {elapsed / args.frames * 1e3:8.3f} ms/frame  overhead "
+              f"{(elapsed / best['disabled'] - 1) * 100:+6.2f}%  results equal: {results[name] == results['disabled']}")
+    print(f"{len(frame_counts)} frames passed to the callbacks")
+
+
+if __name__ == '__main__':
+    main()
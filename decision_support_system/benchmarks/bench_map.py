@@ -0,0 +1,52 @@
+#!/usr/bin/python3
+"""
+Benchmark of rendering the map of a route.
+
+Merges synthetic frames of a train driving along a track, collects the estimated detections, merged results and train
+positions of all frames in a route_map.RouteMap, and reports the time to render and write the map and the size of the
+HTML file with one folium.Marker per detection (markers), as DetectionMerger.draw_on_map draws them, and with clustered
+layers (cluster).
+
+    python3 decision_support_system/benchmarks/bench_map.py --frames 100 --objects 50
+"""
+import os
+import sys
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import route_map
+import streaming
+import synthetic
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark rendering the map of a route')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=100)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--modes', help='Map modes to render', nargs='+', default=route_map.map_modes,
+                        choices=route_map.map_modes)
+    args = parser.parse_args()
+
+    generator = synthetic.FrameGenerator(objects=args.objects)
+    merger = decision_support.DetectionMerger(distance_method="haversine")
+    frame_map = route_map.RouteMap()
+    for record in streaming.merge_frames(merger, generator.generate_frames(args.frames)):
+        frame_map.add_frame(record, merger.detections)
+    print(f"{frame_map.frames} frames, {frame_map.num_detections} detections, "
+          f"{len(frame_map.result_coordinates)} results")
+
+    with tempfile.TemporaryDirectory() as directory:
+        for mode in args.modes:
+            path = os.path.join(directory, f"{mode}.html")
+            start = time.perf_counter()
+            frame_map.save(path, mode)
+            elapsed = time.perf_counter() - start
+            print(f"{mode:8s} {elapsed:8.2f} s  {os.path.getsize(path) / 1e6:8.2f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+"""
+Benchmark of the batched weighted merge of groups of similar detections.
+
+Builds a table of random detections spread over all zones and random groups of them, and merges the groups once with a
+per-detection loop over the weights dictionary, as merge_similar_detections did before, and once with
+DetectionMerger.merge_groups, per zone and across all zones at once. Checks that the merged coordinates are identical.
+
+    python3 decision_support_system/benchmarks/bench_merge_groups.py --groups 5000 --max_size 6
+"""
+import os
+import sys
+import argparse
+import random
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import detection_table
+import synthetic
+
+
+def reference_merge(merger, detections, groups, zone_ids):
+    latitudes = detections.latitude.tolist()
+    longitudes = detections.longitude.tolist()
+    merged = []
+    for indices, zone_id in zip(groups, zone_ids):
+        accumulated_weight = 0
+        latitude = 0
+        longitude = 0
+        for index in indices:
+            weight = merger.weights[detections.camera_name(index)][zone_id - 1]
+            latitude = latitude + latitudes[index] * weight
+            longitude = longitude + longitudes[index] * weight
+            accumulated_weight += weight
+        merged.append((latitude / accumulated_weight, longitude / accumulated_weight))
+    return np.array(merged)
+
+
+def per_zone_merge(merger, detections, groups, zone_ids):
+    merged = np.empty((len(groups), 2))
+    zone_ids = np.asarray(zone_ids)
+    for zone_id in np.unique(zone_ids).tolist():
+        positions = np.flatnonzero(zone_ids == zone_id)
+        merged[positions] = merger.merge_groups(detections, [groups[position] for position in positions], zone_id)
+    return merged
+
+
+def timed(function, *args, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the batched weighted merge of groups')
+    parser.add_argument('--groups', help='Number of groups', type=int, default=5000)
+    parser.add_argument('--max_size', help='Maximum number of detections of a group', type=int, default=6)
+    parser.add_argument('--seed', help='Seed of the random groups', type=int, default=0)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    merger = decision_support.DetectionMerger()
+    sizes = [rng.randint(2, args.max_size) for _ in range(args.groups)]
+    size = sum(sizes)
+    cameras = [detection_table.cameras.code(camera) for camera in synthetic.onboard_cameras + ("UAV",)]
+    detections = detection_table.DetectionTable(
+        objectclass=np.zeros(size), camera=[rng.choice(cameras) for _ in range(size)],
+        latitude=[synthetic.train_current[0] + rng.uniform(-0.005, 0.005) for _ in range(size)],
+        longitude=[synthetic.train_current[1] + rng.uniform(-0.005, 0.005) for _ in range(size)])
+    order = list(range(size))
+    rng.shuffle(order)
+    groups = []
+    for group_size in sizes:
+        groups.append(order[:group_size])
+        order = order[group_size:]
+    zone_ids = [rng.randint(1, len(merger.zones)) for _ in groups]
+
+    reference, reference_time = timed(reference_merge, merger, detections, groups, zone_ids)
+    per_zone, per_zone_time = timed(per_zone_merge, merger, detections, groups, zone_ids)
+    batched, batched_time = timed(merger.merge_groups, detections, groups, zone_ids)
+    print(f"{args.groups} groups of {size} detections")
+    for name, merged, elapsed in (("loop", reference, reference_time), ("per zone", per_zone, per_zone_time),
+                                  ("across zones", batched, batched_time)):
+        print(f"{name:14s} {elapsed * 1e3:9.3f} ms  speedup {reference_time / elapsed:6.2f}x  "
+              f"identical: {np.array_equal(merged, reference)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/python3
+"""
+Benchmark of merging the zones of a large frame concurrently.
+
+Generates a frame with synthetic detections spread over all zones and merges it one zone after another, on a thread
+pool and on a process pool, checking that the results are the same.
+
+    python3 decision_support_system/benchmarks/bench_parallel.py --detections 5000 --workers 4
+"""
+import os
+import sys
+import argparse
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+from bench_find_similar import generate_zone_detections, create_merger, create_table
+
+
+def merge(detections, executor):
+    merger = create_merger()
+    merger.executor = executor
+    merger.detections = create_table(detections)
+    merger.group_detections_into_zones()
+    start = time.perf_counter()
+    merger.run_onboard_merging_algorithm()
+    return time.perf_counter() - start, merger.final_results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark merging the zones concurrently')
+    parser.add_argument('--detections', help='Number of detections in the frame', type=int, default=5000)
+    parser.add_argument('--workers', help='Number of workers', type=int, default=4)
+    args = parser.parse_args()
+
+    detections = generate_zone_detections(args.detections)
+    serial_time, expected = merge(detections, None)
+    print(f"{'serial':>8}: {serial_time:.3f}s")
+    for executor_type in decision_support.executor_types:
+        with decision_support.create_executor(executor_type, args.workers) as executor:
+            elapsed, results = merge(detections, executor)
+        print(f"{executor_type:>8}: {elapsed:.3f}s, speedup {serial_time / elapsed:.2f}, "
+              f"same results: {results == expected}")
+
+
+if __name__ == '__main__':
+    main()
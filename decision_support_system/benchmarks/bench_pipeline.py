@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+"""
+Benchmark of the stages of the DetectionMerger on synthetic frames.
+
+Generates synthetic frames of all six cameras (see synthetic.FrameGenerator) with the given number of objects and
+duplicate rate, merges them one by one with the same DetectionMerger and times every stage of each frame separately:
+decoding the JSON frame (ingest), estimating the coordinates (estimate), preparing the UAV detections (uav), grouping
+the detections into zones (zoning), merging the zones (merging) and encoding the result record (output). The latency
+percentiles of each stage and the throughput are printed and written as JSON, together with the configuration and the
+commit, so that runs can be compared across commits.
+
+    python3 decision_support_system/benchmarks/bench_pipeline.py --frames 200 --objects 50 200 --output bench.json
+"""
+import os
+import sys
+import argparse
+import json
+import platform
+import subprocess
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import ingest
+import synthetic
+
+stages = ("ingest", "estimate", "uav", "zoning", "merging", "output")
+percentiles = (50, 90, 99)
+
+
+def git_commit():
+    """Returns the commit of the working tree, or None if it is not a git repository."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def merge_frame_stages(merger, line):
+    """Merges one JSON encoded frame stage by stage and returns the time of every stage in seconds."""
+    times = {}
+    start = time.perf_counter()
+    frame = ingest.decode_frame(line)
+    merger.load_frame(frame["sensors"], frame["train_current"], frame.get("train_prev"))
+    times["ingest"] = time.perf_counter() - start
+    for stage, function in (("estimate", merger.estimate_detection_coordinates),
+                            ("uav", merger.prepare_uav_detections),
+                            ("zoning", merger.group_detections_into_zones),
+                            ("merging", merger.run_onboard_merging_algorithm)):
+        start = time.perf_counter()
+        function()
+        times[stage] = time.perf_counter() - start
+    start = time.perf_counter()
+    json.dumps({"frame_id": frame.get("frame_id"), "train_current": merger.train_current,
+                "results": merger.final_results})
+    times["output"] = time.perf_counter() - start
+    return times
+
+
+def summarize(times):
+    """Returns the mean, percentiles and maximum of the given times in milliseconds."""
+    times = np.asarray(times) * 1e3
+    summary = {"mean_ms": float(times.mean())}
+    summary.update({f"p{percentile}_ms": float(np.percentile(times, percentile)) for percentile in percentiles})
+    summary["max_ms"] = float(times.max())
+    return summary
+
+
+def run_benchmark(objects, duplicate_rate, num_frames, distance_method, clustering, seed, warmup=1):
+    """
+    Generates and merges synthetic frames and returns the summary of the run. The first warmup frames are merged
+    before the timed frames, so that lazy imports and caches are not counted.
+    """
+    generator = synthetic.FrameGenerator(objects=objects, duplicate_rate=duplicate_rate, seed=seed)
+    lines = [json.dumps(frame) for frame in generator.generate_frames(warmup + num_frames)]
+    merger = decision_support.DetectionMerger(distance_method=distance_method, clustering=clustering)
+    for line in lines[:warmup]:
+        merge_frame_stages(merger, line)
+    stage_times = {stage: [] for stage in stages}
+    frame_times = []
+    detections = results = 0
+    for line in lines[warmup:]:
+        times = merge_frame_stages(merger, line)
+        for stage in stages:
+            stage_times[stage].append(times[stage])
+        frame_times.append(sum(times.values()))
+        detections += len(merger.detections)
+        results += len(merger.final_results)
+    total = sum(frame_times)
+    return {"objects": objects, "duplicate_rate": duplicate_rate, "frames": num_frames,
+            "detections_per_frame": detections / num_frames, "results_per_frame": results / num_frames,
+            "frames_per_s": num_frames / total, "detections_per_s": detections / total,
+            "frame": summarize(frame_times),
+            "stages": {stage: summarize(stage_times[stage]) for stage in stages}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the stages of the DetectionMerger on synthetic frames')
+    parser.add_argument('--frames', help='Number of frames per run', type=int, default=100)
+    parser.add_argument('--objects', help='Numbers of objects per frame, one run each', type=int, nargs='+',
+                        default=[10, 50, 200])
+    parser.add_argument('--duplicate_rates', help='Fractions of objects detected by several cameras, one run each',
+                        type=float, nargs='+', default=[0.5])
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="geodesic")
+    parser.add_argument('--clustering', help='Strategy to cluster similar detections', default="angle")
+    parser.add_argument('--seed', help='Seed of the synthetic frames', type=int, default=0)
+    parser.add_argument('--warmup', help='Number of frames merged before the timed frames', type=int, default=1)
+    parser.add_argument('--output', help='JSON file the results are written to', type=str)
+    args = parser.parse_args()
+
+    runs = []
+    for duplicate_rate in args.duplicate_rates:
+        for objects in args.objects:
+            run = run_benchmark(objects, duplicate_rate, args.frames, args.distance_method, args.clustering,
+                                args.seed, args.warmup)
+            runs.append(run)
+            print(f"{objects} objects, duplicate rate {duplicate_rate}: {run['detections_per_frame']:.0f} "
+                  f"detections/frame, {run['frames_per_s']:.1f} frames/s, "
+                  f"p50 {run['frame']['p50_ms']:.2f} ms, p99 {run['frame']['p99_ms']:.2f} ms")
+            print("  " + "  ".join(f"{stage} {run['stages'][stage]['p50_ms']:.3f}" for stage in stages)
+                  + "  (p50 ms)")
+
+    if args.output:
+        report = {"commit": git_commit(), "python": platform.python_version(), "numpy": np.__version__,
+                  "machine": platform.machine(), "json_decoder": ingest.default_backend,
+                  "config": {"frames": args.frames, "distance_method": args.distance_method,
+                             "clustering": args.clustering, "seed": args.seed, "warmup": args.warmup},
+                  "runs": runs}
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+#!/usr/bin/python3
+"""
+Benchmark of replaying a binary recording against replaying newline-delimited JSON frames.
+
+Writes the same synthetic frames as newline-delimited JSON and as a recording, reports the size of both files and the
+time to decode all frames into sensor records and to merge them, and checks that the results of both are equal.
+
+    python3 decision_support_system/benchmarks/bench_recording.py --frames 2000 --objects 50
+"""
+import os
+import sys
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import recording
+import streaming
+import synthetic
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return list(streaming.read_frames(f))
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark replaying a binary recording against JSON frames')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=2000)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="haversine")
+    parser.add_argument('--merge_frames', help='Number of frames that are merged', type=int, default=200)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "frames.jsonl")
+        recording_path = os.path.join(directory, "frames" + recording.extension)
+        synthetic.write_frames(synthetic.FrameGenerator(objects=args.objects).generate_frames(args.frames), json_path)
+        _, convert_time = timed(recording.write_recording, recording.read_json_frames(json_path), recording_path)
+        print(f"JSON {os.path.getsize(json_path) / 1e6:8.2f} MB, "
+              f"recording {os.path.getsize(recording_path) / 1e6:8.2f} MB, converted in {convert_time:.2f} s")
+
+        json_frames, json_time = timed(read_json, json_path)
+        rec = recording.Recording(recording_path)
+        recording_frames, recording_time = timed(list, rec)
+        print(f"decode JSON      {json_time / args.frames * 1e6:8.1f} us/frame")
+        print(f"decode recording {recording_time / args.frames * 1e6:8.1f} us/frame  "
+              f"speedup {json_time / recording_time:5.2f}x")
+
+        results = {}
+        for name, frames in (("JSON", json_frames), ("recording", recording_frames)):
+            merger = decision_support.DetectionMerger(distance_method=args.distance_method)
+            results[name], elapsed = timed(list, streaming.merge_frames(merger, frames[:args.merge_frames]))
+            print(f"merge {name:10s} {elapsed / args.merge_frames * 1e3:8.3f} ms/frame")
+        print(f"results equal: {results['JSON'] == results['recording']}")
+
+
+if __name__ == '__main__':
+    main()
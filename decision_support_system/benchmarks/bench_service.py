@@ -0,0 +1,85 @@
+#!/usr/bin/python3
+"""
+Benchmark of the end-to-end latency of the asyncio sensor service.
+
+Six simulated sensors report the synthetic frames at the given rate with random jitter, and one of them (the UAV by
+default) is late by the given lag in a fraction of the frames. The frames are merged by a SensorService that waits for
+all sensors and by one that merges at the deadline, and the latency from the first report of a frame to its result,
+the frames merged at the deadline and the dropped reports are reported for both.
+
+    python3 decision_support_system/benchmarks/bench_service.py --frames 50 --rate 10 --deadline 0.05
+"""
+import os
+import sys
+import argparse
+import asyncio
+import io
+import json
+import random
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import sensor_service
+import synthetic
+
+
+async def report_sensor(service, frames, camera, period, jitter, lag, late_rate, seed):
+    rng = random.Random(seed)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    for index, frame in enumerate(frames):
+        delay = rng.uniform(0, jitter) + (lag if rng.random() < late_rate else 0.0)
+        await asyncio.sleep(max(0.0, start + index * period + delay - loop.time()))
+        if camera is None:
+            await service.put({"train_current": frame["train_current"], "train_prev": frame["train_prev"]})
+        else:
+            await service.put(next(sensor for sensor in frame["sensors"] if sensor["camera"] == camera))
+
+
+def run(frames, args, deadline):
+    service = sensor_service.SensorService(decision_support.DetectionMerger(distance_method=args.distance_method),
+                                           deadline=deadline, queue_size=args.queue_size)
+    output = io.StringIO()
+
+    async def main():
+        period = 1 / args.rate
+        feeds = [report_sensor(service, frames, None, period, 0.0, 0.0, 0.0, 0)]
+        for seed, camera in enumerate(sensor_service.sensor_cameras, 1):
+            late_rate = args.late_rate if camera == args.late_camera else 0.0
+            feeds.append(report_sensor(service, frames, camera, period, args.jitter, args.lag, late_rate, seed))
+        await service.run(feeds, output)
+
+    asyncio.run(main())
+    latencies = np.array([json.loads(line)["latency"] for line in output.getvalue().splitlines()]) * 1e3
+    return service.summary(), latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the latency of the asyncio sensor service')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=50)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--rate', help='Frames per second reported by each sensor', type=float, default=10)
+    parser.add_argument('--jitter', help='Maximum jitter of the reports in seconds', type=float, default=0.02)
+    parser.add_argument('--lag', help='Lag of the late reports in seconds', type=float, default=0.3)
+    parser.add_argument('--late_rate', help='Fraction of the reports of the late camera that are late', type=float,
+                        default=0.2)
+    parser.add_argument('--late_camera', help='Camera whose reports are late', default="UAV")
+    parser.add_argument('--deadline', help='Deadline of the frames in seconds', type=float, default=0.05)
+    parser.add_argument('--queue_size', help='Size of the queue of each sensor', type=int, default=4)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="haversine")
+    args = parser.parse_args()
+
+    frames = list(synthetic.FrameGenerator(objects=args.objects).generate_frames(args.frames))
+    for name, deadline in (("wait for all", None), (f"deadline {args.deadline * 1e3:g} ms", args.deadline)):
+        summary, latencies = run(frames, args, deadline)
+        dropped = sum(sensor["dropped"] for sensor in summary["sensors"].values())
+        print(f"{name:20s} frames {summary['frames']:4d}  at deadline {summary['deadline_frames']:4d}  "
+              f"dropped {dropped:4d}  latency p50 {np.percentile(latencies, 50):7.1f} ms  "
+              f"p99 {np.percentile(latencies, 99):7.1f} ms  max {latencies.max():7.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
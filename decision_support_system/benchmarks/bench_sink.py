@@ -0,0 +1,107 @@
+#!/usr/bin/python3
+"""
+Benchmark of the sustained write throughput of the results sinks.
+
+Merges synthetic frames once and writes their merged detections over and over with new frame ids, once by rewriting a
+JSON file of all results so far with one json.dump per frame, as the DetectionMerger wrote its output file, and once
+to every sink: newline-delimited JSON written one record at a time and in batches, with and without syncing to disk,
+with size-based rotation, and as an Arrow stream. Checks that the records read back from every sink are the records
+that were written.
+
+    python3 decision_support_system/benchmarks/bench_sink.py --frames 20000 --objects 20
+"""
+import os
+import sys
+import argparse
+import json
+import shutil
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import results_sink
+import streaming
+import synthetic
+
+
+def replay(records, num_frames):
+    """Yields num_frames result records cycling through the given records, with increasing frame ids."""
+    for frame_id in range(num_frames):
+        record = records[frame_id % len(records)]
+        yield {**record, "frame_id": frame_id}
+
+
+def write_json_dump(path, records, num_frames):
+    results = []
+    for record in replay(records, num_frames):
+        results.extend(results_sink.frame_records(record, record["sources"], timestamp=float(record["frame_id"])))
+        with open(path, "w") as f:
+            json.dump(results, f)
+    return len(results), os.path.getsize(path)
+
+
+def write_sink(sink, records, num_frames):
+    with sink:
+        for record in replay(records, num_frames):
+            sink.write_frame(record, record["sources"], timestamp=float(record["frame_id"]))
+    return sink.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the sustained write throughput of the results sinks')
+    parser.add_argument('--frames', help='Number of frames written to every sink', type=int, default=20000)
+    parser.add_argument('--dump_frames', help='Number of frames written with one json.dump per frame', type=int,
+                        default=200)
+    parser.add_argument('--objects', help='Number of objects per synthetic frame', type=int, default=20)
+    parser.add_argument('--max_bytes', help='Size of the segments of the rotated sink', type=int, default=1 << 20)
+    parser.add_argument('--directory', help='Directory the files are written to; Default is a temporary directory',
+                        type=str)
+    args = parser.parse_args()
+
+    merger = decision_support.DetectionMerger(distance_method="equirectangular")
+    frames = synthetic.FrameGenerator(objects=args.objects).generate_frames(50)
+    records = list(streaming.merge_frames(merger, frames, sources=True))
+    directory = args.directory or tempfile.mkdtemp(prefix="bench_sink_")
+    os.makedirs(directory, exist_ok=True)
+    expected = [record for frame in replay(records, args.frames)
+                for record in results_sink.frame_records(frame, frame["sources"], timestamp=float(frame["frame_id"]))]
+    print(f"{args.frames} frames, {len(expected)} records, written to {directory}")
+    try:
+        start = time.perf_counter()
+        num_records, size = write_json_dump(os.path.join(directory, "dump.json"), records, args.dump_frames)
+        elapsed = time.perf_counter() - start
+        print(f"{'json.dump per frame':28s} {num_records / elapsed:10.0f} records/s  {size / elapsed / 1e6:7.1f} MB/s  "
+              f"({args.dump_frames} frames)")
+        sinks = (("jsonl, 1 record, fsync each", "one.jsonl", dict(batch_size=1, fsync_interval=0)),
+                 ("jsonl, fsync every frame", "fsync.jsonl", dict(batch_size=1024, fsync_interval=0)),
+                 ("jsonl, fsync every 1 s", "sink.jsonl", dict(batch_size=1024, fsync_interval=1.0)),
+                 ("jsonl, no fsync", "nosync.jsonl", dict(batch_size=1024, fsync_interval=None)),
+                 ("jsonl, rotated", "rotated.jsonl", dict(batch_size=1024, max_bytes=args.max_bytes)),
+                 ("arrow, fsync every 1 s", "sink.arrows", dict(batch_size=1024, fsync_interval=1.0)),
+                 ("arrow, rotated", "rotated.arrows", dict(batch_size=1024, max_bytes=args.max_bytes)))
+        for name, file_name, options in sinks:
+            path = os.path.join(directory, file_name)
+            # a sink written one record at a time with a sync each is only run on a fraction of the frames
+            num_frames = args.frames // 20 if options["batch_size"] == 1 else args.frames
+            try:
+                sink = results_sink.open_sink(path, **options)
+            except ImportError as error:
+                print(f"{name:28s} skipped: {error}")
+                continue
+            start = time.perf_counter()
+            stats = write_sink(sink, records, num_frames)
+            elapsed = time.perf_counter() - start
+            written = list(results_sink.read_records(path))
+            print(f"{name:28s} {stats['records'] / elapsed:10.0f} records/s  "
+                  f"{stats['bytes'] / elapsed / 1e6:7.1f} MB/s  {stats['fsyncs']:6d} fsyncs  "
+                  f"{len(stats['segments']):3d} files  same records: {written == expected[:len(written)]} "
+                  f"({len(written)} of {stats['records']})")
+    finally:
+        if args.directory is None:
+            shutil.rmtree(directory)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+"""
+Benchmark of the startup time of the headless command line.
+
+Imports run_dss.py in a fresh interpreter with python -X importtime and reports the cumulative import time of
+run_dss.py and of its slowest imported packages, and the best wall clock of a fresh interpreter importing it. The
+headless path must not import the map library, so the benchmark fails if any of the --forbidden modules is imported,
+or if the import of run_dss.py takes longer than --max_ms milliseconds.
+
+    python3 decision_support_system/benchmarks/bench_startup.py --max_ms 500
+"""
+import os
+import sys
+import argparse
+import subprocess
+import time
+
+source_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_times(module):
+    """Returns the cumulative import time in microseconds of every module imported when importing the given module."""
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=source_dir,
+                             capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the startup time of the headless command line')
+    parser.add_argument('--module', help='Module to import', default="run_dss")
+    parser.add_argument('--forbidden', help='Modules that must not be imported', nargs='*', default=["folium"])
+    parser.add_argument('--max_ms', help='Maximum cumulative import time of the module', type=float)
+    parser.add_argument('--top', help='Number of slowest top-level packages to report', type=int, default=8)
+    parser.add_argument('--repeat', help='Number of fresh interpreters timed, the best time is reported', type=int,
+                        default=5)
+    args = parser.parse_args()
+
+    times = import_times(args.module)
+    total_ms = times[args.module] / 1e3
+    packages = {}
+    for name, cumulative in times.items():
+        package = name.split(".")[0]
+        packages[package] = max(packages.get(package, 0), cumulative)
+    print(f"import {args.module}: {total_ms:.1f} ms cumulative")
+    for package, cumulative in sorted(packages.items(), key=lambda item: -item[1])[1:args.top + 1]:
+        print(f"  {package:30s} {cumulative / 1e3:8.1f} ms")
+
+    best = float("inf")
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {args.module}"], cwd=source_dir, check=True)
+        best = min(best, time.perf_counter() - start)
+    print(f"interpreter start and import: {best * 1e3:.1f} ms")
+
+    failures = [f"{module} is imported" for module in args.forbidden if module in packages]
+    if args.max_ms is not None and total_ms > args.max_ms:
+        failures.append(f"import takes {total_ms:.1f} ms, more than {args.max_ms} ms")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
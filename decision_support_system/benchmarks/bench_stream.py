@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Benchmark of the streaming mode.
+
+Replays the recorded sensor set as a stream of frames through one DetectionMerger and reports the sustained number of
+frames per second. The first frame is checked against a DetectionMerger reading the sensor files directly.
+
+    python3 decision_support_system/benchmarks/bench_stream.py --frames 1000
+"""
+import os
+import sys
+import argparse
+import io
+import json
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import streaming
+
+data_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir, "data", "set_2")
+sensor_files = ["On-board_rgb1.json", "On-board_rgb4.json", "On-board_mono.json", "On-board_thermal.json",
+                "On-board_swir.json", "UAV.json"]
+train_current = "53.0861622, 8.7816742"
+train_prev = "53.086040, 8.781514"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the streaming mode')
+    parser.add_argument('--frames', help='Number of frames to stream', type=int, default=1000)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="geodesic")
+    args = parser.parse_args()
+
+    paths = [os.path.join(data_dir, name) for name in sensor_files]
+    sensor_data = [decision_support.read_json(path) for path in paths]
+    first_frame = json.dumps(streaming.create_frame(sensor_data, train_current, train_prev, 0))
+    frames = [first_frame] + [json.dumps(streaming.create_frame(sensor_data, train_current, frame_id=frame_id))
+                              for frame_id in range(1, args.frames)]
+    input_stream = io.StringIO("\n".join(frames) + "\n")
+    output_stream = io.StringIO()
+
+    merger = decision_support.DetectionMerger(distance_method=args.distance_method)
+    start = time.perf_counter()
+    num_frames = streaming.run_stream(merger, input_stream, output_stream)
+    elapsed = time.perf_counter() - start
+
+    expected = decision_support.DetectionMerger(*paths, train_current, train_prev, False, False, None,
+                                                args.distance_method).merge()
+    first_results = json.loads(output_stream.getvalue().splitlines()[0])["results"]
+    matches = first_results == json.loads(json.dumps(expected))
+    print(f"{num_frames} frames in {elapsed:.3f}s: {num_frames / elapsed:.1f} frames/s, "
+          f"{elapsed / num_frames * 1e3:.2f} ms/frame, first frame matches: {matches}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/python3
+"""
+Benchmark of the parameter sweep of the merging stages.
+
+Sweeps a grid of distance and angle thresholds and clustering strategies over synthetic frames, once by merging every
+frame from its sensor records for every combination, estimating the detections again each time, and once with the
+estimated detections cached (see sweep), one combination after another and on a pool of workers, and once more with
+the position errors of the merged detections collected. Checks that the merged detections of all combinations are the
+same and projects the time of a 1,000 point sweep.
+
+    python3 decision_support_system/benchmarks/bench_sweep.py --frames 50 --objects 50 --workers 4
+"""
+import os
+import sys
+import argparse
+import copy
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import evaluation
+import sweep
+import synthetic
+
+
+def sweep_uncached(merger, frames, combinations):
+    rows = []
+    for index, parameters in enumerate(combinations):
+        combination_merger = sweep.apply_parameters(copy.copy(merger), parameters)
+        frame_results = [{"results": list(combination_merger.merge_frame(records, train_current, train_prev))}
+                         for records, _, train_current, train_prev in frames]
+        rows.append({"combination": index, "frame_results": frame_results})
+    return rows
+
+
+def timed(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the parameter sweep of the merging stages')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=50)
+    parser.add_argument('--objects', help='Number of objects per frame', type=int, default=50)
+    parser.add_argument('--workers', help='Number of workers of the process pool', type=int, default=4)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="haversine")
+    args = parser.parse_args()
+
+    frames = list(synthetic.FrameGenerator(objects=args.objects).generate_frames(args.frames))
+    merger = decision_support.DetectionMerger(distance_method=args.distance_method)
+    grid = {"clustering": list(decision_support.clustering_strategies), "distance_threshold": [5, 10, 20, 30, 40],
+            "angle_threshold": [5, 10, 20]}
+    combinations = sweep.parameter_grid(grid, merger)
+    prepared = [evaluation.prepare_frame(frame) for frame in frames]
+    estimates, estimate_time = timed(sweep.estimate_frames, copy.copy(merger), frames)
+    print(f"{len(combinations)} combinations of {args.frames} frames, estimated once in {estimate_time:.3f} s")
+
+    uncached, uncached_time = timed(sweep_uncached, merger, prepared, combinations)
+    serial, serial_time = timed(list, sweep.run_sweep(merger, estimates, combinations, keep_results=True,
+                                                      errors=False))
+    pool, pool_time = timed(list, sweep.run_sweep(merger, estimates, combinations, args.workers, keep_results=True,
+                                                  errors=False))
+    with_errors, errors_time = timed(list, sweep.run_sweep(merger, estimates, combinations, keep_results=True))
+    expected = [[frame["results"] for frame in row["frame_results"]] for row in uncached]
+    # the cached sweeps include the time of estimating the detections once
+    for name, rows, elapsed in (("uncached", uncached, uncached_time),
+                                ("cached", serial, serial_time + estimate_time),
+                                (f"cached, {args.workers} workers", pool, pool_time + estimate_time),
+                                ("cached, with errors", with_errors, errors_time + estimate_time)):
+        print(f"{name:22s} {elapsed:8.3f} s  {elapsed / len(combinations) * 1e3:8.1f} ms/combination  "
+              f"1,000 points {elapsed / len(combinations) * 1000 / 60:6.1f} min  "
+              f"speedup {uncached_time / elapsed:5.2f}x  same results: "
+              f"{[[frame['results'] for frame in row['frame_results']] for row in rows] == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/python3
+"""
+Benchmark of the incremental multi-frame fusion.
+
+Generates static objects along the track and synthetic frames of a train driving past them (see
+synthetic.FrameGenerator.generate_world), and compares merging every frame from scratch with the DetectionMerger against
+fusing the frames into the obstacles of a tracking.ObstacleTracker. Reports the time per frame, the number of
+detections that go through the merging algorithm, and for the tracker the number of distinct obstacle ids against the
+number of distinct objects seen, the distance of the tracked obstacles to the nearest actual object of their class and
+the number of cells of the grid of the obstacle cache, which has to stay bounded on long routes.
+
+    python3 decision_support_system/benchmarks/bench_tracking.py --frames 100 --objects 300
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import instrumentation
+import synthetic
+import tracking
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+
+def merged_detections(metrics):
+    return metrics.to_dict()["counters"]["detections"]["total"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the incremental multi-frame fusion')
+    parser.add_argument('--frames', help='Number of frames', type=int, default=100)
+    parser.add_argument('--objects', help='Number of static objects along the track', type=int, default=300)
+    parser.add_argument('--speed', help='Distance the train moves between frames in meters', type=float, default=20.0)
+    parser.add_argument('--distance_method', help='Method used to calculate distances', default="geodesic")
+    args = parser.parse_args()
+
+    generator = synthetic.FrameGenerator(seed=1)
+    world = generator.generate_world(args.objects, args.frames * args.speed + synthetic.max_distance)
+    frames = list(generator.generate_frames(args.frames, args.speed, world))
+    seen = {(detection["objectclass"], detection["actual_coordinates"])
+            for frame in frames for sensor in frame["sensors"] for detection in sensor["objects"]}
+
+    metrics = instrumentation.Metrics(allocations=False)
+    merger = decision_support.DetectionMerger(distance_method=args.distance_method, metrics=metrics)
+    start = time.perf_counter()
+    for frame in frames:
+        merger.merge_frame(frame["sensors"], frame["train_current"], frame["train_prev"])
+    elapsed = time.perf_counter() - start
+    print(f"merge every frame: {elapsed / args.frames * 1e3:7.2f} ms/frame, "
+          f"{merged_detections(metrics) / args.frames:6.1f} detections merged/frame")
+
+    metrics = instrumentation.Metrics(allocations=False)
+    tracker = tracking.ObstacleTracker(
+        decision_support.DetectionMerger(distance_method=args.distance_method, metrics=metrics))
+    ids = set()
+    errors = []
+    start = time.perf_counter()
+    for frame in frames:
+        tracks = tracker.merge_frame(frame["sensors"], frame["train_current"], frame["train_prev"])
+        ids.update(track["id"] for track in tracks)
+    elapsed = time.perf_counter() - start
+    for track in tracks:
+        actual = [coordinates for objectclass, coordinates in world if objectclass == track["objectclass"]]
+        errors.append(np.min(geographic_estimations.calculate_distances(track["coordinates"], actual, "haversine")))
+    print(f"track obstacles:   {elapsed / args.frames * 1e3:7.2f} ms/frame, "
+          f"{merged_detections(metrics) / args.frames:6.1f} detections merged/frame")
+    print(f"{len(ids)} obstacle ids for {len(seen)} objects seen, {len(tracks)} tracked after the last frame with a "
+          f"median error of {np.median(errors):.2f} m, in {len(tracker.cache.cells)} grid cells")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+#!/usr/bin/python3
+"""
+Benchmark of grouping detections into zones.
+
+Times group_detections_into_zones for zone schemes with a growing number of zones against the previous loop over all
+zone ranges for every detection, and checks that both assign the same zones.
+
+    python3 decision_support_system/benchmarks/bench_zones.py --detections 100000 --zones 7 64 256
+"""
+import os
+import sys
+import argparse
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import detection_table
+
+
+def group_all_ranges(merger):
+    """The previous implementation of group_detections_into_zones, checking every zone range for every detection."""
+    zones = {zone: [] for zone in merger.zones}
+    for index, distance in enumerate(merger.detections.distance.tolist()):
+        for (low, high), zone in merger.zone_mapping.items():
+            if low <= distance < high:
+                zones[zone].append(index)
+                break
+    return zones
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark grouping detections into zones')
+    parser.add_argument('--detections', help='Number of detections', type=int, default=100000)
+    parser.add_argument('--zones', help='Numbers of zones', type=int, nargs='+', default=[7, 64, 256])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    detections = detection_table.DetectionTable(distance=rng.uniform(0, 2500, args.detections))
+    print(f"{'zones':>6} {'binary search [s]':>18} {'all ranges [s]':>15} {'match':>6}")
+    for num_zones in args.zones:
+        merger = decision_support.DetectionMerger()
+        merger.set_zone_boundaries(np.linspace(0, 2000, num_zones, endpoint=False))
+        merger.detections = detections
+        start = time.perf_counter()
+        merger.group_detections_into_zones()
+        search_time = time.perf_counter() - start
+        start = time.perf_counter()
+        expected = group_all_ranges(merger)
+        all_ranges_time = time.perf_counter() - start
+        print(f"{num_zones:>6} {search_time:>18.4f} {all_ranges_time:>15.4f} {str(expected == merger.zones):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,90 @@
+class UnionFind(object):
+    """
+    Disjoint sets of item indices with union by size and path halving.
+
+    Used to cluster detections into groups of similar detections: every pair of similar detections joins the sets of
+    both detections, and the resulting sets are the connected groups of detections. Both operations run in near
+    constant time, so clustering n detections with m similar pairs takes close to O(n + m) time.
+    """
+
+    def __init__(self, size):
+        """
+        Initializes size sets containing one item each.
+
+        Args:
+        size (int): The number of items.
+        """
+        self.parent = list(range(size))
+        self.size = [1] * size
+
+    def find(self, index):
+        """Returns the representative item of the set containing the given item."""
+        parent = self.parent
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    def union(self, index_1, index_2):
+        """Joins the sets containing the given items and returns the representative item of the joined set."""
+        root_1 = self.find(index_1)
+        root_2 = self.find(index_2)
+        if root_1 == root_2:
+            return root_1
+        if self.size[root_1] < self.size[root_2]:
+            root_1, root_2 = root_2, root_1
+        self.parent[root_2] = root_1
+        self.size[root_1] += self.size[root_2]
+        return root_1
+
+    def labels(self):
+        """
+        Returns the group label of every item.
+
+        The sets with more than one item are numbered 0, 1, 2, ... in the order of their first item. Items that have
+        not been joined with any other item get the label -1.
+
+        Returns:
+        list: The group label of every item.
+        """
+        labels = []
+        group_ids = {}
+        for index in range(len(self.parent)):
+            root = self.find(index)
+            if self.size[root] == 1:
+                labels.append(-1)
+            else:
+                labels.append(group_ids.setdefault(root, len(group_ids)))
+        return labels
+
+    def groups(self):
+        """
+        Returns the sets with more than one item.
+
+        Returns:
+        list: The item indices of every set with more than one item, in the order of their first item.
+        """
+        groups = []
+        for index, label in enumerate(self.labels()):
+            if label == len(groups):
+                groups.append([])
+            if label >= 0:
+                groups[label].append(index)
+        return groups
+
+
+def cluster_pairs(size, pairs):
+    """
+    Clusters items into connected groups.
+
+    Args:
+    size (int): The number of items.
+    pairs (iterable): Pairs (i, j) of item indices that belong to the same group.
+
+    Returns:
+    list: The item indices of every group of more than one item, in the order of their first item.
+    """
+    union_find = UnionFind(size)
+    for index_1, index_2 in pairs:
+        union_find.union(index_1, index_2)
+    return union_find.groups()
@@ -1,30 +1,57 @@
 import geographic_estimations.geographic_estimations as geographic_estimations
-import folium
-import json
+import spatial_index
+import clustering
+import detection_table
+import ingest
+import instrumentation
+import route_map
+import bisect
 import itertools
+import json
+import numpy as np
 from collections import defaultdict
-from math import ceil
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+icon_colors = route_map.icon_colors
 
-icon_colors = {
-    'RGB1': "beige",
-    'RGB4': "green",
-    'Monochrome': "blue",
-    'Thermal': "red",
-    'SWIR': "purple",
-    'UAV': "lightgray"
-}
+
+# attributes holding the sensor data and detections of the current frame, which are not copied to worker processes
+frame_attributes = ("rgb1", "rgb4", "monochrome", "thermal", "swir", "uav_data", "sensor_data", "detections",
+                    "final_results", "visualize_estimated_coordinates", "zones", "merged_zones", "merged_sources",
+                    "map", "executor", "metrics", "context", "results_sink")
+clustering_strategies = ("angle", "connected")
+executor_types = {"thread": ThreadPoolExecutor, "process": ProcessPoolExecutor}
 
 
 def read_json(file_path):
-    with open(file_path) as f:
-        return json.load(f)
+    with open(file_path, "rb") as f:
+        return ingest.loads(f.read())
+
+
+def create_executor(executor_type, workers):
+    """Creates a thread or process pool with the given number of workers to merge zones or frames concurrently."""
+    return executor_types[executor_type](max_workers=workers)
+
+
+def parse_coordinates(coordinates):
+    """Returns GPS coordinates given as a "latitude, longitude" string or a sequence as a tuple of floats."""
+    if coordinates is None:
+        return None
+    if isinstance(coordinates, str):
+        coordinates = coordinates.split(',')
+    return tuple(map(float, coordinates))
 
 
 class DetectionMerger(object):
-    def __init__(self, rgb1, rgb4, mono, therm, swir, uav, train_current, train_prev, verbose, show_map, output_file):
+    def __init__(self, rgb1=None, rgb4=None, mono=None, therm=None, swir=None, uav=None, train_current=None,
+                 train_prev=None, verbose=False, show_map=False, output_file=None, distance_method="geodesic",
+                 executor=None, clustering="angle", config_file=None, metrics=None, map_file=None, results_sink=None):
         """
         Initializes the DetectionMerger class and sets initial values for class variables.
 
+        When no sensor data paths are given, the DetectionMerger is created without sensor data and the frames of
+        continuously arriving sensor data are passed to merge_frame instead.
+
         Parameters:
             - rgb1 (str): Path to the JSON file containing RGB1 sensor data.
             - rgb4 (str): Path to the JSON file containing RGB4 sensor data.
@@ -32,96 +59,368 @@ class DetectionMerger(object):
             - therm (str): Path to the JSON file containing Thermal sensor data.
             - swir (str): Path to the JSON file containing SWIR sensor data.
             - uav (str): Path to the JSON file containing UAV sensor data.
+            - distance_method (str): Method used to calculate distances between GPS coordinates, one of
+              geographic_estimations.distance_methods. "equirectangular" is anchored at the train's current position.
+            - executor (Executor): Thread or process pool used to merge the zones concurrently, see create_executor.
+              The zones are merged one by one if not given.
+            - clustering (str): Strategy to cluster similar detections into groups, one of clustering_strategies, see
+              cluster_similar_detections.
+            - config_file (str): Path to a JSON file with the zone boundaries and weights, see load_config.
+            - metrics (instrumentation.Metrics): Collects the time of every stage and the counters of the merging
+              algorithm. Nothing is collected if not given. Copies of the DetectionMerger, e.g. for frames merged
+              concurrently, do not collect metrics.
+            - map_file (str): Path to an HTML file the map is written to instead of showing it in the browser, with
+              the detections and results drawn as clustered layers, see route_map.RouteMap.
+            - results_sink (results_sink.ResultsSink): Sink the merged results of run are appended to as records with
+              the frame metadata and the cameras of every result. The sink is not copied with the DetectionMerger.
         """
-        self._read_data_from_files(rgb1, rgb4, mono, therm, swir, uav)
-        self._initialize_variables(train_current, train_prev, verbose, show_map, output_file)
+        if rgb1 is not None:
+            self._read_data_from_files(rgb1, rgb4, mono, therm, swir, uav)
+        else:
+            self.sensor_data = []
+            self.uav_data = ingest.empty_sensor("UAV")
+        self._initialize_variables(train_current, train_prev, verbose, show_map, output_file, distance_method,
+                                   executor, clustering)
+        self.metrics = instrumentation.disabled if metrics is None else metrics
+        self.map_file = map_file
+        self.results_sink = results_sink
         self._initialize_zones()
         self._initialize_weights()
-        self._initialize_map()
+        if config_file is not None:
+            self.load_config(config_file)
 
     def _read_data_from_files(self, rgb1, rgb4, mono, therm, swir, uav):
-        """Reads in the data from the given JSON files and assigns it to class variables."""
-        self.rgb1 = read_json(rgb1)
-        self.rgb4 = read_json(rgb4)
-        self.monochrome = read_json(mono)
-        self.thermal = read_json(therm)
-        self.swir = read_json(swir)
-        self.uav_data = read_json(uav)
+        """Reads in the data from the given JSON files as sensor records and assigns it to class variables."""
+        self.rgb1 = ingest.read_sensor(rgb1)
+        self.rgb4 = ingest.read_sensor(rgb4)
+        self.monochrome = ingest.read_sensor(mono)
+        self.thermal = ingest.read_sensor(therm)
+        self.swir = ingest.read_sensor(swir)
+        self.uav_data = ingest.read_sensor(uav)
         self.sensor_data = [self.rgb1, self.rgb4, self.monochrome, self.thermal, self.swir]
 
-    def _initialize_variables(self, train_current, train_prev, verbose, show_map, output_file):
+    def _initialize_variables(self, train_current, train_prev, verbose, show_map, output_file,
+                              distance_method="geodesic", executor=None, clustering="angle"):
         """Initializes other class variables with default values."""
         self.output_file = output_file
         self.distance_threshold = 20
         self.angle_threshold = 20
-        self.train_current = tuple(map(float, train_current.split(',')))  # the current position of the train
-        self.train_prev = tuple(
-            map(float, train_prev.split(',')))  # (53.086040, 8.781514)  # previous position of the train
+        self.distance_method = distance_method
+        self.executor = executor
+        self.clustering = clustering
+        self.train_current = parse_coordinates(train_current)  # the current position of the train
+        self.train_prev = parse_coordinates(train_prev)  # (53.086040, 8.781514)  # previous position of the train
 
-        self.uav_detections = []
-        self.all_detections = []
+        self.detections = detection_table.DetectionTable()  # table of the detections of all sensors
         self.final_results = []
 
-        self.test_estimations = []
         self.visualize_estimated_coordinates = []  # list to hold all estimated coordinates to be visualized on map
         self.verbose = verbose
         self.show_map = show_map
+        self.map = None  # created when the results are drawn, see _initialize_map
+        self.context = None  # geodetic context of the train's positions, see get_context
+
+    def _reset_frame(self):
+        """Clears the detections of the previous frame while keeping the zone containers."""
+        self.detections = detection_table.DetectionTable()
+        self.final_results = []
+        self.visualize_estimated_coordinates = []
+        for zone_id in self.zones:
+            self.zones[zone_id].clear()
+            self.merged_zones[zone_id].clear()
+            self.merged_sources[zone_id].clear()
+
+    def __getstate__(self):
+        """
+        Returns the state that is copied when the DetectionMerger is sent to worker processes or copied with
+        copy.copy. Only the configuration is copied, not the sensor data and detections of the current frame.
+        """
+        state = {name: value for name, value in self.__dict__.items() if name not in frame_attributes}
+        state["zones"] = {zone_id: [] for zone_id in self.zones}
+        state["merged_zones"] = {zone_id: [] for zone_id in self.merged_zones}
+        state["merged_sources"] = {zone_id: [] for zone_id in self.merged_sources}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.sensor_data = []
+        self.uav_data = ingest.empty_sensor("UAV")
+        self.executor = None
+        self.map = None
+        self.metrics = instrumentation.disabled
+        self.context = None
+        self.results_sink = None
+        self._reset_frame()
+
+    @property
+    def all_detections(self):
+        """The detections of all sensors as dictionaries."""
+        return self.detections.to_dicts()
+
+    @property
+    def uav_detections(self):
+        """The detections of the UAV as dictionaries."""
+        uav = self.detections.cameras.code("UAV")
+        return [self.detections.to_dict(index) for index in np.flatnonzero(self.detections.camera == uav)]
+
+    @property
+    def test_estimations(self):
+        """The object classes and estimated coordinates of the detections of the on-board sensors."""
+        uav = self.detections.cameras.code("UAV")
+        return [{self.detections.objectclass_name(index): self.detections.estimated_coordinates(index)}
+                for index in np.flatnonzero(self.detections.camera != uav)]
 
     def _initialize_weights(self):
-        self.weights = {"RGB1": [100, 100, 100, 80, 60, 40, 20],
-                        "RGB4": [80, 100, 100, 100, 80, 60, 40],
-                        "Monochrome": [60, 80, 100, 100, 100, 80, 60],
-                        "Thermal": [40, 60, 80, 100, 100, 100, 80],
-                        "SWIR": [10, 20, 40, 60, 80, 100, 100],
-                        "UAV": [100, 100, 100, 100, 100, 100, 100]
-                        }
+        self.set_weights({"RGB1": [100, 100, 100, 80, 60, 40, 20],
+                          "RGB4": [80, 100, 100, 100, 80, 60, 40],
+                          "Monochrome": [60, 80, 100, 100, 100, 80, 60],
+                          "Thermal": [40, 60, 80, 100, 100, 100, 80],
+                          "SWIR": [10, 20, 40, 60, 80, 100, 100],
+                          "UAV": [100, 100, 100, 100, 100, 100, 100]
+                          })
 
     def _initialize_zones(self):
-        """Initializes the zones and merged_zones dictionaries."""
-        self.zones = {i: [] for i in range(1, 8)}
-        self.merged_zones = {i: [] for i in range(1, 8)}
-        self.zone_mapping = {
-            (0, 50): 1,
-            (50, 100): 2,
-            (100, 150): 3,
-            (150, 200): 4,
-            (200, 250): 5,
-            (250, 400): 6,
-            (400, float("inf")): 7,
-        }
+        """Initializes the zone boundaries and the zones, merged_zones and merged_sources dictionaries."""
+        self.set_zone_boundaries([0, 50, 100, 150, 200, 250, 400])
+
+    def set_zone_boundaries(self, zone_boundaries):
+        """
+        Set zone boundaries
+
+        This function sets the distance ranges of the zones. Zone i covers the distances from zone_boundaries[i - 1]
+        up to zone_boundaries[i], and the last zone covers all distances from the last boundary on. The sorted
+        boundaries are used to look up the zone of a detection with a binary search, so the cost of assigning a zone
+        does not grow with the number of zones. The zones, merged_zones and merged_sources dictionaries are created for
+        the zones.
+
+        Args:
+        zone_boundaries (list): The lower distance boundary of each zone in meters, in increasing order.
+
+        Returns:
+        None
+        """
+        zone_boundaries = [float(boundary) for boundary in zone_boundaries]
+        if not zone_boundaries or any(low >= high for low, high in zip(zone_boundaries, zone_boundaries[1:])):
+            raise ValueError(f"Zone boundaries must be strictly increasing, got {zone_boundaries}")
+        self.zone_boundaries = zone_boundaries
+        self.zone_mapping = {(low, high): zone for zone, (low, high) in
+                             enumerate(zip(zone_boundaries, zone_boundaries[1:] + [float("inf")]), start=1)}
+        self.zones = {zone: [] for zone in self.zone_mapping.values()}
+        self.merged_zones = {zone: [] for zone in self.zone_mapping.values()}
+        # the cameras of the detections each merged detection of a zone was merged from, in the same order
+        self.merged_sources = {zone: [] for zone in self.zone_mapping.values()}
+
+    def set_weights(self, weights):
+        """
+        Set weights
+
+        This function sets the weights of each camera in each zone, which are used to merge similar detections. The
+        weights are also stored in the self.weight_matrix array, with one row per camera code of the detection tables
+        and one column per zone id, so that the weights of many detections are looked up at once, see get_weights.
+        Column 0 holds the weight 0 of detections outside of the zones, and cameras without weights have the weight
+        NaN.
+
+        Args:
+        weights (dict): The list of weights of each zone, by camera.
+
+        Returns:
+        None
+        """
+        for camera, camera_weights in weights.items():
+            if len(camera_weights) != len(self.zones):
+                raise ValueError(f"Expected {len(self.zones)} weights for camera {camera}, one for each zone, "
+                                 f"got {len(camera_weights)}")
+        self.weights = {camera: list(camera_weights) for camera, camera_weights in weights.items()}
+        codes = {camera: detection_table.cameras.code(camera) for camera in self.weights}
+        self.weight_matrix = np.full((len(detection_table.cameras), len(self.zones) + 1), np.nan)
+        for camera, camera_weights in self.weights.items():
+            self.weight_matrix[codes[camera]] = [0] + self.weights[camera]
+
+    def get_weights(self, cameras, zone_ids):
+        """
+        Returns the weight of each detection, given by its camera code and zone id, from the weight matrix. Raises a
+        KeyError for cameras without weights.
+        """
+        cameras = np.asarray(cameras, dtype=np.intp)
+        known = cameras < len(self.weight_matrix)
+        weights = self.weight_matrix[np.where(known, cameras, 0), zone_ids]
+        missing = ~known | np.isnan(weights)
+        if missing.any():
+            raise KeyError(detection_table.cameras[int(cameras[missing][0])])
+        return weights
+
+    def load_config(self, config_file):
+        """
+        Load config
+
+        This function reads the zone boundaries and the weights of each camera in each zone from a JSON file, e.g.
+
+            {"zone_boundaries": [0, 50, 100, 150, 200, 250, 400],
+             "weights": {"RGB1": [100, 100, 100, 80, 60, 40, 20], ...}}
+
+        Both entries are optional, but the weights have to match the number of zones.
+
+        Args:
+        config_file (str): Path to the JSON file.
+
+        Returns:
+        None
+        """
+        config = read_json(config_file)
+        if "zone_boundaries" in config:
+            self.set_zone_boundaries(config["zone_boundaries"])
+        self.set_weights(config.get("weights", self.weights))
+
+    def get_zones(self, distances):
+        """
+        Get zones
+
+        This function looks up the zone of each of the given distances by a binary search over the sorted zone
+        boundaries. Distances below the first boundary, infinite distances and NaN are not in any zone and get the
+        zone id 0.
+
+        Args:
+        distances (array_like): The distances in meters.
+
+        Returns:
+        numpy.ndarray: The zone id of each distance.
+        """
+        distances = np.asarray(distances, dtype=float)
+        zone_ids = np.searchsorted(self.zone_boundaries, distances, side="right")
+        return np.where((distances >= self.zone_boundaries[0]) & (distances < float("inf")), zone_ids, 0)
+
+    def get_zone(self, distance):
+        """Returns the zone id of a single distance, or 0 if it is not in any zone, see get_zones."""
+        if not self.zone_boundaries[0] <= distance < float("inf"):
+            return 0
+        return bisect.bisect_right(self.zone_boundaries, distance)
 
     def _initialize_map(self):
-        """Initializes the map to visualize final results."""
+        """
+        Initializes the map to visualize final results. folium is only imported here, so that the DetectionMerger can
+        be used without it when no map is shown.
+        """
+        import folium
         self.map = folium.Map(location=[53.086, 8.782], zoom_start=12)
 
     def run(self):
-        # estimate the GPS coordinates of detected obstacles
-        self.estimate_detection_coordinates()
-        # make calculations and change uav detection data to match train's onboard sensor data
-        self.prepare_uav_detections()
-        # group all detections into zones based on expert ranges
-        self.group_detections_into_zones()
-        # run the merging algorithm to merge similar detections
-        self.run_onboard_merging_algorithm()
-        # write the final detection list into a json file.
-        with open(self.output_file, 'w') as f:
-            json.dump(self.final_results, f)
+        self.merge()
+        # write the final detection list into a json file and append the result records to the sink.
+        with self.metrics.stage("output"):
+            if self.output_file is not None:
+                with open(self.output_file, 'w') as f:
+                    json.dump(self.final_results, f)
+            if self.results_sink is not None:
+                self.results_sink.write_frame({"frame_id": None, "train_current": self.train_current,
+                                               "results": self.final_results}, self.result_sources())
         if self.verbose:
             print("Merging algorithm complete. Final list of detections:")
             for det in self.final_results:
                 print(" ", det)
         # visualize estimated positions and original positions on a map
-        if self.show_map:
-            self.draw_on_map()
+        if self.show_map or self.map_file:
+            with self.metrics.stage("map"):
+                self.draw_on_map()
+        self.metrics.end_frame()
+
+    def merge(self):
+        """Runs the merging algorithm on the current sensor data and returns the final list of detections."""
+        # estimate the GPS coordinates of detected obstacles
+        with self.metrics.stage("estimate"):
+            self.estimate_detection_coordinates()
+        # make calculations and change uav detection data to match train's onboard sensor data
+        with self.metrics.stage("uav"):
+            self.prepare_uav_detections()
+        # group all detections into zones based on expert ranges
+        with self.metrics.stage("zoning"):
+            self.group_detections_into_zones()
+        # run the merging algorithm to merge similar detections
+        with self.metrics.stage("merging"):
+            self.run_onboard_merging_algorithm()
+        return self.final_results
+
+    def merge_frame(self, sensor_data, train_current, train_prev=None):
+        """
+        Merge frame
+
+        This function merges the detections of one frame of continuously arriving sensor data. The detections of the
+        previous frame are cleared, while the zone containers, weights and thresholds are reused. The on-board sensor
+        data and the UAV data are told apart by their camera. If train_prev is not given, the train's current position
+        of the previous frame is used to estimate the heading of the train. If the train has not moved since, the
+        heading of the previous frame is kept, see get_context.
+
+        Args:
+        sensor_data (list): The sensor data of the frame, as sensor records (see ingest) or in the same format as the
+        JSON files of each sensor.
+        train_current (str or tuple): The current position of the train.
+        train_prev (str or tuple): The previous position of the train.
+
+        Returns:
+        list: The final list of merged detections of the frame.
+        """
+        self.load_frame(sensor_data, train_current, train_prev)
+        self.merge()
+        self.metrics.end_frame()
+        return self.final_results
+
+    def load_frame(self, sensor_data, train_current, train_prev=None):
+        """
+        Clears the detections of the previous frame and sets the sensor data and train positions of a new frame without
+        merging it, see merge_frame for the arguments. The stages of merge can then be run one by one.
+        """
+        if train_prev is None:
+            train_prev = self.train_current
+        if train_prev is None:
+            raise ValueError("The previous position of the train is needed to estimate its heading")
+        train_current = parse_coordinates(train_current)
+        train_prev = parse_coordinates(train_prev)
+        if train_prev == train_current and self.get_heading() is None:
+            raise ValueError("The heading of the train is unknown, as the train has not moved since the first frame")
+        self._reset_frame()
+        self.train_current = train_current
+        self.train_prev = train_prev
+        sensor_data = [ingest.as_sensor_record(sensor) for sensor in sensor_data]
+        self.sensor_data = [sensor for sensor in sensor_data if sensor.camera != "UAV"]
+        self.uav_data = ingest.SensorRecord("UAV", None, detection_table.DetectionTable.concatenate(
+            [sensor.table for sensor in sensor_data if sensor.camera == "UAV"]))
+
+    def merge_estimated(self, detections, train_current, train_prev=None):
+        """
+        Merge estimated
+
+        This function runs only the zoning and merging stages of merge on a table of detections whose coordinates,
+        distances and relative bearings are already estimated, e.g. the detections table of a DetectionMerger after
+        estimate_detection_coordinates and prepare_uav_detections. The estimation does not depend on the zones,
+        weights and thresholds, so the detections of a frame can be estimated once and merged with many
+        configurations, see sweep. The table is not modified.
+
+        Args:
+        detections (DetectionTable): The estimated detections of the frame.
+        train_current (str or tuple): The current position of the train.
+        train_prev (str or tuple): The previous position of the train.
+
+        Returns:
+        list: The final list of merged detections of the frame.
+        """
+        self._reset_frame()
+        self.train_current = parse_coordinates(train_current)
+        self.train_prev = parse_coordinates(train_prev)
+        self.detections = detections
+        with self.metrics.stage("zoning"):
+            self.group_detections_into_zones()
+        with self.metrics.stage("merging"):
+            self.run_onboard_merging_algorithm()
+        self.metrics.end_frame()
+        return self.final_results
 
     def group_detections_into_zones(self):
         """
         Group detections into zones
 
-        This function groups the detections in all_detections list into specific zones based on the distance of the
-        detection. It iterates through each detection and retrieves the distance of the detection. For each range of
-        distance in the self.zone_mapping dictionary, it checks if the detection distance falls within that range and
-        if so, it appends the detection to the corresponding zone in the self.zones dictionary.
+        This function groups the detections in the self.detections table into specific zones based on the distance of
+        the detection. It looks up the zone of all detections at once using the get_zones method, sorts the detection
+        indices by zone, and appends the indices of each zone to the corresponding zone in the self.zones dictionary.
+        Within a zone, the detections keep their order.
 
         Args:
         None
@@ -129,24 +428,24 @@ class DetectionMerger(object):
         Returns:
         None
         """
-        for detection in self.all_detections:
-            distance = float(detection["distance"])
-            for (low, high), zone in self.zone_mapping.items():
-                if low <= distance < high:
-                    self.zones[zone].append(detection)
-                    break
+        zone_ids = self.get_zones(self.detections.distance)
+        order = np.argsort(zone_ids, kind="stable")
+        counts = np.bincount(zone_ids, minlength=len(self.zones) + 1)
+        # the first part of the order are the detections that are not in any zone
+        for zone, indices in zip(range(1, len(self.zones) + 1), np.split(order, np.cumsum(counts)[:-1])[1:]):
+            self.zones[zone].extend(indices.tolist())
 
     def run_onboard_merging_algorithm(self):
         """
         Run onboard merging algorithm.
 
-        This function runs the onboard merging algorithm to merge similar detections in each zone. It iterates through
-        each zone in self.zones and calls the find_similar_detections method on each zone, passing the zone and zone_id
-        as arguments. The find_similar_detections method is used to identify and merge similar detections in the zone.
-        It then iterates through each detection in the zone, and append the detection to the final detection list. The
-        final detection list is a dictionary containing the object class and estimated coordinates of the detection.
-        The final detections of each zone is added to the self.merged_zones dictionary
-        It then flattens the self.final_results and returns it
+        This function runs the onboard merging algorithm to merge similar detections in each zone. It calls the
+        merge_zone method on each zone in self.zones, passing the zone_id and the table of the detections in the zone as
+        arguments. Since the zones are
+        independent of each other, the zones are merged concurrently if self.executor is set to a thread or process
+        pool. The final detections of each zone are added to the self.merged_zones dictionary and, in the order of the
+        zones, to the self.final_results list, so the results are the same as when the zones are merged one by one.
+        The cameras each final detection was merged from are added to the self.merged_sources dictionary.
 
         Args:
         None
@@ -154,232 +453,388 @@ class DetectionMerger(object):
         Returns:
         List : List of merged detections.
         """
-        for zone_id, zone_detections in self.zones.items():
-            # print information about detections in the zone if self.verbose is set to true.
-            if self.verbose:
-                print(f"All detections in zone {zone_id}:")
-                for det in zone_detections:
-                    print(f" {det['camera']} {det['objectclass']}, estimated GPS coordinate: "
-                          f"{det['estimated_coordinates']}, distance: {det['distance']}m, relative bearing: "
-                          f"{det['relative_bearing']}")
-                print(f"Finding similar detections for zone {zone_id}...")
-            # for each zone, find similar detections and merge if duplicates are present:
-            self.find_similar_detections(zone_detections, zone_id)
-            # add detections that are not potential duplicates into the final detections:
-            for det in zone_detections:
-                final_detection = {det["objectclass"]: det["estimated_coordinates"]}
-                self.merged_zones[zone_id].append(final_detection)
+        zone_tables = [(zone_id, self.detections.take(indices)) for zone_id, indices in self.zones.items()]
+        # the cameras and, with metrics, the counters of each zone are returned with its detections, as the zone may
+        # be merged in another process
+        counted = self.metrics.enabled
+        if self.executor is None:
+            merged_zones = [self._merge_zone_task(zone_id, zone_detections, counted)
+                            for zone_id, zone_detections in zone_tables]
+        else:
+            futures = [self.executor.submit(self._merge_zone_task, zone_id, zone_detections, counted)
+                       for zone_id, zone_detections in zone_tables]
+            merged_zones = [future.result() for future in futures]
+        for zone_id, (merged_zone, sources, counts) in zip(self.zones, merged_zones):
+            if counts is not None:
+                self.metrics.count(counts, zone_id)
+            # detections merged in another process are copies, not the lists in self.merged_zones
+            self.merged_zones[zone_id][:] = merged_zone
+            self.merged_sources[zone_id][:] = sources
             # add final zone data to the self.final_results list
-            for det in self.merged_zones[zone_id]:
-                self.final_results.append(det)
+            self.final_results.extend(merged_zone)
+        return self.final_results
 
-            if self.verbose:
-                print(f"All detections in zone {zone_id} after merge: ", self.merged_zones[zone_id])
-                print(f"Zone {zone_id} merged successfully.\n")
+    def _merge_zone_task(self, zone_id, zone_detections, counted=False):
+        """
+        Merges a zone and returns its merged detections together with their cameras and, if counted, the counters of
+        the merging algorithm, or None.
+        """
+        counts = {"detections": len(zone_detections)} if counted else None
+        merged_zone = self.merge_zone(zone_id, zone_detections, counts)
+        return merged_zone, self.merged_sources[zone_id], counts
 
-    def find_similar_detections(self, zone_detections, zone_id):
+    def result_sources(self):
+        """
+        Returns the zone id and the cameras of the detections every final detection was merged from, in the same order
+        as self.final_results.
+        """
+        return [(zone_id, cameras) for zone_id, sources in self.merged_sources.items() for cameras in sources]
+
+    def merge_zone(self, zone_id, zone_detections, counts=None):
+        """
+        Merge zone
+
+        This function merges similar detections in one zone. It calls the find_similar_detections method on the zone,
+        which is used to identify and merge similar detections in the zone. It then iterates through each remaining
+        detection in the zone, and appends the detection to the merged detections of the zone and its camera to the
+        sources of the zone. A final detection is a dictionary containing the object class and estimated coordinates
+        of the detection.
+
+        Args:
+        zone_id (int): The id of the zone
+        zone_detections (DetectionTable): A table of the detections in the zone
+        counts (dict): Counters of the merging algorithm that are added to if given, see find_similar_pairs.
+
+        Returns:
+        List : List of merged detections of the zone.
+        """
+        # print information about detections in the zone if self.verbose is set to true.
+        if self.verbose:
+            print(f"All detections in zone {zone_id}:")
+            for det in zone_detections.to_dicts():
+                print(f" {det['camera']} {det['objectclass']}, estimated GPS coordinate: "
+                      f"{det['estimated_coordinates']}, distance: {det['distance']}m, relative bearing: "
+                      f"{det['relative_bearing']}")
+            print(f"Finding similar detections for zone {zone_id}...")
+        # find similar detections and merge if duplicates are present:
+        remaining = self.find_similar_detections(zone_detections, zone_id, counts)
+        # add detections that are not potential duplicates into the final detections:
+        for index in remaining:
+            final_detection = {zone_detections.objectclass_name(index): zone_detections.estimated_coordinates(index)}
+            self.merged_zones[zone_id].append(final_detection)
+            self.merged_sources[zone_id].append([zone_detections.camera_name(index)])
+
+        if self.verbose:
+            print(f"All detections in zone {zone_id} after merge: ", self.merged_zones[zone_id])
+            print(f"Zone {zone_id} merged successfully.\n")
+        return self.merged_zones[zone_id]
+
+    def find_similar_detections(self, zone_detections, zone_id, counts=None):
         """
         Find similar detections
 
         This function finds similar detections within a zone. It takes in a zone and a zone_id as arguments.
-        It uses the itertools library to iterate through all possible combinations of detections in the zone, and
-        compares detections from different sensors. It then checks if the detections have the same object class, and
-        if so, it calculates the distance and angle between the detections. If the distance and angle between the
-        detections fall within the defined distance and angle thresholds, the detections are considered similar and
-        added to the similar_detections dictionary. If similar detections are found, it calls the
-        merge_similar_detections method and passing the similar_detections and zone_id as arguments.
+        It uses the find_similar_pairs method to get all pairs of detections from different sensors with the same
+        object class whose distance and angle fall within the defined distance and angle thresholds. The detections of
+        these pairs are considered similar. The similar detections are clustered into groups by the
+        cluster_similar_detections method. If similar detections are found, it calls the merge_similar_detections
+        method and passing the zone, the groups of similar detections and zone_id as arguments.
 
         Args:
-        zone_detections (list): A list of detections in a specific zone
+        zone_detections (DetectionTable): A table of the detections in a specific zone
         zone_id (str): The id of the zone
+        counts (dict): Counters of the merging algorithm that are added to if given, see find_similar_pairs.
 
         Returns:
-        None
+        list: The indices of the detections in the zone that are not similar to any other detection.
         """
-        similar_detections = {}
-        for a, b in itertools.combinations(zone_detections, 2):
-            # compare detections from different sensors
-            if not a['camera'] == b["camera"]:
-                # identify detections with the same class
-                if a["objectclass"] == b["objectclass"]:
-                    # find the distance and angle between the detections of same class
-                    gap = geographic_estimations.calculate_distance(a["estimated_coordinates"],
-                                                                    b["estimated_coordinates"])
-                    angle_dif = abs(a["relative_bearing"] - b["relative_bearing"])
-                    if gap < self.distance_threshold:
-                        # detection_groups = {}
-                        if angle_dif < self.angle_threshold:
-                            # if not detection_groups:
-                            #     detection_groups["group_1"]: []
-                            objectclass = a["objectclass"]
-                            if objectclass not in similar_detections.keys():
-                                similar_detections[objectclass] = []
-                            if a not in similar_detections[objectclass]:
-                                similar_detections[objectclass].append(a)
-                                zone_detections.remove(a)
-                            if b not in similar_detections[objectclass]:
-                                similar_detections[objectclass].append(b)
-                                zone_detections.remove(b)
-
-        if similar_detections:
+        similar_pairs = self.find_similar_pairs(zone_detections, counts)
+        groups = self.cluster_similar_detections(zone_detections, similar_pairs)
+        if counts is not None:
+            counts["groups_merged"] = counts.get("groups_merged", 0) + len(groups)
+        similar = {index for pair in similar_pairs for index in pair}
+
+        if groups:
             # print information about similar detections if self.verbose is set to true
             if self.verbose:
-                print(f"Found similar detections in zone {zone_id}. List of similar detections:")
-                for objectclass, dets in similar_detections.items():
-                    print(" objectclass: ", objectclass)
-                    for det in dets:
+                print(f"Found similar detections in zone {zone_id}. Groups of similar detections:")
+                for group, indices in groups.items():
+                    print(" group: ", group)
+                    for det in map(zone_detections.to_dict, indices):
                         print(f"  {det['camera']} {det['objectclass']}, estimated GPS coordinate: "
                               f"{det['estimated_coordinates']}, distance: {det['distance']}m, relative bearing: "
                               f"{det['relative_bearing']}")
                 print("Attempting to merge...")
             # merge similar detections with weights
-            self.merge_similar_detections(similar_detections, zone_id)
+            self.merge_similar_detections(zone_detections, groups, zone_id)
         else:
             if self.verbose:
                 print(f"no similar detections to be merged found for zone {zone_id}")
+        return [index for index in range(len(zone_detections)) if index not in similar]
+
+    def cluster_similar_detections(self, zone_detections, similar_pairs):
+        """
+        Cluster similar detections
+
+        This function clusters the detections of the similar pairs of a zone into groups of detections that are merged
+        into one detection each. The clustering strategy is set by self.clustering:
+            - "angle": the similar detections of each object class are grouped into ranges of relative bearing using
+              the group_similar_detections_by_angle method.
+            - "connected": detections are in the same group if they are connected by a chain of similar pairs. The
+              groups are found with union-find over the detection indices.
 
-    def merge_similar_detections(self, similar_detections, zone_id):
+        Args:
+        zone_detections (DetectionTable): A table of the detections in a specific zone
+        similar_pairs (list): Index pairs (i, j) of similar detections in the zone, as returned by find_similar_pairs
+
+        Returns:
+        dict: The indices of the detections in every group, keyed by the angle range or the number of the group.
+        """
+        if self.clustering == "connected":
+            return dict(enumerate(clustering.cluster_pairs(len(zone_detections), similar_pairs)))
+        if self.clustering != "angle":
+            raise ValueError(f"Unknown clustering strategy '{self.clustering}', "
+                             f"expected one of {clustering_strategies}")
+        # similar detections of each object class, in the order in which they first appear in the pairs
+        similar_detections = {}
+        seen = set()
+        objectclasses = zone_detections.objectclass.tolist()
+        for pair in similar_pairs:
+            for index in pair:
+                if index not in seen:
+                    seen.add(index)
+                    similar_detections.setdefault(objectclasses[index], []).append(index)
+        return self.group_similar_detections_by_angle(similar_detections, zone_detections)
+
+    def find_similar_pairs(self, zone_detections, counts=None):
+        """
+        Find similar pairs
+
+        This function finds all pairs of similar detections within a zone. Instead of comparing every possible
+        combination of detections, the detections are put into a spatial grid bucketed by object class, so that only
+        detections of the same class in neighbouring grid cells are compared. A pair is similar if the detections come
+        from different sensors and both the distance and the angle between them are below the defined thresholds.
+
+        If counts is given, the number of candidate pairs of the same object class that are compared (pairs_compared)
+        and of the pairs that pass the camera (pairs_camera), angle (pairs_angle) and distance (pairs_distance) gates
+        one after another are added to it.
+
+        Args:
+        zone_detections (DetectionTable): A table of the detections in a specific zone
+        counts (dict): Counters of the merging algorithm that are added to if given.
+
+        Returns:
+        list: Index pairs (i, j) with i < j of similar detections, in the same order as itertools.combinations.
+        """
+        objectclasses = zone_detections.objectclass.tolist()
+        cameras = zone_detections.camera.tolist()
+        bearings = zone_detections.relative_bearing.tolist()
+        coordinates = list(zip(zone_detections.latitude.tolist(), zone_detections.longitude.tolist()))
+        grid = spatial_index.DetectionGrid(self.distance_threshold, self.get_context())
+        grid.insert_all(objectclasses, zone_detections.coordinates)
+        similar_pairs = []
+        compared = different_cameras = within_angle = 0
+        for i, j in grid.candidate_pairs():
+            compared += 1
+            # compare detections from different sensors
+            if cameras[i] == cameras[j]:
+                continue
+            different_cameras += 1
+            # find the distance and angle between the detections of same class
+            angle_dif = abs(bearings[i] - bearings[j])
+            if angle_dif < self.angle_threshold:
+                within_angle += 1
+                gap = geographic_estimations.calculate_distance(coordinates[i], coordinates[j], self.distance_method,
+                                                                self.train_current)
+                if gap < self.distance_threshold:
+                    similar_pairs.append((i, j))
+        if counts is not None:
+            for name, value in (("pairs_compared", compared), ("pairs_camera", different_cameras),
+                                ("pairs_angle", within_angle), ("pairs_distance", len(similar_pairs))):
+                counts[name] = counts.get(name, 0) + value
+        return similar_pairs
+
+    def merge_similar_detections(self, zone_detections, groups, zone_id):
         """
         Merge similar detections
 
-        This function takes in similar_detections and zone_id as arguments. It groups the detections based on the angle
-        range using the group_similar_detections_by_angle method. For each group of detections, it iterates through each
-        detection and accumulates the latitude and longitude using a weighted average. The weight is determined by the
+        This function takes in the table of detections in a zone, the groups of similar detections found by
+        cluster_similar_detections and zone_id as arguments. All groups are merged at once by the merge_groups
+        method into the weighted average of the coordinates of their detections. The weight is determined by the
         camera source of the detection, and the zone it was detected in.
-        It then creates a final detection dictionary containing the object class and the final estimated coordinates,
-        and adds it to the self.merged_zones dictionary.
+        It then creates a final detection dictionary for each group containing the object class and the final estimated
+        coordinates, and adds it to the self.merged_zones dictionary and the cameras of the group to the
+        self.merged_sources dictionary.
 
         Args:
-        similar_detections (dict): A dictionary containing similar detections.
+        zone_detections (DetectionTable): A table of the detections in the zone.
+        groups (dict): A dictionary containing the indices of the detections of every group of similar detections.
         zone_id (str): The id of the zone in which the detections were found.
 
         Returns:
         None
         """
-        grouped_dict = self.group_similar_detections_by_angle(similar_detections)
-        if self.verbose:
-            print(f"Grouped similar detections by angle: ")
-            for angle_range, dets in grouped_dict.items():
-                print("angle range: ", angle_range)
-                for det in dets:
-                    print(" ", det["camera"], det["objectclass"], det["distance"], "m", det["estimated_coordinates"],
-                          "relative bearing:",
-                          det["relative_bearing"])
-        for angle_range, detections in grouped_dict.items():
-            accumulated_weight = 0
-            latitude = 0
-            longitude = 0
-            objectclass = None
+        coordinates = self.merge_groups(zone_detections, list(groups.values()), zone_id).tolist()
+        for (group, indices), final_estimation in zip(groups.items(), coordinates):
+            objectclass = zone_detections.objectclass_name(indices[-1])
             if self.verbose:
-                print(f"Merging group of similar detections in Zone {zone_id} in the angle range:", angle_range)
-            for det in detections:
-                objectclass = det["objectclass"]
-                weight = self.weights[det["camera"]][zone_id - 1]
-                latitude = latitude + det["estimated_coordinates"][0] * weight
-                longitude = longitude + det["estimated_coordinates"][1] * weight
-                accumulated_weight += weight
-                if self.verbose:
-                    print("    -> merged", det["camera"], det["objectclass"], det["estimated_coordinates"],
-                          f"with accumulated weight:{accumulated_weight}")
-            final_estimation = (latitude / accumulated_weight, longitude / accumulated_weight)
-            final_detection = {objectclass: final_estimation}
+                print(f"Merging group of similar detections in Zone {zone_id}:", group)
+                weights = self.get_weights(zone_detections.camera[indices], zone_id)
+                for index, accumulated_weight in zip(indices, np.cumsum(weights).tolist()):
+                    print("    -> merged", zone_detections.camera_name(index), objectclass,
+                          zone_detections.estimated_coordinates(index),
+                          f"with accumulated weight:{accumulated_weight:g}")
+            final_detection = {objectclass: tuple(final_estimation)}
             self.merged_zones[zone_id].append(final_detection)
+            self.merged_sources[zone_id].append([zone_detections.camera_name(index) for index in indices])
             if self.verbose:
                 print(f"Similar group of {objectclass}s merged successfully. Final merged result: {final_detection}")
         if self.verbose:
             print(f"Found and merged all similar detections for zone {zone_id}.")
 
-    def group_similar_detections_by_angle(self, similar_detections_dict):
+    def merge_groups(self, detections, groups, zone_ids):
+        """
+        Merge groups
+
+        This function computes the weighted average of the coordinates of the detections of every group in one batch.
+        The detections of all groups are laid out one group after another with the number of their group, their weights
+        are looked up in the camera x zone weight matrix, and the weights and weighted coordinates are summed per group
+        with np.bincount. Since bincount adds up the detections of each group in their order, the averages are
+        exactly the same as when accumulating each group one detection at a time. The groups can come from different
+        zones.
+
+        Args:
+        detections (DetectionTable): The table the indices of the groups refer to.
+        groups (list): The indices of the detections of every group.
+        zone_ids (int or array_like): The zone id of every group, or one zone id for all groups.
+
+        Returns:
+        numpy.ndarray: The merged coordinates of every group, with shape (len(groups), 2).
+        """
+        sizes = np.fromiter(map(len, groups), dtype=np.intp, count=len(groups))
+        members = np.fromiter(itertools.chain.from_iterable(groups), dtype=np.intp, count=int(sizes.sum()))
+        group_ids = np.repeat(np.arange(len(groups)), sizes)
+        member_zones = np.repeat(np.broadcast_to(np.asarray(zone_ids, dtype=np.intp), len(groups)), sizes)
+        weights = self.get_weights(detections.camera[members], member_zones)
+        accumulated_weights = np.bincount(group_ids, weights, len(groups))
+        latitudes = np.bincount(group_ids, detections.latitude[members] * weights, len(groups))
+        longitudes = np.bincount(group_ids, detections.longitude[members] * weights, len(groups))
+        return np.stack((latitudes / accumulated_weights, longitudes / accumulated_weights), axis=-1)
+
+    def group_similar_detections_by_angle(self, similar_detections_dict, zone_detections):
         """
         Group similar detections by angle
 
-        This function takes in similar_detections_dict as an argument, which is a dictionary containing similar
-        detections. It groups the detections based on the angle range using a defaultdict(list) and a for loop.
-        It finds the minimum and maximum angles among the detections, and calculates the number of ranges needed based
-        on the angle threshold. It then iterates over the list of detections, and groups them into the dictionary based
-        on the angle range they fall into.
+        This function takes in similar_detections_dict as an argument, which is a dictionary containing the indices of
+        similar detections of each object class in the zone_detections table. It groups the detections based on the
+        angle range using a defaultdict(list). The ranges of each object class start at the minimum angle among its
+        detections and are angle_threshold wide, so the range of a detection is found directly from its distance to
+        the minimum angle, in constant time per detection. The range is then corrected by one if the rounding of the
+        division puts the angle just outside of it, so that every detection lies within the range of its key. The
+        detections at the maximum angle are always kept, also if all detections have the same angle.
 
         Args:
-        similar_detections_dict (dict): A dictionary containing similar detections.
+        similar_detections_dict (dict): A dictionary containing the indices of similar detections.
+        zone_detections (DetectionTable): A table of the detections in the zone.
 
         Returns:
-        grouped_dict (dict): A dictionary containing the detections grouped by angle range.
+        grouped_dict (dict): A dictionary containing the indices of the detections grouped by angle range, keyed by
+        (range_start, range_end).
         """
+        bearings = zone_detections.relative_bearing
+        range_size = self.angle_threshold
         grouped_dict = defaultdict(list)
         for objectclass, detections in similar_detections_dict.items():
-            # Find the minimum and maximum angles
-            min_bearing = min(d['relative_bearing'] for d in detections)
-            max_bearing = max(d['relative_bearing'] for d in detections)
-            # Define the range size
-            range_size = self.angle_threshold
-            # Calculate the number of ranges
-            num_ranges = ceil((max_bearing - min_bearing) / range_size)
-            # Create a dictionary with default values as lists
-
-            # Iterate over the list of dictionaries and group them based on the angle range
-            for d in detections:
-                for i in range(num_ranges):
-                    range_start = min_bearing + i * range_size
-                    range_end = range_start + range_size
-                    if range_start <= d['relative_bearing'] < range_end:
-                        grouped_dict[(range_start, range_end)].append(d)
+            class_bearings = bearings[detections]
+            min_bearing = float(class_bearings.min())
+            # index of the range of each detection
+            ranges = np.floor((class_bearings - min_bearing) / range_size)
+            ranges -= class_bearings < min_bearing + ranges * range_size
+            ranges += class_bearings >= min_bearing + ranges * range_size + range_size
+            for d, i in zip(detections, ranges.tolist()):
+                range_start = min_bearing + i * range_size
+                range_end = range_start + range_size
+                grouped_dict[(range_start, range_end)].append(d)
         return grouped_dict
 
-    def estimate_detection_coordinates(self):
+    def get_context(self):
+        """
+        Returns the geodetic context of the train's current and previous positions, with the heading of the train and
+        the trigonometry of its position that are shared by the estimation of all detections of the frame. The context
+        is only created again when the positions of the train change. If the previous position is the same as the
+        current one, e.g. for a train that has stopped or a repeated GPS fix, the last valid heading is kept instead of
+        the meaningless bearing between two identical points.
+        """
+        if self.context is None or not self.context.matches(self.train_current, self.train_prev):
+            # a train that has not moved keeps the heading of the previous context
+            heading = self.context.heading if self.context is not None and self.context.has_heading else None
+            self.context = geographic_estimations.GeodeticContext(self.train_current, self.train_prev, heading)
+        return self.context
+
+    def get_heading(self):
+        """
+        Returns the heading of the train in degrees, the heading of an earlier frame if the train has not moved since,
+        or None if it is unknown, see get_context.
         """
-        Estimate GPS coordinates for detections from all sensors and append to self.all_detections list.
+        if self.train_current is None:
+            return None
+        context = self.get_context()
+        return context.heading if context.has_heading else None
 
-        This function uses the sensor's detected objects and their data to calculate estimated GPS coordinates and
-        bearing if entering the region of interest (ROI). The function calls calculate_coordinates_from_image_data which
-        takes in the detection, image size, and train's current and previous coordinates, to calculate the coordinates
-        of the object. The calculated coordinates and bearing are then added to the detection dictionary and appended to
-        the self.all_detections list.
+    def estimate_detection_coordinates(self):
+        """
+        Estimate GPS coordinates for detections from all sensors and add them to the self.detections table.
+
+        This function takes the table of the sensor's detected objects that are entering the region of interest (ROI)
+        from the sensor record and calculates their estimated GPS coordinates and bearing. The function calls
+        calculate_coordinates_from_image_boxes which takes in the bounding boxes and distances of all detections of the
+        sensor, image size, and train's current and previous coordinates, to calculate the coordinates of the objects.
+        The calculated coordinates and bearings are then stored in the table, and the tables of all sensors are
+        combined into the self.detections table.
         Args:
         None
         Returns:
         None
         """
+        context = self.get_context()
+        tables = []
         for sensor in self.sensor_data:
-            camera = sensor["camera"]
-            for detection in sensor["objects"]:
-                if detection["entering_ROI"]:
-                    coordinates = geographic_estimations.calculate_coordinates_from_image_data(detection,
-                                                                                               sensor["imagesize"],
-                                                                                               self.train_current,
-                                                                                               self.train_prev)
-                    self.test_estimations.append({detection['objectclass']: coordinates})
-                    bearing = geographic_estimations.calculate_compass_bearing(self.train_current, coordinates)
-                    detection["estimated_coordinates"] = coordinates
-                    detection["relative_bearing"] = bearing if bearing < 180 else bearing - 360
-                    detection["camera"] = camera
-                    self.all_detections.append(detection)
+            table = sensor.table
+            if not len(table):
+                continue
+            # estimate the coordinates of all detections of the sensor at once
+            coordinates = geographic_estimations.calculate_coordinates_from_image_boxes(
+                table.x_min, table.x_max, table.y_max, table.distance, sensor.imagesize, self.train_current,
+                self.train_prev, context)
+            table.latitude[:] = coordinates[:, 0]
+            table.longitude[:] = coordinates[:, 1]
+            tables.append(table)
+        self.detections = detection_table.DetectionTable.concatenate(tables)
+        bearings = context.bearings(self.detections.coordinates)
+        self.detections.relative_bearing[:] = np.where(bearings < 180, bearings, bearings - 360)
 
     def prepare_uav_detections(self):
         """
         Prepare UAV detections
 
-        This function prepares UAV detections by iterating through the objects in uav_data. It checks if the detection
-        is entering the region of interest, and if so, it calculates the coordinates and relative bearing of the object
-        using GPS data. It also calculates the distance between the object and the train's current coordinates. The
-        detection dictionary is then modified to include these calculated values and the camera source is set to "UAV".
-        The detection is then appended to the uav_detections and all_detections lists and the uav_data is appended to
-        the sensor_data list.
+        This function prepares UAV detections by taking the table of the objects in uav_data that are entering the
+        region of interest, with the GPS coordinates of the objects, from the sensor record. It calculates the relative
+        bearing of the objects and the distance between the objects and the train's current coordinates, which are
+        stored in the table. The table is then added to the self.detections table and the uav_data is appended to the
+        sensor_data list.
         Args:
         None
         Returns:
         None
         """
-        for detection in self.uav_data["objects"]:
-            if detection["entering_ROI"]:
-                coordinates = (float(detection["GPS_object"]["latitude"]), float(detection["GPS_object"]["longitude"]))
-                bearing = geographic_estimations.calculate_compass_bearing(self.train_current, coordinates)
-                detection["relative_bearing"] = bearing if bearing < 180 else bearing - 360
-                detection["distance"] = geographic_estimations.calculate_distance(self.train_current, coordinates)
-                detection["estimated_coordinates"] = coordinates
-                detection["camera"] = "UAV"
-                detection.pop("GPS_object")
-                self.uav_detections.append(detection)
-                self.all_detections.append(detection)
+        table = self.uav_data.table
+        if len(table):
+            context = self.get_context()
+            coordinates = table.coordinates
+            bearings = context.bearings(coordinates)
+            table.relative_bearing[:] = np.where(bearings < 180, bearings, bearings - 360)
+            table.distance[:] = context.distances(coordinates, self.distance_method)
+            self.detections = detection_table.DetectionTable.concatenate([self.detections, table])
         self.sensor_data.append(self.uav_data)
 
     def plot_results(self, label, coordinates, color):
@@ -393,9 +848,19 @@ class DetectionMerger(object):
         :param color: the color of the marker on the map.
         :type color: str
         """
+        import folium
+        if self.map is None:
+            self._initialize_map()
         folium.Marker(location=coordinates, icon=folium.Icon(color=color, icon=label, prefix='fa')).add_to(self.map)
 
     def draw_on_map(self):
+        if self.map_file:
+            # write the detections, results and train positions to a file as clustered layers
+            frame_map = route_map.RouteMap()
+            frame_map.add_train_position(self.train_prev)
+            frame_map.add_frame({"train_current": self.train_current, "results": self.final_results}, self.detections)
+            frame_map.save(self.map_file)
+            return
         # draw estimated positions of all detections on the map
         for det in self.all_detections:
             self.plot_results(det["objectclass"], det['estimated_coordinates'], icon_colors[det['camera']])
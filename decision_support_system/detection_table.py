@@ -0,0 +1,162 @@
+import numpy as np
+
+# type of every column of a DetectionTable
+column_types = {
+    "objectclass": np.int32,  # code of the object class in the table's classes
+    "camera": np.int8,  # code of the camera in the table's cameras
+    "x_min": np.float64,
+    "x_max": np.float64,
+    "y_max": np.float64,
+    "distance": np.float64,  # distance to the detection from the train's current position in meters
+    "latitude": np.float64,  # estimated GPS coordinates of the detection
+    "longitude": np.float64,
+    "relative_bearing": np.float64,  # bearing from the train's current position between -180° and 180°
+}
+
+
+class StringTable(object):
+    """Interns strings such as object classes and cameras as integer codes."""
+
+    def __init__(self, names=()):
+        self.names = []
+        self.codes = {}
+        for name in names:
+            self.code(name)
+
+    def code(self, name):
+        """Returns the code of the given string, adding the string to the table if it is new."""
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+    def __getitem__(self, code):
+        return self.names[code]
+
+    def __len__(self):
+        return len(self.names)
+
+
+# string tables shared by all detection tables of the process, so their codes can be compared across tables
+object_classes = StringTable()
+cameras = StringTable(["RGB1", "RGB4", "Monochrome", "Thermal", "SWIR", "UAV"])
+
+
+class DetectionTable(object):
+    """
+    Columnar store of detections.
+
+    Every field of the detections is stored in a typed numpy array (see column_types), with the object class and the
+    camera stored as integer codes into the string tables of the table. The string encoded numbers of the sensor data
+    are parsed once when the table is created from the sensor data, and all later stages of the DetectionMerger work on
+    the columns of the table.
+    """
+
+    def __init__(self, size=0, classes=None, camera_names=None, **columns):
+        """
+        Initializes a table with the given number of detections.
+
+        Args:
+        size (int): The number of detections if no columns are given.
+        classes (StringTable): The string table of the object classes, object_classes by default.
+        camera_names (StringTable): The string table of the cameras, cameras by default.
+        columns (array_like): The values of the columns, by column name.
+        """
+        self.classes = object_classes if classes is None else classes
+        self.cameras = cameras if camera_names is None else camera_names
+        columns = {name: np.asarray(values, dtype=column_types[name]) for name, values in columns.items()}
+        if columns:
+            size = len(next(iter(columns.values())))
+        for name, dtype in column_types.items():
+            if name in columns:
+                setattr(self, name, columns[name])
+            else:
+                setattr(self, name, np.full(size, np.nan, dtype=dtype) if dtype == np.float64
+                        else np.zeros(size, dtype=dtype))
+
+    @classmethod
+    def from_onboard_sensor(cls, sensor):
+        """
+        Creates a table from the detections of an on-board sensor that are entering the region of interest.
+
+        Args:
+        sensor (dict): The data of an on-board sensor, in the same format as the JSON file of the sensor.
+
+        Returns:
+        DetectionTable: The table of the detections, without estimated coordinates and bearings.
+        """
+        objects = [detection for detection in sensor["objects"] if detection["entering_ROI"]]
+        table = cls(objectclass=[object_classes.code(detection["objectclass"]) for detection in objects],
+                    x_min=[float(detection["x_min"]) for detection in objects],
+                    x_max=[float(detection["x_max"]) for detection in objects],
+                    y_max=[float(detection["y_max"]) for detection in objects],
+                    distance=[float(detection["distance"]) for detection in objects])
+        table.camera[:] = cameras.code(sensor["camera"])
+        return table
+
+    @classmethod
+    def from_uav_sensor(cls, sensor):
+        """
+        Creates a table from the detections of the UAV that are entering the region of interest.
+
+        Args:
+        sensor (dict): The data of the UAV, in the same format as the JSON file of the UAV.
+
+        Returns:
+        DetectionTable: The table of the detections with their GPS coordinates, without distances and bearings.
+        """
+        objects = [detection for detection in sensor["objects"] if detection["entering_ROI"]]
+        table = cls(objectclass=[object_classes.code(detection["objectclass"]) for detection in objects],
+                    latitude=[float(detection["GPS_object"]["latitude"]) for detection in objects],
+                    longitude=[float(detection["GPS_object"]["longitude"]) for detection in objects])
+        table.camera[:] = cameras.code("UAV")
+        return table
+
+    @classmethod
+    def concatenate(cls, tables):
+        """Returns a table with the detections of all given tables, which have to share their string tables."""
+        if not tables:
+            return cls()
+        columns = {name: np.concatenate([getattr(table, name) for table in tables]) for name in column_types}
+        return cls(classes=tables[0].classes, camera_names=tables[0].cameras, **columns)
+
+    def take(self, indices):
+        """Returns a table with the detections at the given indices."""
+        indices = np.asarray(indices, dtype=np.intp)
+        columns = {name: getattr(self, name)[indices] for name in column_types}
+        return DetectionTable(classes=self.classes, camera_names=self.cameras, **columns)
+
+    def __len__(self):
+        return len(self.objectclass)
+
+    @property
+    def coordinates(self):
+        """The estimated GPS coordinates of all detections as an array of shape (n, 2)."""
+        return np.stack((self.latitude, self.longitude), axis=-1)
+
+    def objectclass_name(self, index):
+        return self.classes[self.objectclass[index]]
+
+    def camera_name(self, index):
+        return self.cameras[self.camera[index]]
+
+    def estimated_coordinates(self, index):
+        return float(self.latitude[index]), float(self.longitude[index])
+
+    def to_dict(self, index):
+        """Returns the detection at the given index as a dictionary, in the format used for printing and plotting."""
+        return {"objectclass": self.objectclass_name(index),
+                "camera": self.camera_name(index),
+                "distance": float(self.distance[index]),
+                "estimated_coordinates": self.estimated_coordinates(index),
+                "relative_bearing": float(self.relative_bearing[index])}
+
+    def to_dicts(self):
+        """Returns all detections as dictionaries."""
+        return [self.to_dict(index) for index in range(len(self))]
+
+    @property
+    def nbytes(self):
+        """The number of bytes used by the columns of the table."""
+        return sum(getattr(self, name).nbytes for name in column_types)
@@ -0,0 +1,316 @@
+#!/usr/bin/python3
+"""
+Evaluation of the accuracy and speed of the DetectionMerger against the actual coordinates of the detections.
+
+The detections of the on-board sensors and the UAV of the recorded sets and of the synthetic frames carry the actual
+coordinates of the detected object. The frames are merged once for every configuration of the geodesy backend
+(distance_method), the clustering strategy and the distance and angle thresholds, and for every configuration the
+position error of the estimated detections before merging, per camera and zone, and of the merged results after
+merging, per zone, is reported together with the throughput of the merging. The error of a merged result is the
+distance to the nearest actual object of its class in the frame. The frames are decoded once before the
+configurations are merged, so the throughput covers the stages of DetectionMerger.merge only:
+
+    python3 decision_support_system/evaluation.py --synthetic 100 --distance_thresholds 10 20 30
+    python3 decision_support_system/evaluation.py drive.dssrec --distance_methods haversine equirectangular
+    python3 decision_support_system/evaluation.py data --train_current "53.0861622, 8.7816742" \
+        --train_prev "53.086040, 8.781514"
+"""
+import os
+import sys
+import argparse
+import copy
+import itertools
+import json
+import time
+
+import numpy as np
+
+import batch
+import decision_support
+import geographic_estimations.geographic_estimations as geographic_estimations
+import ingest
+import recording
+import synthetic
+
+# percentiles of the position errors in the report, in addition to their mean and maximum
+error_percentiles = (50, 95)
+
+
+def read_frames(source, train_current=None, train_prev=None):
+    """
+    Reads the frames of a recording, of a file of newline-delimited JSON frames or of the recorded sets in a directory
+    as dictionaries in the format of the frames of a stream, see streaming. Every recorded set is one frame, with the
+    given train positions if the set has no train file.
+    """
+    if source.endswith(recording.extension):
+        rec = recording.Recording(source)
+        return (rec.to_dict(index) for index in range(len(rec)))
+    if os.path.isdir(source):
+        return ({"frame_id": frame_id, "sensors": [decision_support.read_json(os.path.join(directory, name))
+                                                   for name in batch.sensor_files],
+                 **dict(zip(("train_current", "train_prev"),
+                            batch.read_train_positions(directory, train_current, train_prev)))}
+                for frame_id, directory in enumerate(batch.find_sets(source)))
+    return recording.read_json_frames(source)
+
+
+def source_files(source):
+    """
+    Returns the paths of the files read_frames reads the frames of a source from: the recording or file of frames
+    itself, or the sensor and train files of every recorded set in a directory.
+    """
+    if not os.path.isdir(source):
+        return [source]
+    return [os.path.join(directory, name) for directory in batch.find_sets(source)
+            for name in batch.sensor_files + (batch.train_file,) if os.path.isfile(os.path.join(directory, name))]
+
+
+def actual_coordinates(sensor):
+    """Returns the actual coordinates of the detections of a sensor entering the ROI, NaN where they are missing."""
+    pairs = [recording.parse_pair(detection.get("actual_coordinates")) for detection in sensor["objects"]
+             if detection["entering_ROI"]]
+    return np.array(pairs, dtype=float).reshape(-1, 2)
+
+
+def prepare_frame(frame):
+    """
+    Prepares a frame for the evaluation.
+
+    This function decodes the sensors of a frame, given as dictionaries, into sensor records and collects the actual
+    coordinates of their detections in the order of the detections table of the DetectionMerger after merge: the
+    detections of the on-board sensors in the order of the sensors, followed by those of the UAV.
+
+    Args:
+    frame (dict): The frame in the format of the frames of a stream, with the sensors as dictionaries.
+
+    Returns:
+    tuple: The sensor records, the actual coordinates with shape (n, 2) and the train's current and previous
+    positions.
+    """
+    sensors = [sensor for sensor in frame["sensors"] if sensor["camera"] != "UAV"]
+    sensors += [sensor for sensor in frame["sensors"] if sensor["camera"] == "UAV"]
+    records = [ingest.sensor_from_dict(sensor) for sensor in sensors]
+    actual = np.concatenate([actual_coordinates(sensor) for sensor in sensors] or [np.zeros((0, 2))])
+    return records, actual, frame["train_current"], frame.get("train_prev")
+
+
+def configurations(distance_methods, clusterings, distance_thresholds, angle_thresholds):
+    """Returns every combination of the given settings of the DetectionMerger as dictionaries."""
+    return [{"distance_method": distance_method, "clustering": clustering, "distance_threshold": distance_threshold,
+             "angle_threshold": angle_threshold}
+            for distance_method, clustering, distance_threshold, angle_threshold
+            in itertools.product(distance_methods, clusterings, distance_thresholds, angle_thresholds)]
+
+
+def summarize_errors(errors):
+    """Returns the number, mean, percentiles and maximum of position errors in meters."""
+    errors = np.concatenate(errors) if isinstance(errors, list) and errors else np.asarray(errors, dtype=float)
+    summary = {"count": len(errors)}
+    if len(errors):
+        summary["mean"] = float(np.mean(errors))
+        summary.update((f"p{percentile}", float(value))
+                       for percentile, value in zip(error_percentiles, np.percentile(errors, error_percentiles)))
+        summary["max"] = float(np.max(errors))
+    return summary
+
+
+class ErrorCollector(object):
+    """Collects the position errors of one configuration by camera and by zone, before and after merging."""
+
+    def __init__(self):
+        self.before = {"cameras": {}, "zones": {}, "all": []}
+        self.after = {"zones": {}, "all": []}
+        self.objects = 0
+
+    @staticmethod
+    def _add(groups, keys, errors):
+        for key in np.unique(keys).tolist():
+            groups.setdefault(key, []).append(errors[keys == key])
+
+    def add_frame(self, merger, actual):
+        """
+        Adds the position errors of the frame last merged by the merger, of its detections (see add_detections) and of
+        its merged results (see add_results).
+        """
+        self.add_detections(merger, actual)
+        self.add_results(merger, actual)
+
+    @staticmethod
+    def _known(merger, actual):
+        """Returns the zone ids of the detections and which of them are in a zone and have actual coordinates."""
+        zone_ids = merger.get_zones(merger.detections.distance)
+        return zone_ids, (zone_ids > 0) & ~np.isnan(actual[:, 0])
+
+    def add_detections(self, merger, actual):
+        """
+        Adds the position errors of the detections of the frame last merged by the merger, given the actual
+        coordinates of its detections. The error of a detection is the geodesic distance between its estimated and its
+        actual coordinates. Only the detections in a zone are merged, so the detections outside of all zones and those
+        without actual coordinates are left out.
+        """
+        detections = merger.detections
+        zone_ids, known = self._known(merger, actual)
+        errors = geographic_estimations.calculate_distances(detections.coordinates[known], actual[known])
+        cameras = np.array(detections.cameras.names, dtype=object)[detections.camera[known]]
+        self._add(self.before["cameras"], cameras, errors)
+        self._add(self.before["zones"], zone_ids[known], errors)
+        self.before["all"].append(errors)
+
+    def add_results(self, merger, actual):
+        """
+        Adds the position errors of the merged results of the frame last merged by the merger, given the actual
+        coordinates of its detections. The error of a merged result is the geodesic distance to the nearest actual
+        object of its class among the detections in a zone, which are calculated for all results of a class at once.
+        """
+        detections = merger.detections
+        _, known = self._known(merger, actual)
+        objects = {}
+        for objectclass, coordinates in zip(detections.objectclass[known].tolist(), map(tuple, actual[known].tolist())):
+            objects.setdefault(detections.classes[objectclass], set()).add(coordinates)
+        self.objects += sum(map(len, objects.values()))
+        results = {}
+        for zone_id, zone_results in merger.merged_zones.items():
+            for result in zone_results:
+                for objectclass, coordinates in result.items():
+                    if objectclass in objects:
+                        results.setdefault(objectclass, ([], []))
+                        results[objectclass][0].append(zone_id)
+                        results[objectclass][1].append(coordinates)
+        for objectclass, (zone_ids, coordinates) in results.items():
+            errors = geographic_estimations.calculate_distances(np.array(coordinates)[:, None],
+                                                                np.array(list(objects[objectclass]))[None]).min(axis=1)
+            self._add(self.after["zones"], np.array(zone_ids), errors)
+            self.after["all"].append(errors)
+
+    def summary(self):
+        """Returns the summaries of the errors, see summarize_errors, by camera and zone before and after merging."""
+        return {"before": {"all": summarize_errors(self.before["all"]),
+                           "cameras": {camera: summarize_errors(errors)
+                                       for camera, errors in self.before["cameras"].items()},
+                           "zones": {zone_id: summarize_errors(errors)
+                                     for zone_id, errors in sorted(self.before["zones"].items())}},
+                "after": {"all": summarize_errors(self.after["all"]),
+                          "zones": {zone_id: summarize_errors(errors)
+                                    for zone_id, errors in sorted(self.after["zones"].items())}}}
+
+
+def evaluate(frames, distance_method="geodesic", clustering="angle", distance_threshold=20, angle_threshold=20,
+             config_file=None):
+    """
+    Evaluate
+
+    This function merges prepared frames (see prepare_frame) with a DetectionMerger of the given configuration and
+    measures the time of DetectionMerger.load_frame and merge for every frame, after merging the first frame once
+    to warm up. The position errors are collected after
+    the time of the frame is taken, so they do not count towards the throughput.
+
+    Args:
+    frames (list): The prepared frames.
+    distance_method (str): Method used to calculate distances, one of geographic_estimations.distance_methods.
+    clustering (str): Strategy to cluster similar detections, one of decision_support.clustering_strategies.
+    distance_threshold (float): Distance in meters below which detections of different cameras are similar.
+    angle_threshold (float): Difference of the relative bearings in degrees below which detections are similar.
+    config_file (str): Path to a JSON file with the zone boundaries and weights, see DetectionMerger.load_config.
+
+    Returns:
+    dict: The report of the configuration, with its settings, the number of frames, detections, results and actual
+    objects, the throughput and the summaries of the position errors before and after merging.
+    """
+    merger = decision_support.DetectionMerger(distance_method=distance_method, clustering=clustering,
+                                              config_file=config_file)
+    merger.distance_threshold = distance_threshold
+    merger.angle_threshold = angle_threshold
+    collector = ErrorCollector()
+    if frames:
+        # the first frame is merged once with a copy of the merger, so that caches and lazy imports are not timed
+        records, _, train_current, train_prev = frames[0]
+        copy.copy(merger).merge_frame(records, train_current, train_prev)
+    elapsed = 0.0
+    detections = results = 0
+    for records, actual, train_current, train_prev in frames:
+        start = time.perf_counter()
+        merger.load_frame(records, train_current, train_prev)
+        merger.merge()
+        elapsed += time.perf_counter() - start
+        detections += len(merger.detections)
+        results += len(merger.final_results)
+        collector.add_frame(merger, actual)
+    report = {"distance_method": distance_method, "clustering": clustering, "distance_threshold": distance_threshold,
+              "angle_threshold": angle_threshold, "frames": len(frames), "detections": detections,
+              "results": results, "objects": collector.objects, "merge_s": elapsed,
+              "frames_per_s": len(frames) / elapsed if elapsed else None,
+              "detections_per_s": detections / elapsed if elapsed else None}
+    report.update(collector.summary())
+    return report
+
+
+def format_error(summary):
+    if not summary["count"]:
+        return f"{'-':>7s} {'-':>7s}"
+    return f"{summary['mean']:7.2f} {summary['p95']:7.2f}"
+
+
+def print_reports(reports, details=False, file=sys.stdout):
+    """
+    Prints one line per configuration with its throughput, the mean and 95th percentile of the position errors in
+    meters before and after merging, and the number of merged results per actual object, which is above 1 if
+    duplicates are left and below 1 if different objects are merged. With details, the errors by camera and zone are
+    printed as well.
+    """
+    print(f"{'method':16s} {'clustering':10s} {'dist':>5s} {'angle':>5s} {'frames/s':>9s} {'det/s':>9s}  "
+          f"{'before':>7s} {'p95':>7s}  {'after':>7s} {'p95':>7s}  results/object", file=file)
+    for report in reports:
+        ratio = report["results"] / report["objects"] if report["objects"] else float("nan")
+        print(f"{report['distance_method']:16s} {report['clustering']:10s} {report['distance_threshold']:5g} "
+              f"{report['angle_threshold']:5g} {report['frames_per_s'] or 0:9.1f} "
+              f"{report['detections_per_s'] or 0:9.0f}  {format_error(report['before']['all'])}  "
+              f"{format_error(report['after']['all'])}  {ratio:14.3f}", file=file)
+        if details:
+            for name, summary in report["before"]["cameras"].items():
+                print(f"    before  camera {name:10s} {summary['count']:7d}  {format_error(summary)}", file=file)
+            for stage in ("before", "after"):
+                for zone_id, summary in report[stage]["zones"].items():
+                    print(f"    {stage:6s}  zone   {zone_id:<10d} {summary['count']:7d}  {format_error(summary)}",
+                          file=file)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Evaluate the accuracy and speed of the DetectionMerger against the '
+                                                 'actual coordinates of the detections')
+    parser.add_argument('source', nargs='?', help='File of newline-delimited JSON frames, recording ending with '
+                                                  f'{recording.extension} or directory of recorded sets')
+    parser.add_argument('--synthetic', help='Number of synthetic frames evaluated instead of a source', type=int,
+                        default=100)
+    parser.add_argument('--objects', help='Number of objects per synthetic frame', type=int, default=50)
+    parser.add_argument('--seed', help='Seed of the synthetic frames', type=int, default=0)
+    parser.add_argument('--train_current', help="Train's current position of recorded sets without a train file")
+    parser.add_argument('--train_prev', help="Train's previous position of recorded sets without a train file")
+    parser.add_argument('--distance_methods', nargs='+', choices=geographic_estimations.distance_methods,
+                        default=list(geographic_estimations.distance_methods), help='Geodesy backends to evaluate')
+    parser.add_argument('--clusterings', nargs='+', choices=decision_support.clustering_strategies,
+                        default=list(decision_support.clustering_strategies), help='Clustering strategies to evaluate')
+    parser.add_argument('--distance_thresholds', nargs='+', type=float, default=[20],
+                        help='Distance thresholds in meters to evaluate')
+    parser.add_argument('--angle_thresholds', nargs='+', type=float, default=[20],
+                        help='Angle thresholds in degrees to evaluate')
+    parser.add_argument('--config_file', help='JSON file with the zone boundaries and weights')
+    parser.add_argument('--details', action='store_true', help='Print the errors by camera and zone')
+    parser.add_argument('--output', help='JSON file the reports of all configurations are written to')
+    args = parser.parse_args()
+
+    if args.source is None:
+        frames = synthetic.FrameGenerator(objects=args.objects, seed=args.seed).generate_frames(args.synthetic)
+    else:
+        frames = read_frames(args.source, args.train_current, args.train_prev)
+    frames = [prepare_frame(frame) for frame in frames]
+    reports = [evaluate(frames, config_file=args.config_file, **configuration)
+               for configuration in configurations(args.distance_methods, args.clusterings, args.distance_thresholds,
+                                                   args.angle_thresholds)]
+    print_reports(reports, args.details)
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
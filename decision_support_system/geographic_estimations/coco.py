@@ -0,0 +1,189 @@
+import itertools
+import json
+
+import numpy as np
+
+from . import geographic_estimations
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+_delimiters = ",]}:" + _whitespace
+# the number of characters at the end of the text in which a value can be cut off by the end of a chunk, e.g. the
+# "-Infinit" of -Infinity or the "\\uD834\\uDD" of a surrogate pair, so that a decoding error or a character that
+# cannot follow a value there may only be the end of the chunk
+_lookahead = 16
+
+
+class _JSONBuffer(object):
+    """Text read from a JSON file chunk by chunk, of which only the part that is not decoded yet is kept."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.text = ""
+        self.position = 0
+        # position of the start of the text in the file
+        self.offset = 0
+        self.eof = False
+
+    def fill(self):
+        """Reads the next chunk of the file, returns False at the end of the file."""
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.offset += self.position
+        self.text = self.text[self.position:] + chunk
+        self.position = 0
+        return True
+
+    def peek(self):
+        """Skips whitespace and returns the next character."""
+        while True:
+            while self.position < len(self.text) and self.text[self.position] in _whitespace:
+                self.position += 1
+            if self.position < len(self.text):
+                return self.text[self.position]
+            if not self.fill():
+                raise ValueError("Unexpected end of the JSON file")
+
+    def expect(self, characters):
+        """Consumes the next character, which has to be one of the given characters, and returns it."""
+        character = self.peek()
+        if character not in characters:
+            raise ValueError(f"Expected one of '{characters}' at '{self.text[self.position:self.position + 20]}'")
+        self.position += 1
+        return character
+
+    def error(self, message, position):
+        """Returns a ValueError of malformed JSON at the given position of the text, with its position in the file."""
+        return ValueError(f"{message} at character {self.offset + position} of the JSON file: "
+                          f"'{self.text[position:position + 20]}'")
+
+    def truncated(self, position):
+        """Returns whether a value can be cut off at the given position of the text by the end of the chunk."""
+        return not self.eof and len(self.text) - position <= _lookahead
+
+    def decode(self):
+        """
+        Decodes the next JSON value, reading more of the file while the value can be cut off by the end of the text.
+        An error before the end of the text is an error of the file, which is raised without reading the rest of it.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.position)
+            except json.JSONDecodeError as error:
+                # the position of an unterminated string is its start, so it is only an error at the end of the file
+                if (self.truncated(error.pos) or error.msg.startswith("Unterminated string")) and self.fill():
+                    continue
+                raise self.error(error.msg, error.pos) from error
+            # a number cut off at the end of the text continues in the next chunk, a complete value is followed by a
+            # delimiter
+            if end == len(self.text) or self.text[end] not in _delimiters:
+                if self.truncated(end) and self.fill():
+                    continue
+                if end < len(self.text):
+                    raise self.error("Expected a delimiter after the value", end)
+            self.position = end
+            return value
+
+
+def _iter_array(buffer):
+    buffer.expect("[")
+    if buffer.peek() == "]":
+        buffer.position += 1
+        return
+    while True:
+        yield buffer.decode()
+        if buffer.expect(",]") == "]":
+            return
+
+
+def iter_json_array(f, key, chunk_size=1 << 16):
+    """
+    Yields the items of the array under the given key of the top level object of a JSON file one by one.
+
+    Only the item that is decoded and one chunk of the file are held in memory, so the annotations of a large COCO
+    dataset can be processed without loading the whole file. Arrays under other keys that come before the key are
+    skipped item by item and other values are decoded and dropped.
+
+    :Parameters:
+      - f: the JSON file opened in text mode
+      - key: key of the array in the top level object
+      - chunk_size: number of characters read at once
+    :Returns:
+      Generator of the items of the array, raises a KeyError if the top level object has no such key
+    """
+    buffer = _JSONBuffer(f, chunk_size)
+    buffer.expect("{")
+    if buffer.peek() != "}":
+        while True:
+            name = buffer.decode()
+            buffer.expect(":")
+            if buffer.peek() == "[":
+                items = _iter_array(buffer)
+                if name == key:
+                    yield from items
+                    return
+                for _ in items:
+                    pass
+            else:
+                buffer.decode()
+            if buffer.expect(",}") == "}":
+                break
+    raise KeyError(key)
+
+
+def read_image_index(path, chunk_size=1 << 16):
+    """Returns the height and width of every image of a COCO dataset file by image id, see index_images."""
+    with open(path, encoding="utf-8") as f:
+        return geographic_estimations.index_images(iter_json_array(f, "images", chunk_size))
+
+
+def estimate_annotation_coordinates(annotations, image_index, detections, train_coordinates, train_bearing,
+                                    chunk_size=4096):
+    """
+    Streaming version of prepare_annotations, append_detection_angles, append_detection_coordinates and
+    format_annotations.
+
+    The annotations and the detections with their distances are consumed in chunks of chunk_size, whose bearings and
+    coordinates are calculated with one array operation each, and the formatted annotations with the keys id,
+    coordinates and object_class are yielded one by one.
+
+    :Parameters:
+      - annotations: iterable of the annotations of a COCO dataset, e.g. from iter_json_array
+      - image_index: the height and width of every image by image id, see index_images
+      - detections: iterable of the detections of the annotations, dictionaries with the key distance
+      - train_coordinates: gps coordinates of the train in degrees
+      - train_bearing: compass bearing of the train in degrees
+      - chunk_size: number of annotations processed at once
+    :Returns:
+      Generator of the formatted annotations
+    """
+    pairs = zip(annotations, detections)
+    while True:
+        chunk = list(itertools.islice(pairs, chunk_size))
+        if not chunk:
+            return
+        image_sizes = np.array([image_index[annotation['image_id']] for annotation, _ in chunk], dtype=float)
+        bearings = geographic_estimations.calculate_detection_bearings(
+            [annotation['bbox'] for annotation, _ in chunk], image_sizes[:, 0], image_sizes[:, 1], train_bearing)
+        distances = np.array([detection["distance"] for _, detection in chunk], dtype=float)
+        coordinates = geographic_estimations.calculate_destinations(train_coordinates, distances, bearings)
+        for (annotation, _), detection_coordinates in zip(chunk, coordinates.tolist()):
+            yield {'id': annotation['id'],
+                   'coordinates': tuple(detection_coordinates),
+                   'object_class': geographic_estimations.categories[annotation["category_id"] - 1]}
+
+
+def stream_annotation_coordinates(path, detections, train_coordinates, train_bearing, chunk_size=4096):
+    """
+    Yields the formatted annotations of a COCO dataset file with their estimated coordinates, see
+    estimate_annotation_coordinates. The file is read twice, once for the index of the images and once for the
+    annotations, and never loaded as a whole.
+    """
+    image_index = read_image_index(path)
+    with open(path, encoding="utf-8") as f:
+        yield from estimate_annotation_coordinates(iter_json_array(f, "annotations"), image_index, detections,
+                                                   train_coordinates, train_bearing, chunk_size)
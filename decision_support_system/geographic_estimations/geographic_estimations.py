@@ -1,16 +1,150 @@
-import geopy.distance
 import math
-from math import asin, cos, sin, atan2
+import numpy as np
+from functools import lru_cache
 
 categories = ["bicycle", "bus", "car", "dog", "fallen_tree", "horse",
               "motorbike", "person", "rock", "rock_cluster", "truck"]
 
+earth_radius = 6372795.477598
+# WGS-84 ellipsoid, the same one used by geopy.distance.distance
+wgs84_major_axis = 6378137.0
+wgs84_flattening = 1 / 298.257223563
+wgs84_minor_axis = wgs84_major_axis * (1 - wgs84_flattening)
+# mean earth radius used by the haversine formula
+mean_earth_radius = 6371008.8
+
+# Methods to calculate the distance between two GPS coordinates. The error bounds are relative to the geodesic distance
+# for coordinates within the 0-2 km ranges of the DSS zones:
+#   - geodesic: exact geodesic distance on the WGS-84 ellipsoid (geopy for single points, Vincenty for arrays).
+#   - haversine: great circle distance on a sphere with the mean earth radius. Relative error below 0.5% at any
+#     latitude (about 0.33% in northern Germany), i.e. below 0.1 m for a 20 m gap and below 10 m at 2 km.
+#   - equirectangular: flat projection using the ellipsoid's radii of curvature at an origin, e.g. the train's current
+#     position. Relative error below 0.06% for coordinates within 2 km of the origin at latitudes up to 60°, i.e. about
+#     1 cm for a 20 m gap and below 1.2 m at 2 km.
+distance_methods = ("geodesic", "haversine", "equirectangular")
+
+
+def calculate_distance(coordinate_1, coordinate_2, method="geodesic", origin=None):
+    """
+    Calculates the distance between two GPS coordinates in meters.
 
-def calculate_distance(coordinate_1, coordinate_2):
-    return geopy.distance.distance(coordinate_1, coordinate_2).m
+    :Parameters:
+      - coordinate_1: gps coordinates (in decimal degrees) of the first point
+      - coordinate_2: gps coordinates (in decimal degrees) of the second point
+      - method: one of distance_methods, "geodesic" by default
+      - origin: gps coordinates the equirectangular projection is anchored at, coordinate_1 by default
+    :Returns:
+      The distance between the coordinates in meters
+    :Returns Type:
+      float
+    """
+    if method == "geodesic":
+        # geopy is only imported when needed, it takes longer to import than the rest of the module
+        import geopy.distance
+        return geopy.distance.distance(coordinate_1, coordinate_2).m
+    if method == "haversine":
+        latitude_1 = math.radians(coordinate_1[0])
+        latitude_2 = math.radians(coordinate_2[0])
+        h = (math.sin((latitude_2 - latitude_1) / 2) ** 2 + math.cos(latitude_1) * math.cos(latitude_2)
+             * math.sin(math.radians(coordinate_2[1] - coordinate_1[1]) / 2) ** 2)
+        return 2 * mean_earth_radius * math.asin(math.sqrt(h))
+    if method == "equirectangular":
+        latitude_scale, longitude_scale = get_local_scales(coordinate_1[0] if origin is None else origin[0])
+        return math.hypot((coordinate_2[0] - coordinate_1[0]) * latitude_scale,
+                          (coordinate_2[1] - coordinate_1[1]) * longitude_scale)
+    raise ValueError(f"Unknown distance method '{method}', expected one of {distance_methods}")
+
+
+@lru_cache(maxsize=128)
+def get_local_scales(latitude):
+    """
+    Returns the length in meters of one degree of latitude and of one degree of longitude at the given latitude on the
+    WGS-84 ellipsoid, used by the equirectangular distance method.
+    """
+    eccentricity_sq = wgs84_flattening * (2 - wgs84_flattening)
+    sin_latitude = math.sin(math.radians(latitude))
+    w = 1 - eccentricity_sq * sin_latitude ** 2
+    meridian_radius = wgs84_major_axis * (1 - eccentricity_sq) / w ** 1.5
+    prime_vertical_radius = wgs84_major_axis / math.sqrt(w)
+    return (math.radians(meridian_radius),
+            math.radians(prime_vertical_radius * math.cos(math.radians(latitude))))
 
 
-def calculate_coordinates_from_image_data(detection, im_size, train_cur, train_prev):
+def calculate_distances(coordinates_1, coordinates_2, method="geodesic", origin=None):
+    """
+    Array version of calculate_distance. The geodesic method uses Vincenty's inverse formula on the WGS-84 ellipsoid,
+    which for the distances of up to a few kilometers used here agrees with geopy to well below a millimeter. The
+    distances of nearly antipodal points, for which Vincenty's iteration does not converge, are calculated with geopy.
+
+    :Parameters:
+      - coordinates_1: array of gps coordinates (in decimal degrees) with shape (..., 2)
+      - coordinates_2: array of gps coordinates (in decimal degrees) with shape (..., 2), broadcast against
+        coordinates_1
+      - method: one of distance_methods, "geodesic" by default
+      - origin: gps coordinates the equirectangular projection is anchored at, the first of coordinates_1 by default
+    :Returns:
+      The distances between the coordinates in meters
+    :Returns Type:
+      numpy.ndarray
+    """
+    coordinates_1, coordinates_2 = np.broadcast_arrays(np.asarray(coordinates_1, dtype=float),
+                                                       np.asarray(coordinates_2, dtype=float))
+    if method == "haversine":
+        latitude_1 = np.radians(coordinates_1[..., 0])
+        latitude_2 = np.radians(coordinates_2[..., 0])
+        h = (np.sin((latitude_2 - latitude_1) / 2) ** 2 + np.cos(latitude_1) * np.cos(latitude_2)
+             * np.sin(np.radians(coordinates_2[..., 1] - coordinates_1[..., 1]) / 2) ** 2)
+        return 2 * mean_earth_radius * np.arcsin(np.sqrt(h))
+    if method == "equirectangular":
+        if origin is None:
+            origin = coordinates_1.reshape(-1, 2)[0] if coordinates_1.size else (0.0, 0.0)
+        latitude_scale, longitude_scale = get_local_scales(float(origin[0]))
+        return np.hypot((coordinates_2[..., 0] - coordinates_1[..., 0]) * latitude_scale,
+                        (coordinates_2[..., 1] - coordinates_1[..., 1]) * longitude_scale)
+    if method != "geodesic":
+        raise ValueError(f"Unknown distance method '{method}', expected one of {distance_methods}")
+
+    f = wgs84_flattening
+    reduced_latitude_1 = np.arctan((1 - f) * np.tan(np.radians(coordinates_1[..., 0])))
+    reduced_latitude_2 = np.arctan((1 - f) * np.tan(np.radians(coordinates_2[..., 0])))
+    sin_u1, cos_u1 = np.sin(reduced_latitude_1), np.cos(reduced_latitude_1)
+    sin_u2, cos_u2 = np.sin(reduced_latitude_2), np.cos(reduced_latitude_2)
+    delta_longitude = np.radians(coordinates_2[..., 1] - coordinates_1[..., 1])
+
+    lam = delta_longitude
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(200):
+            sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+            sin_sigma = np.hypot(cos_u2 * sin_lam, cos_u1 * sin_u2 - sin_u1 * cos_u2 * cos_lam)
+            cos_sigma = sin_u1 * sin_u2 + cos_u1 * cos_u2 * cos_lam
+            sigma = np.arctan2(sin_sigma, cos_sigma)
+            sin_alpha = np.where(sin_sigma == 0, 0.0, cos_u1 * cos_u2 * sin_lam / sin_sigma)
+            cos2_alpha = 1 - sin_alpha ** 2
+            # points on the equator
+            cos_2sigma_m = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sin_u1 * sin_u2 / cos2_alpha)
+            c = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prev = lam
+            lam = delta_longitude + (1 - c) * f * sin_alpha * (
+                    sigma + c * sin_sigma * (cos_2sigma_m + c * cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)))
+            converged = np.abs(lam - lam_prev) < 1e-12
+            if np.all(converged):
+                break
+
+    u_sq = cos2_alpha * (wgs84_major_axis ** 2 - wgs84_minor_axis ** 2) / wgs84_minor_axis ** 2
+    a = 1 + u_sq / 16384 * (4096 + u_sq * (-768 + u_sq * (320 - 175 * u_sq)))
+    b = u_sq / 1024 * (256 + u_sq * (-128 + u_sq * (74 - 47 * u_sq)))
+    delta_sigma = b * sin_sigma * (cos_2sigma_m + b / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - b / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)))
+    distances = np.asarray(wgs84_minor_axis * a * (sigma - delta_sigma), dtype=float)
+    if not np.all(converged):
+        import geopy.distance
+        for index in map(tuple, np.argwhere(~converged)):
+            distances[index] = geopy.distance.distance(coordinates_1[index], coordinates_2[index]).m
+    return distances[()]
+
+
+def calculate_coordinates_from_image_data(detection, im_size, train_cur, train_prev, context=None):
     """
     Calculate coordinates from image data.
 
@@ -24,15 +158,46 @@ def calculate_coordinates_from_image_data(detection, im_size, train_cur, train_p
     im_size (dict): A dictionary containing the width and height of the image.
     train_cur (tuple): A tuple containing the current coordinates of the train.
     train_prev (tuple): A tuple containing the previous coordinates of the train.
+    context (GeodeticContext): The geodetic context of the train's positions, created if not given.
 
     Returns:
     tuple: A tuple containing the calculated destination coordinates.
     """
-    x = ((int(detection["x_min"]) + int(detection["x_max"])) / 2) - (im_size["image_width"] / 2)
-    y = im_size["image_height"] - int(detection["y_max"])
-    # im_width_center = im_size["image_width"] / 2
-    angle = get_angle_to_detected_obj(x, y) + calculate_compass_bearing(train_prev, train_cur)
-    return calculate_destination_coordinates(train_cur, float(detection["distance"]), angle)
+    coordinates = calculate_coordinates_from_image_boxes(float(detection["x_min"]), float(detection["x_max"]),
+                                                         float(detection["y_max"]), float(detection["distance"]),
+                                                         im_size, train_cur, train_prev, context)
+    return float(coordinates[0]), float(coordinates[1])
+
+
+def calculate_coordinates_from_image_boxes(x_min, x_max, y_max, distances, im_size, train_cur, train_prev,
+                                           context=None):
+    """
+    Calculate coordinates from columns of image data.
+
+    Array version of calculate_coordinates_from_image_data. It takes in the bounding box columns and distances of
+    all detections of one image, the image size, and train's current and previous coordinates, and calculates the
+    destination coordinates of all detections in one call.
+
+    Args:
+    x_min (array_like): The x_min pixel coordinates of the bounding boxes.
+    x_max (array_like): The x_max pixel coordinates of the bounding boxes.
+    y_max (array_like): The y_max pixel coordinates of the bounding boxes.
+    distances (array_like): The distances to the detected objects in meters.
+    im_size (dict): A dictionary containing the width and height of the image.
+    train_cur (tuple): A tuple containing the current coordinates of the train.
+    train_prev (tuple): A tuple containing the previous coordinates of the train.
+    context (GeodeticContext): The geodetic context of the train's positions, shared by all images of a frame so that
+    the heading of the train is computed once. Created if not given.
+
+    Returns:
+    numpy.ndarray: An array of shape (n, 2) containing the calculated destination coordinates.
+    """
+    if context is None:
+        context = GeodeticContext(train_cur, train_prev)
+    x = ((np.trunc(x_min) + np.trunc(x_max)) / 2) - (im_size["image_width"] / 2)
+    y = im_size["image_height"] - np.trunc(y_max)
+    angles = get_angles_to_detected_objs(x, y) + context.heading
+    return context.destinations(distances, angles)
 
 
 def calculate_compass_bearing(start_point, end_point):
@@ -49,16 +214,34 @@ def calculate_compass_bearing(start_point, end_point):
     :Returns Type:
       float
     """
-    start_latitude = math.radians(start_point[0])
-    end_latitude = math.radians(end_point[0])
+    return float(calculate_compass_bearings(start_point, end_point))
+
+
+def calculate_compass_bearings(start_points, end_points):
+    """
+    Array version of calculate_compass_bearing.
+
+    :Parameters:
+      - start_points: array of gps coordinates (in decimal degrees) with shape (..., 2) for the initial points
+      - end_points: array of gps coordinates (in decimal degrees) with shape (..., 2) for the final points, broadcast
+        against start_points
+    :Returns:
+      The bearings between the coordinates in degrees
+    :Returns Type:
+      numpy.ndarray
+    """
+    start_points = np.asarray(start_points, dtype=float)
+    end_points = np.asarray(end_points, dtype=float)
+    start_latitude = np.radians(start_points[..., 0])
+    end_latitude = np.radians(end_points[..., 0])
 
-    delta_longitude = math.radians(end_point[1] - start_point[1])
+    delta_longitude = np.radians(end_points[..., 1] - start_points[..., 1])
 
-    x = math.sin(delta_longitude) * math.cos(end_latitude)
-    y = math.cos(start_latitude) * math.sin(end_latitude) - (math.sin(start_latitude) * math.cos(end_latitude)
-                                                             * math.cos(delta_longitude))
+    x = np.sin(delta_longitude) * np.cos(end_latitude)
+    y = np.cos(start_latitude) * np.sin(end_latitude) - (np.sin(start_latitude) * np.cos(end_latitude)
+                                                         * np.cos(delta_longitude))
     # normalize to get compass bearings between 0°-360°
-    normalized_bearing = (math.degrees(math.atan2(x, y)) + 360) % 360
+    normalized_bearing = (np.degrees(np.arctan2(x, y)) + 360) % 360
 
     return normalized_bearing
 
@@ -78,16 +261,123 @@ def calculate_destination_coordinates(starting_point, distance, angle):
     :Returns Type:
         tuple
     """
-    earth_radius = 6372795.477598
-    start_lat = math.radians(starting_point[0])
-    start_long = math.radians(starting_point[1])
-    angle = math.radians(angle)
-    delta = distance / earth_radius
+    des_lat, des_long = calculate_destinations(starting_point, distance, angle)
+    return float(des_lat), float(des_long)
+
+
+def calculate_destinations(starting_point, distances, angles):
+    """
+    Array version of calculate_destination_coordinates.
+
+    :Parameters:
+    starting_point : gps coordinates of starting point in degrees, either one point or an array with shape (n, 2)
+    distances : array of distances to the destinations from starting point
+    angles : array of directions of heading from starting point towards the destinations given in degrees
+
+    :Returns:
+      The coordinates of the destinations with shape (n, 2), or (2,) for scalar distances and angles
+    :Returns Type:
+        numpy.ndarray
+    """
+    starting_point = np.asarray(starting_point, dtype=float)
+    start_lat = np.radians(starting_point[..., 0])
+    start_long = np.radians(starting_point[..., 1])
+    angles = np.radians(angles)
+    delta = np.asarray(distances, dtype=float) / earth_radius
+
+    des_lat = np.arcsin((np.sin(start_lat) * np.cos(delta)) + (np.cos(start_lat) * np.sin(delta) * np.cos(angles)))
+    des_long = start_long + np.arctan2(np.sin(angles) * np.sin(delta) * np.cos(start_lat),
+                                       np.cos(delta) - np.sin(start_lat) * np.sin(des_lat))
 
-    des_lat = asin((sin(start_lat) * cos(delta)) + (cos(start_lat) * sin(delta) * cos(angle)))
-    des_long = start_long + atan2(sin(angle) * sin(delta) * cos(start_lat), cos(delta) - sin(start_lat) * sin(des_lat))
+    return np.stack((np.degrees(des_lat), np.degrees(des_long)), axis=-1)
 
-    return math.degrees(des_lat), math.degrees(des_long)
+
+class GeodeticContext(object):
+    """
+    Geodetic quantities of the train's position that are constant for a frame.
+
+    The heading of the train, the sine and cosine of the latitude of its current position and the scales of a local
+    east-north (ENU) projection anchored at it are computed once per frame, so that the bearings, destinations and
+    distances of all detections of the frame only need the trigonometry of the detections themselves. The bearings and
+    destinations are the same as those of calculate_compass_bearings and calculate_destinations.
+    """
+
+    def __init__(self, train_current, train_prev=None, heading=None):
+        """
+        Initializes the context of a frame.
+
+        :Parameters:
+          - train_current: gps coordinates (in decimal degrees) of the current position of the train
+          - train_prev: gps coordinates (in decimal degrees) of the previous position of the train, which gives the
+            heading of the train
+          - heading: compass bearing of the train in degrees that is used if train_prev is not given or is the same as
+            train_current, since the bearing between two identical points is meaningless, e.g. the heading of the
+            previous frame of a train that has stopped; the heading is unknown if neither is given, which only
+            allows the projection and distances of the context, see has_heading
+        """
+        self.train_current = tuple(train_current)
+        self.train_prev = None if train_prev is None else tuple(train_prev)
+        self.latitude, self.longitude = self.train_current
+        latitude = np.radians(self.latitude)
+        self.latitude_rad = latitude
+        self.longitude_rad = np.radians(self.longitude)
+        self.sin_latitude = np.sin(latitude)
+        self.cos_latitude = np.cos(latitude)
+        if self.train_prev is None or self.train_prev == self.train_current:
+            self._heading = None if heading is None else float(heading)
+        else:
+            self._heading = calculate_compass_bearing(train_prev, train_current)
+        # meters per degree of latitude and longitude of the local east-north projection
+        self.latitude_scale, self.longitude_scale = get_local_scales(float(self.latitude))
+
+    @property
+    def has_heading(self):
+        """Whether the heading of the train is known."""
+        return self._heading is not None
+
+    @property
+    def heading(self):
+        """The compass bearing of the train in degrees, which raises a ValueError if it is unknown."""
+        if self._heading is None:
+            raise ValueError(f"The heading of the train at {self.train_current} is unknown, as its previous position "
+                             f"{self.train_prev} is missing or the same and no earlier heading is given")
+        return self._heading
+
+    def matches(self, train_current, train_prev):
+        """Returns whether the context was created for the given positions of the train."""
+        return self.train_current == tuple(train_current) and self.train_prev == (
+            None if train_prev is None else tuple(train_prev))
+
+    def bearings(self, end_points):
+        """Returns the compass bearings from the train's current position to the given points in degrees."""
+        end_points = np.asarray(end_points, dtype=float)
+        end_latitude = np.radians(end_points[..., 0])
+        delta_longitude = np.radians(end_points[..., 1] - self.longitude)
+        cos_end_latitude = np.cos(end_latitude)
+        x = np.sin(delta_longitude) * cos_end_latitude
+        y = self.cos_latitude * np.sin(end_latitude) - self.sin_latitude * cos_end_latitude * np.cos(delta_longitude)
+        return (np.degrees(np.arctan2(x, y)) + 360) % 360
+
+    def destinations(self, distances, angles):
+        """Returns the coordinates with shape (n, 2) at the given distances in meters and compass angles in degrees."""
+        angles = np.radians(angles)
+        delta = np.asarray(distances, dtype=float) / earth_radius
+        sin_delta = np.sin(delta)
+        cos_delta = np.cos(delta)
+        des_lat = np.arcsin((self.sin_latitude * cos_delta) + (self.cos_latitude * sin_delta * np.cos(angles)))
+        des_long = self.longitude_rad + np.arctan2(np.sin(angles) * sin_delta * self.cos_latitude,
+                                                   cos_delta - self.sin_latitude * np.sin(des_lat))
+        return np.stack((np.degrees(des_lat), np.degrees(des_long)), axis=-1)
+
+    def distances(self, points, method="geodesic"):
+        """Returns the distances from the train's current position to the given points in meters."""
+        return calculate_distances(self.train_current, points, method, self.train_current)
+
+    def project(self, points):
+        """Projects gps coordinates onto the local east-north plane and returns the positions in meters, (n, 2)."""
+        points = np.asarray(points, dtype=float)
+        return np.stack(((points[..., 1] - self.longitude) * self.longitude_scale,
+                         (points[..., 0] - self.latitude) * self.latitude_scale), axis=-1)
 
 
 def calculate_bbox_center(bbox):
@@ -96,60 +386,114 @@ def calculate_bbox_center(bbox):
 
 
 def get_angle_to_detected_obj(x, y):
-    alpha = math.atan(x / y)
-    return math.degrees(alpha)
-
-
-def prepare_annotations(data):
-    annotations = []
-    image_data = data['images']
-    for annotation in data['annotations']:
-        for image in image_data:
-            if annotation['image_id'] == image['id']:
-                image_height = image['height']
-                image_width = image['width']
-        ann = {'id': annotation['id'],
-               'bbox': annotation['bbox'],
-               'image_id': annotation['image_id'],
-               'category_id': annotation['category_id'],
-               'image_height': image_height,
-               'image_width': image_width}
-        annotations.append(ann)
-    return annotations
+    return float(get_angles_to_detected_objs(x, y))
+
+
+def get_angles_to_detected_objs(x, y):
+    """
+    Returns the angles in degrees between the camera's axis and the detected objects at the horizontal pixel offsets x
+    from the center of the image and the pixel heights y above its bottom. The angle of an object on the bottom edge of
+    the image, with a height of 0, is undefined and raises a ValueError.
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    bottom = y == 0
+    if np.any(bottom):
+        raise ValueError(f"The angle to {int(np.count_nonzero(bottom))} detected object(s) on the bottom edge of the "
+                         f"image is undefined, at horizontal offsets {x[bottom].tolist()} from the image center")
+    alpha = np.arctan(x / y)
+    return np.degrees(alpha)
+
+
+def index_images(images):
+    """
+    Indexes the images of a COCO dataset by their id.
+
+    :Parameters:
+      - images: the images of the dataset, dictionaries with the keys id, height and width
+    :Returns:
+      The height and width of every image by image id; the last image of an id is kept if an id is not unique
+    :Returns Type:
+      dict
+    """
+    return {image['id']: (image['height'], image['width']) for image in images}
+
+
+def prepare_annotation(annotation, image_index):
+    """Returns the annotation of a COCO dataset with the height and width of its image, see prepare_annotations."""
+    image_height, image_width = image_index[annotation['image_id']]
+    return {'id': annotation['id'],
+            'bbox': annotation['bbox'],
+            'image_id': annotation['image_id'],
+            'category_id': annotation['category_id'],
+            'image_height': image_height,
+            'image_width': image_width}
+
+
+def prepare_annotations(data, image_index=None):
+    """
+    Returns the annotations of a COCO dataset with the height and width of their images. The images are looked up in
+    an index by image id, so the cost grows with the number of annotations plus the number of images. Raises a
+    KeyError for annotations of unknown images.
+    """
+    image_index = index_images(data['images']) if image_index is None else image_index
+    return [prepare_annotation(annotation, image_index) for annotation in data['annotations']]
+
+
+def calculate_detection_bearings(bboxes, image_heights, image_widths, train_bearing):
+    """
+    Array version of the bearings of append_detection_angles.
+
+    :Parameters:
+      - bboxes: array of the bounding boxes (left, bottom, right, top) with shape (n, 4)
+      - image_heights: array of the heights of the images of the bounding boxes
+      - image_widths: array of the widths of the images of the bounding boxes
+      - train_bearing: compass bearing of the train in degrees
+    :Returns:
+      The compass bearings of the detected objects in degrees
+    :Returns Type:
+      numpy.ndarray
+    """
+    bboxes = np.asarray(bboxes, dtype=float).reshape(-1, 4)
+    image_widths = np.asarray(image_widths, dtype=float)
+    # angle between the center of the bottom of the bounding box and the center of the bottom of the image
+    x = (bboxes[:, 0] + bboxes[:, 2]) / 2 - image_widths / 2
+    y = np.asarray(image_heights, dtype=float) - bboxes[:, 1]
+    return get_angles_to_detected_objs(x, y) + train_bearing
 
 
 # json data modification functions
 
 
 def append_detection_angles(annotations, train_bearing):
-    for annotation in annotations:
-        bbox_center = calculate_bbox_center(annotation['bbox'])
-        image_center_along_bbox_center = annotation["image_width"] / 2, bbox_center[1]
-        image_bottom_center = annotation["image_width"] / 2, annotation["image_height"]
-
-        # calculate angle to detected object
-        y = image_bottom_center[1] - image_center_along_bbox_center[1]
-        x = bbox_center[0] - image_center_along_bbox_center[0]
-        # detection.update({'angle': get_angle_to_detected_obj(x,y)})
-        # annotation['angle_as_seen_from_train'] = get_angle_to_detected_obj(x, y)
-        annotation['detection_bearing'] = get_angle_to_detected_obj(x, y) + train_bearing
+    bearings = calculate_detection_bearings([annotation['bbox'] for annotation in annotations],
+                                            [annotation['image_height'] for annotation in annotations],
+                                            [annotation['image_width'] for annotation in annotations], train_bearing)
+    for annotation, bearing in zip(annotations, bearings.tolist()):
+        annotation['detection_bearing'] = bearing
     return annotations
 
 
 def append_detection_coordinates(annotations, detections, final_train_coordinates):
-    for annotation, detection in zip(annotations, detections):
-        detection_coordinates = calculate_destination_coordinates(final_train_coordinates, detection["distance"],
-                                                                  annotation["detection_bearing"])
-        annotation['coordinates'] = detection_coordinates
+    distances = [detection["distance"] for _, detection in zip(annotations, detections)]
+    bearings = [annotation["detection_bearing"] for annotation in annotations[:len(distances)]]
+    coordinates = calculate_destinations(final_train_coordinates, np.asarray(distances, dtype=float).reshape(-1),
+                                         np.asarray(bearings, dtype=float).reshape(-1))
+    for annotation, detection_coordinates in zip(annotations, coordinates.tolist()):
+        annotation['coordinates'] = tuple(detection_coordinates)
     return annotations
 
 
-def format_annotations(annotations):
+def format_annotation(annotation):
+    """Returns the annotation with its object class, without the fields used to estimate its coordinates."""
     keys_to_remove = ("bbox", "image_id", "image_height", "image_width", "detection_bearing", "category_id")
+    formatted = {key: value for key, value in annotation.items() if key not in keys_to_remove}
+    formatted['object_class'] = categories[annotation["category_id"] - 1]
+    return formatted
+
+
+def format_annotations(annotations):
     for annotation in annotations:
-        category_id = annotation["category_id"] - 1
-        annotation['object_class'] = categories[category_id]
-        for key in keys_to_remove:
-            annotation.pop(key)
+        formatted = format_annotation(annotation)
+        annotation.clear()
+        annotation.update(formatted)
     return annotations
-
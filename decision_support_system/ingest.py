@@ -0,0 +1,166 @@
+import json
+import math
+from typing import Any, List, Optional, Union
+
+import detection_table
+
+# fast JSON decoders are used when they are installed, with the standard library as fallback
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# available JSON decoders, fastest first:
+#   - msgspec: decodes the sensor data straight into the typed structs of the sensor schema below, converting the
+#     string encoded numbers while decoding.
+#   - orjson: decodes into dictionaries like the standard library, but several times faster.
+#   - json: the standard library.
+backends = tuple(name for name, module in (("msgspec", msgspec), ("orjson", orjson), ("json", json)) if module)
+default_backend = backends[0]
+
+
+class SensorRecord(object):
+    """
+    Typed record of the data of one sensor.
+
+    Holds the camera and image size of the sensor and a DetectionTable of its detections that are entering the region
+    of interest, with all numbers parsed.
+    """
+    __slots__ = ("camera", "imagesize", "table")
+
+    def __init__(self, camera, imagesize, table):
+        self.camera = camera
+        self.imagesize = imagesize
+        self.table = table
+
+
+if msgspec is not None:
+    class ImageSize(msgspec.Struct):
+        image_height: int
+        image_width: int
+
+    class GPSCoordinates(msgspec.Struct):
+        latitude: float
+        longitude: float
+
+    class SensorObject(msgspec.Struct):
+        objectclass: str
+        entering_ROI: bool
+        x_min: float = math.nan
+        x_max: float = math.nan
+        y_max: float = math.nan
+        distance: float = math.nan
+        GPS_object: Optional[GPSCoordinates] = None
+
+    class SensorData(msgspec.Struct):
+        camera: str
+        objects: List[SensorObject]
+        imagesize: Optional[ImageSize] = None
+
+    class Frame(msgspec.Struct):
+        sensors: List[SensorData]
+        train_current: Union[str, List[float]]
+        train_prev: Union[str, List[float], None] = None
+        frame_id: Any = None
+
+    sensor_decoder = msgspec.json.Decoder(SensorData, strict=False)
+    frame_decoder = msgspec.json.Decoder(Frame, strict=False)
+
+
+def loads(data, backend=None):
+    """Decodes JSON text or bytes into Python objects with the given or the default decoder."""
+    backend = backend or default_backend
+    if backend == "msgspec":
+        return msgspec.json.decode(data)
+    if backend == "orjson":
+        return orjson.loads(data)
+    if backend == "json":
+        return json.loads(data)
+    raise ValueError(f"Unknown JSON decoder '{backend}', expected one of {backends}")
+
+
+def sensor_from_dict(sensor):
+    """Creates a sensor record from sensor data in the format of the JSON file of the sensor."""
+    if sensor["camera"] == "UAV":
+        table = detection_table.DetectionTable.from_uav_sensor(sensor)
+    else:
+        table = detection_table.DetectionTable.from_onboard_sensor(sensor)
+    return SensorRecord(sensor["camera"], sensor.get("imagesize"), table)
+
+
+def sensor_from_struct(sensor):
+    """Creates a sensor record from sensor data decoded into a SensorData struct."""
+    objects = [detection for detection in sensor.objects if detection.entering_ROI]
+    objectclass = [detection_table.object_classes.code(detection.objectclass) for detection in objects]
+    if sensor.camera == "UAV":
+        table = detection_table.DetectionTable(objectclass=objectclass,
+                                               latitude=[detection.GPS_object.latitude for detection in objects],
+                                               longitude=[detection.GPS_object.longitude for detection in objects])
+    else:
+        table = detection_table.DetectionTable(objectclass=objectclass,
+                                               x_min=[detection.x_min for detection in objects],
+                                               x_max=[detection.x_max for detection in objects],
+                                               y_max=[detection.y_max for detection in objects],
+                                               distance=[detection.distance for detection in objects])
+    table.camera[:] = detection_table.cameras.code(sensor.camera)
+    imagesize = None if sensor.imagesize is None else {"image_height": sensor.imagesize.image_height,
+                                                       "image_width": sensor.imagesize.image_width}
+    return SensorRecord(sensor.camera, imagesize, table)
+
+
+def empty_sensor(camera):
+    """Returns a sensor record of the given camera without detections."""
+    return SensorRecord(camera, None, detection_table.DetectionTable())
+
+
+def as_sensor_record(sensor):
+    """Returns the given sensor data as a sensor record, converting it if it is a dictionary."""
+    return sensor if isinstance(sensor, SensorRecord) else sensor_from_dict(sensor)
+
+
+def decode_sensor(data, backend=None):
+    """
+    Decodes the JSON text or bytes of one sensor into a sensor record.
+
+    Args:
+    data (str or bytes): The JSON data of the sensor, in the format of the JSON file of the sensor.
+    backend (str): The JSON decoder to use, one of backends. The fastest available decoder is used by default.
+
+    Returns:
+    SensorRecord: The record of the sensor.
+    """
+    backend = backend or default_backend
+    if backend == "msgspec":
+        return sensor_from_struct(sensor_decoder.decode(data))
+    return sensor_from_dict(loads(data, backend))
+
+
+def read_sensor(file_path, backend=None):
+    """Reads the JSON file of one sensor into a sensor record, see decode_sensor."""
+    with open(file_path, "rb") as f:
+        return decode_sensor(f.read(), backend)
+
+
+def decode_frame(data, backend=None):
+    """
+    Decodes one frame of a stream into a dictionary whose sensors are sensor records.
+
+    Args:
+    data (str or bytes): The JSON data of the frame, see streaming for the format.
+    backend (str): The JSON decoder to use, one of backends. The fastest available decoder is used by default.
+
+    Returns:
+    dict: The frame.
+    """
+    backend = backend or default_backend
+    if backend == "msgspec":
+        frame = frame_decoder.decode(data)
+        return {"frame_id": frame.frame_id, "train_current": frame.train_current, "train_prev": frame.train_prev,
+                "sensors": [sensor_from_struct(sensor) for sensor in frame.sensors]}
+    frame = loads(data, backend)
+    frame["sensors"] = [sensor_from_dict(sensor) for sensor in frame["sensors"]]
+    return frame
@@ -0,0 +1,322 @@
+#!/usr/bin/python3
+"""
+Compact binary recording of sensor frames.
+
+A recording holds the frames of a drive in three arrays of fixed-width records, one record per frame, per sensor of a
+frame and per detection of a sensor, with the object classes, cameras and sensor ids stored once in string tables. The
+arrays are read through numpy.memmap without copying them into memory, so that recordings of many GB can be replayed
+frame by frame. The file starts with the magic bytes and ends with the layout of the arrays as JSON, followed by its
+length and the magic bytes again:
+
+    magic | detections | sensors | frames | footer (JSON) | footer length (uint64) | magic
+
+Recordings are converted from and to newline-delimited JSON frames (see streaming) or recorded sets (see batch):
+
+    python3 decision_support_system/recording.py frames.jsonl drive.dssrec
+    python3 decision_support_system/recording.py data drive.dssrec
+    python3 decision_support_system/recording.py drive.dssrec frames.jsonl
+"""
+import os
+import sys
+import argparse
+import json
+import math
+
+import numpy as np
+
+import batch
+import decision_support
+import detection_table
+import ingest
+import streaming
+
+magic = b"DSSREC01"
+extension = ".dssrec"
+# frame_id of frames without one
+no_frame_id = np.iinfo(np.int64).min
+
+frame_dtype = np.dtype([("frame_id", "<i8"), ("train_current", "<f8", 2), ("train_prev", "<f8", 2),
+                        ("sensor_start", "<i8"), ("sensor_count", "<i4")])
+sensor_dtype = np.dtype([("sensor_id", "<i4"), ("camera", "<i4"), ("image_height", "<i4"), ("image_width", "<i4"),
+                         ("gps_drone", "<f8", 2), ("detection_start", "<i8"), ("detection_count", "<i4")])
+# the numbers missing from a detection, e.g. the distance of UAV detections, are NaN
+detection_dtype = np.dtype([("objectclass", "<i4"), ("entering_roi", "?"), ("moving", "?"),
+                            ("x_min", "<f8"), ("y_min", "<f8"), ("x_max", "<f8"), ("y_max", "<f8"),
+                            ("height", "<f8"), ("width", "<f8"), ("confidence", "<f8"), ("distance", "<f8"),
+                            ("latitude", "<f8"), ("longitude", "<f8"), ("actual_coordinates", "<f8", 2)])
+# numbers of a detection that are string encoded in the JSON schema of the sensors
+box_fields = ("x_min", "y_min", "x_max", "y_max", "height", "width", "confidence", "distance")
+
+
+def parse_number(value):
+    return math.nan if value is None else float(value)
+
+
+def format_number(value):
+    """Formats a number the way it is string encoded in the sensor data, integers without a fraction."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def parse_pair(value):
+    """Parses a pair of coordinates, given as a "(latitude, longitude)" string or a sequence, or NaN if missing."""
+    if value is None:
+        return math.nan, math.nan
+    if isinstance(value, str):
+        value = value.strip("() ").split(",")
+    return float(value[0]), float(value[1])
+
+
+class RecordingWriter(object):
+    """
+    Writes frames to a recording one after another. The detections are written as the frames are added, so only the
+    records of the frames and sensors are kept in memory until the recording is closed.
+    """
+
+    def __init__(self, path, chunk_size=65536):
+        self.path = path
+        self.file = open(path, "wb")
+        self.file.write(magic)
+        self.chunk_size = chunk_size
+        self.strings = {"objectclass": detection_table.StringTable(), "camera": detection_table.StringTable(),
+                        "sensor_id": detection_table.StringTable()}
+        self.frames = []
+        self.sensors = []
+        self.detections = []
+        self.num_detections = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _flush_detections(self):
+        if self.detections:
+            self.file.write(np.array(self.detections, dtype=detection_dtype).tobytes())
+            self.detections = []
+
+    def _add_detection(self, detection):
+        gps_object = detection.get("GPS_object") or {}
+        self.detections.append(
+            (self.strings["objectclass"].code(detection["objectclass"]), bool(detection.get("entering_ROI", False)),
+             bool(detection.get("moving", False)))
+            + tuple(parse_number(detection.get(name)) for name in box_fields)
+            + (parse_number(gps_object.get("latitude")), parse_number(gps_object.get("longitude")),
+               parse_pair(detection.get("actual_coordinates"))))
+        self.num_detections += 1
+        if len(self.detections) >= self.chunk_size:
+            self._flush_detections()
+
+    def add_frame(self, frame):
+        """Adds a frame in the format of the frames of a stream, whose sensors are in the format of the JSON files."""
+        frame_id = frame.get("frame_id")
+        self.frames.append((no_frame_id if frame_id is None else int(frame_id),
+                            parse_pair(frame["train_current"]), parse_pair(frame.get("train_prev")),
+                            len(self.sensors), len(frame["sensors"])))
+        for sensor in frame["sensors"]:
+            imagesize = sensor.get("imagesize") or {}
+            gps_drone = sensor.get("GPS_drone") or {}
+            self.sensors.append((self.strings["sensor_id"].code(sensor.get("sensorId", "")),
+                                 self.strings["camera"].code(sensor["camera"]),
+                                 imagesize.get("image_height", -1), imagesize.get("image_width", -1),
+                                 (parse_number(gps_drone.get("latitude")), parse_number(gps_drone.get("longitude"))),
+                                 self.num_detections, len(sensor["objects"])))
+            for detection in sensor["objects"]:
+                self._add_detection(detection)
+
+    def close(self):
+        """Writes the records of the frames and sensors and the footer and closes the file."""
+        if self.file.closed:
+            return
+        self._flush_detections()
+        layout = {"detections": {"offset": len(magic), "count": self.num_detections}}
+        for name, records, dtype in (("sensors", self.sensors, sensor_dtype), ("frames", self.frames, frame_dtype)):
+            layout[name] = {"offset": self.file.tell(), "count": len(records)}
+            self.file.write(np.array(records, dtype=dtype).tobytes())
+        footer = json.dumps({"version": 1, "layout": layout,
+                             "strings": {name: table.names for name, table in self.strings.items()}}).encode()
+        self.file.write(footer)
+        self.file.write(np.uint64(len(footer)).astype("<u8").tobytes())
+        self.file.write(magic)
+        self.file.close()
+
+
+class Recording(object):
+    """
+    Memory-mapped recording of sensor frames.
+
+    The frames are read straight from the memory-mapped record arrays. The sensor records of a frame (see
+    ingest.SensorRecord) use the columns of the mapped detections without copying them where possible, and the
+    object classes and cameras are translated into the codes of the process's string tables with one lookup per
+    frame. Frames can be merged by a DetectionMerger directly, e.g. with streaming.merge_frames(merger, recording).
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError(f"{path} is not a recording")
+            f.seek(-len(magic) - 8, os.SEEK_END)
+            footer_length = int(np.frombuffer(f.read(8), dtype="<u8")[0])
+            f.seek(-len(magic) - 8 - footer_length, os.SEEK_END)
+            footer = json.loads(f.read(footer_length))
+        self.strings = footer["strings"]
+        self.frames = self._map(footer["layout"]["frames"], frame_dtype)
+        self.sensors = self._map(footer["layout"]["sensors"], sensor_dtype)
+        self.detections = self._map(footer["layout"]["detections"], detection_dtype)
+        # codes of the recording's object classes and cameras in the string tables of the process
+        self.class_codes = np.array([detection_table.object_classes.code(name) for name in self.strings["objectclass"]],
+                                    dtype=detection_table.column_types["objectclass"])
+        self.camera_codes = [detection_table.cameras.code(name) for name in self.strings["camera"]]
+
+    def _map(self, section, dtype):
+        if not section["count"]:
+            return np.zeros(0, dtype=dtype)
+        # a plain ndarray view of the mapped file avoids the overhead of the memmap subclass when slicing it
+        return np.memmap(self.path, dtype=dtype, mode="r", offset=section["offset"],
+                         shape=(section["count"],)).view(np.ndarray)
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def __getitem__(self, index):
+        """Returns the frame at the given index in the format of the frames of a stream, with sensor records."""
+        frame = dict(zip(frame_dtype.names, self.frames[index].tolist()))
+        return self._frame(frame, [self.sensor_record(sensor) for sensor in self._sensors(frame)])
+
+    def _sensors(self, frame):
+        """Returns the records of the sensors of a frame as dictionaries."""
+        start = frame["sensor_start"]
+        return [dict(zip(sensor_dtype.names, sensor))
+                for sensor in self.sensors[start:start + frame["sensor_count"]].tolist()]
+
+    def _frame(self, frame, sensors):
+        record = {"frame_id": None if frame["frame_id"] == no_frame_id else frame["frame_id"],
+                  "train_current": frame["train_current"], "sensors": sensors}
+        if not math.isnan(frame["train_prev"][0]):
+            record["train_prev"] = frame["train_prev"]
+        return record
+
+    def _imagesize(self, sensor):
+        if sensor["image_height"] < 0:
+            return None
+        return {"image_height": sensor["image_height"], "image_width": sensor["image_width"]}
+
+    def _detections(self, sensor):
+        start = sensor["detection_start"]
+        return self.detections[start:start + sensor["detection_count"]]
+
+    def sensor_record(self, sensor):
+        """Returns the sensor record of a sensor, given as a dictionary, with its detections entering the ROI."""
+        camera = self.strings["camera"][sensor["camera"]]
+        detections = self._detections(sensor)
+        entering = detections["entering_roi"]
+        if not entering.all():
+            detections = detections[entering]
+        objectclass = self.class_codes[detections["objectclass"]]
+        # the columns the DetectionMerger fills in are left to the table, the others are views of the mapped records
+        if camera == "UAV":
+            table = detection_table.DetectionTable(objectclass=objectclass, latitude=detections["latitude"],
+                                                   longitude=detections["longitude"])
+        else:
+            table = detection_table.DetectionTable(objectclass=objectclass, x_min=detections["x_min"],
+                                                   x_max=detections["x_max"], y_max=detections["y_max"],
+                                                   distance=detections["distance"])
+        table.camera[:] = self.camera_codes[sensor["camera"]]
+        return ingest.SensorRecord(camera, self._imagesize(sensor), table)
+
+    def sensor_to_dict(self, sensor):
+        """Returns a sensor, given as a dictionary, with all its detections in the format of the JSON file."""
+        data = {"sensorId": self.strings["sensor_id"][sensor["sensor_id"]],
+                "camera": self.strings["camera"][sensor["camera"]]}
+        if not math.isnan(sensor["gps_drone"][0]):
+            data["GPS_drone"] = {"latitude": format_number(sensor["gps_drone"][0]),
+                                 "longitude": format_number(sensor["gps_drone"][1])}
+        imagesize = self._imagesize(sensor)
+        if imagesize is not None:
+            data["imagesize"] = imagesize
+        objects = data["objects"] = []
+        classes = self.strings["objectclass"]
+        for detection in self._detections(sensor).tolist():
+            record = dict(zip(detection_dtype.names, detection))
+            obj = {"objectclass": classes[record["objectclass"]]}
+            obj.update((name, format_number(record[name])) for name in box_fields if not math.isnan(record[name]))
+            if not math.isnan(record["latitude"]):
+                obj["GPS_object"] = {"latitude": format_number(record["latitude"]),
+                                     "longitude": format_number(record["longitude"])}
+            obj["entering_ROI"] = record["entering_roi"]
+            obj["moving"] = record["moving"]
+            if not math.isnan(record["actual_coordinates"][0]):
+                obj["actual_coordinates"] = "({}, {})".format(*record["actual_coordinates"])
+            objects.append(obj)
+        return data
+
+    def to_dict(self, index):
+        """Returns the frame at the given index in the JSON format of the frames of a stream."""
+        frame = dict(zip(frame_dtype.names, self.frames[index].tolist()))
+        record = self._frame(frame, [self.sensor_to_dict(sensor) for sensor in self._sensors(frame)])
+        record["train_current"] = list(record["train_current"])
+        if "train_prev" in record:
+            record["train_prev"] = list(record["train_prev"])
+        return record
+
+
+def write_recording(frames, path):
+    """Writes frames in the format of the frames of a stream to a recording and returns the number of frames."""
+    num_frames = 0
+    with RecordingWriter(path) as writer:
+        for frame in frames:
+            writer.add_frame(frame)
+            num_frames += 1
+    return num_frames
+
+
+def read_json_frames(path):
+    """Reads the frames of a file of newline-delimited JSON frames as dictionaries."""
+    with open(path, "rb") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                yield ingest.loads(line)
+
+
+def read_set_frames(root):
+    """Reads every recorded set in the root directory as one frame, see batch.find_sets."""
+    for frame_id, directory in enumerate(batch.find_sets(root)):
+        train_current, train_prev = batch.read_train_positions(directory)
+        sensors = [decision_support.read_json(os.path.join(directory, name)) for name in batch.sensor_files]
+        yield {"frame_id": frame_id, "train_current": train_current, "train_prev": train_prev, "sensors": sensors}
+
+
+def write_json_frames(recording, path):
+    """Writes the frames of a recording as newline-delimited JSON frames and returns the number of frames."""
+    with streaming.open_stream(path, "w") as f:
+        for index in range(len(recording)):
+            f.write(json.dumps(recording.to_dict(index)) + "\n")
+    return len(recording)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert JSON frames or recorded sets to a binary recording and back')
+    parser.add_argument('input', help='File of newline-delimited JSON frames, directory of recorded sets, or a '
+                                      f'recording ending with {extension}')
+    parser.add_argument('output', help=f'The recording to write, ending with {extension}, or the file of '
+                                       'newline-delimited JSON frames to write a recording to ("-" for stdout)')
+    args = parser.parse_args()
+
+    if args.input.endswith(extension):
+        num_frames = write_json_frames(Recording(args.input), args.output)
+    elif os.path.isdir(args.input):
+        num_frames = write_recording(read_set_frames(args.input), args.output)
+    else:
+        num_frames = write_recording(read_json_frames(args.input), args.output)
+    print(f"{num_frames} frames written to {args.output}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
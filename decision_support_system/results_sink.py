@@ -0,0 +1,279 @@
+"""
+Buffered, append-only sinks of the merged detections of every frame.
+
+Every merged detection is written as one record in the following format, with the zone it was merged in and the
+cameras of the detections it was merged from, one camera for a detection that was not merged with any other:
+
+  {"frame_id": 17, "timestamp": 1760000000.25, "train_current": [53.0861622, 8.7816742], "zone": 2,
+   "objectclass": "person", "latitude": 53.0866, "longitude": 8.7822, "cameras": ["RGB1", "Thermal"]}
+
+The records are appended to a file of newline-delimited JSON (.jsonl) or an Arrow IPC stream (.arrows) with one
+column per field, which requires pyarrow. With a maximum size, the records are written to numbered segments of the
+path instead, e.g. results.00000.jsonl, results.00001.jsonl, and the next segment is started once a segment has
+reached the maximum size. Arrow streams cannot be appended to, so each sink writes to new segments of an Arrow path.
+"""
+import json
+import os
+import re
+import time
+from abc import ABC, abstractmethod
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+record_fields = ("frame_id", "timestamp", "train_current", "zone", "objectclass", "latitude", "longitude", "cameras")
+
+
+def frame_records(record, sources, timestamp=None):
+    """
+    Returns the records of the merged detections of a frame.
+
+    Args:
+    record (dict): The result record of the frame with the keys frame_id, train_current and results, see
+    streaming.merge_frame.
+    sources (list): The zone id and the cameras of every merged detection, see DetectionMerger.result_sources.
+    timestamp (float): The time of the frame in seconds since the epoch; Default is the current time.
+
+    Returns:
+    list: The records of the merged detections.
+    """
+    if timestamp is None:
+        timestamp = time.time()
+    train_current = record["train_current"]
+    train_current = None if train_current is None else list(train_current)
+    records = []
+    for result, (zone_id, cameras) in zip(record["results"], sources):
+        for objectclass, (latitude, longitude) in result.items():
+            records.append({"frame_id": record.get("frame_id"), "timestamp": timestamp, "train_current": train_current,
+                            "zone": zone_id, "objectclass": objectclass, "latitude": latitude,
+                            "longitude": longitude, "cameras": cameras})
+    return records
+
+
+def segment_path(path, index):
+    """Returns the path of the segment with the given number of a sink's path."""
+    directory, name = os.path.split(path)
+    stem, extension = os.path.splitext(name)
+    return os.path.join(directory, f"{stem}.{index:05d}{extension}")
+
+
+def segment_indices(path):
+    """Returns the numbers of the existing segments of a sink's path in increasing order."""
+    directory, name = os.path.split(path)
+    stem, extension = os.path.splitext(name)
+    pattern = re.compile(re.escape(stem) + r"\.(\d{5,})" + re.escape(extension) + "$")
+    matches = (pattern.match(name) for name in os.listdir(directory or os.curdir))
+    return sorted(int(match.group(1)) for match in matches if match)
+
+
+class ResultsSink(ABC):
+    """
+    Buffered, append-only sink of the records of merged detections.
+
+    Records are buffered and written in batches of batch_size records. The written batches are flushed to the operating
+    system at once and synced to disk with os.fsync at most every fsync_interval seconds, and the buffered records are
+    written as soon as a sync is due, so that records of slowly arriving frames reach the disk in time as well. The file
+    is synced on every write if fsync_interval is 0 and never if it is None, and otherwise when it is closed as well. If
+    max_bytes is given, the records are written to numbered segments of the path that are rotated once they have reached
+    max_bytes. A batch is never split across segments, so a segment can exceed max_bytes by one batch. Subclasses write
+    the batches in their format.
+    """
+    # whether records can be appended to an existing file of the format
+    appendable = True
+
+    def __init__(self, path, batch_size=1024, fsync_interval=1.0, max_bytes=None):
+        if batch_size < 1:
+            raise ValueError(f"The batch size has to be at least 1, got {batch_size}")
+        self.path = path
+        self.batch_size = batch_size
+        self.fsync_interval = fsync_interval
+        self.max_bytes = max_bytes
+        self.segmented = max_bytes is not None or not self.appendable
+        self.buffer = []
+        self.file = None
+        self.segment = None
+        self.last_sync = time.monotonic()
+        self.stats = {"records": 0, "batches": 0, "bytes": 0, "fsyncs": 0, "segments": []}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _open_segment(self):
+        """Opens the file the next batch is written to, continuing the last segment if the format is appendable."""
+        if not self.segmented:
+            path = self.path
+        else:
+            if self.segment is None:
+                indices = segment_indices(self.path)
+                self.segment = (indices[-1] if self.appendable else indices[-1] + 1) if indices else 0
+            else:
+                self.segment += 1
+            path = segment_path(self.path, self.segment)
+        self._open(path)
+        self.stats["segments"].append(path)
+
+    def _close_segment(self):
+        # the end of the file is written before the last sync, so that the synced file is complete
+        self._finish()
+        self.file.flush()
+        if self.fsync_interval is not None:
+            self._sync()
+        self.file.close()
+        self.file = None
+
+    def _sync(self):
+        os.fsync(self.file.fileno())
+        self.stats["fsyncs"] += 1
+        self.last_sync = time.monotonic()
+
+    def _sync_due(self):
+        return self.fsync_interval is not None and time.monotonic() - self.last_sync >= self.fsync_interval
+
+    def write(self, record):
+        """Buffers a record and writes the buffered records once there are batch_size of them, or if a sync is due."""
+        self.write_records((record,))
+
+    def write_records(self, records):
+        """Buffers the records and writes the buffered records in batches, or at once if a sync is due."""
+        self.buffer.extend(records)
+        while len(self.buffer) >= self.batch_size:
+            batch = self.buffer[:self.batch_size]
+            del self.buffer[:self.batch_size]
+            self._write_batch(batch)
+        if self.buffer and self._sync_due():
+            self.flush()
+
+    def write_frame(self, record, sources, timestamp=None):
+        """Writes the records of the merged detections of a frame, see frame_records for the arguments."""
+        self.write_records(frame_records(record, sources, timestamp))
+
+    def flush(self):
+        """Writes the buffered records."""
+        if self.buffer:
+            batch, self.buffer = self.buffer, []
+            self._write_batch(batch)
+
+    def _write_batch(self, batch):
+        if self.file is None:
+            self._open_segment()
+        # the last segment of an earlier sink may be full already
+        if self.max_bytes is not None and self.file.tell() >= self.max_bytes:
+            self._close_segment()
+            self._open_segment()
+        start = self.file.tell()
+        self._write(batch)
+        self.file.flush()
+        self.stats["bytes"] += self.file.tell() - start
+        self.stats["records"] += len(batch)
+        self.stats["batches"] += 1
+        if self._sync_due():
+            self._sync()
+
+    def close(self):
+        """Writes the buffered records and closes the file, which is synced to disk unless fsync_interval is None."""
+        self.flush()
+        if self.file is not None:
+            self._close_segment()
+
+    def summary(self):
+        """Returns the number of written records, batches, bytes and syncs and the paths of the written files."""
+        return {**self.stats, "segments": list(self.stats["segments"])}
+
+    @abstractmethod
+    def _open(self, path):
+        """Opens the file of the given path as self.file."""
+
+    @abstractmethod
+    def _write(self, batch):
+        """Writes a batch of records to the file."""
+
+    def _finish(self):
+        """Writes the end of the file, if the format has one, before the file is synced and closed."""
+
+
+class JSONLSink(ResultsSink):
+    """Appends the records as newline-delimited JSON, encoded with orjson if it is installed."""
+
+    def _open(self, path):
+        self.file = open(path, "ab")
+
+    def _write(self, batch):
+        if orjson is not None:
+            self.file.write(b"".join([orjson.dumps(record, option=orjson.OPT_APPEND_NEWLINE) for record in batch]))
+        else:
+            self.file.write("".join([json.dumps(record) + "\n" for record in batch]).encode())
+
+
+class ArrowSink(ResultsSink):
+    """
+    Writes the records as an Arrow IPC stream with one record batch per batch of records. The stream can be read while
+    it is written, up to the last complete batch. Requires pyarrow.
+    """
+    appendable = False
+
+    def __init__(self, path, batch_size=1024, fsync_interval=1.0, max_bytes=None):
+        try:
+            import pyarrow
+            import pyarrow.ipc
+        except ImportError:
+            raise ImportError("Writing Arrow streams requires pyarrow, install it with 'pip install pyarrow'")
+        self.pyarrow = pyarrow
+        self.schema = pyarrow.schema([("frame_id", pyarrow.int64()), ("timestamp", pyarrow.float64()),
+                                      ("train_current", pyarrow.list_(pyarrow.float64())),
+                                      ("zone", pyarrow.int32()), ("objectclass", pyarrow.string()),
+                                      ("latitude", pyarrow.float64()), ("longitude", pyarrow.float64()),
+                                      ("cameras", pyarrow.list_(pyarrow.string()))])
+        self.writer = None
+        super().__init__(path, batch_size, fsync_interval, max_bytes)
+
+    def _open(self, path):
+        self.file = open(path, "wb")
+        self.writer = self.pyarrow.ipc.new_stream(self.file, self.schema)
+
+    def _write(self, batch):
+        columns = {name: [record[name] for record in batch] for name in record_fields}
+        self.writer.write_batch(self.pyarrow.RecordBatch.from_pydict(columns, schema=self.schema))
+
+    def _finish(self):
+        # writes the end-of-stream marker without closing the file
+        self.writer.close()
+        self.writer = None
+
+
+sink_formats = {".jsonl": JSONLSink, ".arrows": ArrowSink}
+
+
+def open_sink(path, batch_size=1024, fsync_interval=1.0, max_bytes=None):
+    """Returns a sink writing to the given path in the format of its extension, one of sink_formats."""
+    extension = os.path.splitext(path)[1]
+    if extension not in sink_formats:
+        raise ValueError(f"Unknown results sink format '{extension}', expected one of {tuple(sink_formats)}")
+    return sink_formats[extension](path, batch_size, fsync_interval, max_bytes)
+
+
+def sink_files(path):
+    """Returns the file at the given path, or its segments in order if it was written in segments."""
+    segments = [segment_path(path, index) for index in segment_indices(path)]
+    if os.path.isfile(path):
+        segments.insert(0, path)
+    return segments
+
+
+def read_records(path):
+    """Yields the records written by a sink to the given path or its segments, see sink_files."""
+    for file_path in sink_files(path):
+        if file_path.endswith(".arrows"):
+            import pyarrow.ipc
+            with pyarrow.ipc.open_stream(file_path) as reader:
+                for batch in reader:
+                    yield from batch.to_pylist()
+        else:
+            with open(file_path, "rb") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
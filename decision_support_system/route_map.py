@@ -0,0 +1,157 @@
+import numpy as np
+
+import detection_table
+
+# colors of the folium icons of the detections of each camera
+icon_colors = {
+    'RGB1': "beige",
+    'RGB4': "green",
+    'Monochrome': "blue",
+    'Thermal': "red",
+    'SWIR': "purple",
+    'UAV': "lightgray"
+}
+# colors of the clustered detections of each camera, close to the colors of the icons
+camera_colors = {
+    "RGB1": "#f5deb3",
+    "RGB4": "green",
+    "Monochrome": "blue",
+    "Thermal": "red",
+    "SWIR": "purple",
+    "UAV": "gray",
+}
+map_modes = ("cluster", "markers")
+
+# draws every row [latitude, longitude, label] of a FastMarkerCluster as a small circle in the color of its layer
+cluster_callback = """
+function (row) {
+    var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {radius: 5, weight: 1, color: "%s", fillOpacity: 0.8});
+    marker.bindTooltip(row[2]);
+    return marker;
+}
+"""
+
+
+class RouteMap(object):
+    """
+    Map of the detections, merged results and train positions of one frame or of many frames of a route.
+
+    The estimated detections, merged results and train positions are collected as arrays frame by frame and only
+    rendered into a folium map when the map is written to a file. In the cluster mode, the detections of each camera and
+    the merged results are rendered as FastMarkerCluster layers, which hold the coordinates as plain arrays in the HTML
+    and cluster the markers in the browser, and the train positions as one line. This keeps the size of the HTML and
+    the rendering time small for whole routes with tens of thousands of detections. The markers mode renders one
+    folium.Marker with an icon per detection, like DetectionMerger.draw_on_map.
+    """
+
+    def __init__(self):
+        self.detection_coordinates = []
+        self.detection_cameras = []
+        self.detection_classes = []
+        self.result_coordinates = []
+        self.result_labels = []
+        self.train_positions = []
+        self.frames = 0
+
+    def add_detections(self, detections):
+        """Adds the estimated coordinates of the detections of a DetectionTable."""
+        if len(detections):
+            self.detection_coordinates.append(detections.coordinates)
+            self.detection_cameras.append(np.array(detections.camera))
+            self.detection_classes.append(np.array(detections.objectclass))
+
+    def add_results(self, results):
+        """Adds merged results, given as dictionaries of the object class and coordinates like final_results."""
+        for result in results:
+            for objectclass, coordinates in result.items():
+                self.result_labels.append(objectclass)
+                self.result_coordinates.append(tuple(coordinates))
+
+    def add_tracks(self, tracks):
+        """Adds tracked obstacles, see tracking.Obstacle.to_dict."""
+        for track in tracks:
+            self.result_labels.append(f"{track['objectclass']} #{track['id']}")
+            self.result_coordinates.append(tuple(track["coordinates"]))
+
+    def add_train_position(self, coordinates):
+        """Adds a position of the train, which is drawn as part of the train's route, if it is known."""
+        if coordinates is not None:
+            self.train_positions.append(tuple(coordinates))
+
+    def add_frame(self, record, detections=None):
+        """
+        Adds the result record of a frame, with its merged results or tracked obstacles and the train's position, and
+        the estimated detections of the frame if given.
+        """
+        self.frames += 1
+        self.add_train_position(record.get("train_current"))
+        self.add_results(record.get("results", ()))
+        self.add_tracks(record.get("tracks", ()))
+        if detections is not None:
+            self.add_detections(detections)
+
+    @property
+    def num_detections(self):
+        return sum(map(len, self.detection_coordinates))
+
+    def _detections(self):
+        if not self.detection_coordinates:
+            return np.zeros((0, 2)), np.zeros(0, dtype=np.int8), np.zeros(0, dtype=np.int32)
+        return (np.concatenate(self.detection_coordinates), np.concatenate(self.detection_cameras),
+                np.concatenate(self.detection_classes))
+
+    def _center(self):
+        """Returns the center of the train positions, or of the results and detections if there are none."""
+        points = self.train_positions or self.result_coordinates
+        if not points and self.detection_coordinates:
+            points = self.detection_coordinates[0]
+        if not len(points):
+            return [0.0, 0.0]
+        return np.nanmean(np.asarray(points, dtype=float), axis=0).tolist()
+
+    def render(self, mode="cluster"):
+        """Renders the collected frames into a folium map in the given mode, one of map_modes."""
+        # folium is only imported when a map is rendered
+        import folium
+        import folium.plugins
+        if mode not in map_modes:
+            raise ValueError(f"Unknown map mode '{mode}', expected one of {map_modes}")
+        folium_map = folium.Map(location=self._center(), zoom_start=15)
+        coordinates, cameras, classes = self._detections()
+        if mode == "markers":
+            for index in range(len(coordinates)):
+                camera = detection_table.cameras[cameras[index]]
+                folium.Marker(location=coordinates[index].tolist(),
+                              icon=folium.Icon(color=icon_colors.get(camera, "lightgray"), prefix='fa',
+                                               icon=detection_table.object_classes[classes[index]])
+                              ).add_to(folium_map)
+            for position in self.train_positions:
+                folium.Marker(location=position, icon=folium.Icon(color='darkgreen', icon='train', prefix='fa')
+                              ).add_to(folium_map)
+            for result in self.result_coordinates:
+                folium.Marker(location=result, icon=folium.Icon(color='black', icon='gear', prefix='fa')
+                              ).add_to(folium_map)
+            return folium_map
+        class_names = np.array(detection_table.object_classes.names, dtype=object)
+        for code in np.unique(cameras).tolist():
+            camera = detection_table.cameras[code]
+            mask = cameras == code
+            rows = np.column_stack((np.round(coordinates[mask], 7).astype(object), class_names[classes[mask]]))
+            callback = cluster_callback % camera_colors.get(camera, "gray")
+            folium.plugins.FastMarkerCluster(rows.tolist(), callback=callback, name=f"{camera} detections"
+                                             ).add_to(folium_map)
+        if self.result_coordinates:
+            rows = [[round(latitude, 7), round(longitude, 7), label]
+                    for (latitude, longitude), label in zip(self.result_coordinates, self.result_labels)]
+            folium.plugins.FastMarkerCluster(rows, callback=cluster_callback % "black",
+                                             name="merged results").add_to(folium_map)
+        if len(self.train_positions) > 1:
+            folium.PolyLine(self.train_positions, color="darkgreen", weight=4, name="train").add_to(folium_map)
+        elif self.train_positions:
+            folium.CircleMarker(self.train_positions[0], radius=8, color="darkgreen", name="train").add_to(folium_map)
+        folium.LayerControl().add_to(folium_map)
+        return folium_map
+
+    def save(self, path, mode="cluster"):
+        """Renders the collected frames and writes the map to an HTML file."""
+        self.render(mode).save(path)
@@ -1,35 +1,192 @@
 #!/usr/bin/python3
 
 import os
+import sys
 import argparse
+import json
+import batch
 import decision_support
+import evaluation
+import ingest
+import instrumentation
+import recording
+import results_sink
+import route_map
+import sensor_service
+import streaming
+import sweep
+import tracking
+import geographic_estimations.geographic_estimations as geographic_estimations
 
 
 def main():
     parser = argparse.ArgumentParser(description='Create a list of obstacle detections and their estimated coordinates')
-    parser.add_argument('rgb1_path', help='Path to json file containing rgb1 sensor data')
-    parser.add_argument('rgb4_path', help='Path to json file containing rgb4 sensor data')
-    parser.add_argument('monochrome_path', help='Path to json file containing monochrome sensor data')
-    parser.add_argument('thermal_path', help='Path to json file containing thermal sensor data')
-    parser.add_argument('swir_path', help='Path to json file containing swir sensor data')
-    parser.add_argument('uav_path', help='Path to json file containing uav sensor data')
+    parser.add_argument('rgb1_path', help='Path to json file containing rgb1 sensor data', nargs='?')
+    parser.add_argument('rgb4_path', help='Path to json file containing rgb4 sensor data', nargs='?')
+    parser.add_argument('monochrome_path', help='Path to json file containing monochrome sensor data', nargs='?')
+    parser.add_argument('thermal_path', help='Path to json file containing thermal sensor data', nargs='?')
+    parser.add_argument('swir_path', help='Path to json file containing swir sensor data', nargs='?')
+    parser.add_argument('uav_path', help='Path to json file containing uav sensor data', nargs='?')
 
     parser.add_argument('train_current', help='Current GPS coordinate latitude of the train as a tuple '
-                                              'e.g: "53.0861622, 8.7816742"', type=str)
+                                              'e.g: "53.0861622, 8.7816742"', type=str, nargs='?')
     parser.add_argument('train_prev', help='Previous GPS coordinates of the train as a tuple'
-                                           'e.g "53.086040, 8.781514"', type=str)
+                                           'e.g "53.086040, 8.781514"', type=str, nargs='?')
 
     parser.add_argument('--verbose', help='increase output verbosity', default=False)
     parser.add_argument('--show_map', help='plot the estimations and final results on a map', default=False)
+    parser.add_argument('--map_file', help='Write the map of the estimations and final results to the given HTML file '
+                                           'as clustered layers instead of showing it in the browser; In stream mode, '
+                                           'the map of all frames of the route', type=str)
 
-    parser.add_argument('--output_file', help='Output file; Default is ${cwd}/dss_results.json', type=str,
-                        default=os.path.join(os.path.curdir, "dss_results.json"))
+    parser.add_argument('--output_file', help='Output file; Default is ${cwd}/dss_results.json, stdout in stream mode '
+                                              'or ${cwd}/dss_results.jsonl in batch mode', type=str)
+    parser.add_argument('--sink', help='Append the merged detections with their frame, zone and cameras to the given '
+                                       'newline-delimited JSON (.jsonl) or Arrow stream (.arrows) file, in single '
+                                       'or stream mode; In single mode, no output file is written unless given',
+                        type=str, metavar='PATH')
+    parser.add_argument('--sink_batch', help='With --sink, the number of records written at once; Default is 1024',
+                        type=int, default=1024)
+    parser.add_argument('--sink_fsync_interval', help='With --sink, the maximum time in seconds between syncs of the '
+                                                      'file to disk; Default is 1', type=float, default=1.0)
+    parser.add_argument('--sink_max_bytes', help='With --sink, write to numbered segments of the path that are '
+                                                 'rotated once they reach the given size in bytes', type=int)
+    parser.add_argument('--distance_method', help='Method used to calculate distances between GPS coordinates; '
+                                                  'Default is geodesic', type=str, default="geodesic",
+                        choices=geographic_estimations.distance_methods)
+    parser.add_argument('--clustering', help='Strategy to cluster similar detections into groups; Default is angle',
+                        type=str, default="angle", choices=decision_support.clustering_strategies)
+    parser.add_argument('--config', help='Path to json file containing the zone boundaries and the weights of each '
+                                         'camera in each zone', type=str)
+    parser.add_argument('--stream', help='Merge frames of newline-delimited JSON read from the given file or FIFO, '
+                                         'or from stdin if "-", or the frames of a binary recording ending with '
+                                         f'{recording.extension}, and write the results of each frame as '
+                                         'newline-delimited JSON instead of merging the given sensor files',
+                        type=str, metavar='INPUT')
+    parser.add_argument('--feeds', help='Merge the reports of the sensors read concurrently from the given feeds, '
+                                        'files of newline-delimited JSON or tcp://host:port or unix://path sockets '
+                                        'the sensors connect to, as soon as all sensors have reported or the deadline '
+                                        'has passed, and write the results of each frame as newline-delimited JSON',
+                        type=str, nargs='+', metavar='SOURCE')
+    parser.add_argument('--deadline', help='With --feeds, the time in seconds after the first report of a frame after '
+                                           'which it is merged with the sensors that have reported; Default is 0.2',
+                        type=float, default=0.2)
+    parser.add_argument('--queue_size', help='With --feeds, the number of reports queued for each sensor; Default is '
+                                             '4', type=int, default=4)
+    parser.add_argument('--overflow', help='With --feeds, drop the oldest report of a sensor when its queue is full, '
+                                           'or block its feed; Default is drop_oldest', type=str,
+                        default="drop_oldest", choices=sensor_service.overflow_policies)
+    parser.add_argument('--follow', help='With --feeds, keep reading the files as they grow, like tail -f',
+                        action='store_true')
+    parser.add_argument('--batch', help='Merge every recorded set in the subdirectories of the given root directory, '
+                                        'each with its sensor files and a train.json with the train positions, and '
+                                        'write the results of all sets to one JSONL or Parquet file',
+                        type=str, metavar='ROOT')
+    parser.add_argument('--sweep', help='Merge the frames of --stream or the sets of --batch once for every '
+                                        'combination of the parameters in the given JSON grid file, estimating the '
+                                        'detections only once, and write one row per combination to a JSONL or '
+                                        'Parquet file; With workers, the combinations are merged concurrently',
+                        type=str, metavar='GRID')
+    parser.add_argument('--estimates_file', help='With --sweep, the .npz file the estimated detections are loaded '
+                                                 'from, or saved to if it does not exist or was estimated from '
+                                                 'other frames or with another distance method', type=str)
+    parser.add_argument('--timing_file', help='Output file of the time spent on each set in batch mode; Default is '
+                                              'the output file with the extension .timing.json', type=str)
+    parser.add_argument('--workers', help='Number of workers merging the zones concurrently, or the frames in stream '
+                                          'mode or the sets in batch mode; Default is 0 to merge one after another',
+                        type=int, default=0)
+    parser.add_argument('--executor', help='Type of worker pool; Default is process', type=str, default="process",
+                        choices=decision_support.executor_types)
+    parser.add_argument('--json_decoder', help='JSON decoder used to read the sensor data; Default is the fastest '
+                                               f'installed one ({ingest.default_backend})', type=str,
+                        default=ingest.default_backend, choices=ingest.backends)
+    parser.add_argument('--track', help='In stream or feeds mode, keep the merged obstacles across frames with '
+                                        'stable ids and only merge the detections of new obstacles, and write the '
+                                        'tracked obstacles of each frame; With workers, the zones of each frame are '
+                                        'merged concurrently',
+                        action='store_true')
+    parser.add_argument('--metrics', help='Write the time of every stage and the counters of the merging algorithm '
+                                          'to the given file, in the Prometheus text format if it ends with .prom or '
+                                          'as JSON otherwise; Not collected for frames merged concurrently in stream '
+                                          'mode or in batch mode', type=str)
     args = parser.parse_args()
+    ingest.default_backend = args.json_decoder
 
-    dss = decision_support.DetectionMerger(args.rgb1_path, args.rgb4_path, args.monochrome_path, args.thermal_path,
-                                           args.swir_path, args.uav_path, args.train_current, args.train_prev,
-                                           args.verbose, args.show_map, args.output_file)
-    dss.run()
+    if args.stream is None and args.feeds is None and args.batch is None and args.train_prev is None:
+        parser.error('the paths to the six sensor files and the train positions are required unless --stream, '
+                     '--feeds or --batch is used')
+    if args.sink is not None and (args.feeds is not None or args.batch is not None or args.track):
+        parser.error('--sink is only supported in single mode and in stream mode without --track')
+
+    executor = decision_support.create_executor(args.executor, args.workers) if args.workers > 0 else None
+    metrics = instrumentation.Metrics() if args.metrics else None
+    sink = None
+    if args.sink is not None:
+        sink = results_sink.open_sink(args.sink, args.sink_batch, args.sink_fsync_interval, args.sink_max_bytes)
+    try:
+        if args.sweep is not None:
+            if (args.stream is None) == (args.batch is None):
+                parser.error('--sweep needs the frames of either --stream or --batch')
+            dss = decision_support.DetectionMerger(distance_method=args.distance_method, clustering=args.clustering,
+                                                   config_file=args.config)
+            output_file = args.output_file or os.path.join(os.path.curdir, "dss_sweep.jsonl")
+            stats = sweep.run_sweep_file(dss, evaluation.read_frames(args.stream or args.batch), args.sweep,
+                                         output_file, args.workers, args.executor, args.estimates_file,
+                                         source=args.stream or args.batch)
+            print(json.dumps(stats), file=sys.stderr)
+        elif args.stream is not None:
+            # frames are tracked one after another, so the workers merge the zones of each frame instead
+            dss = decision_support.DetectionMerger(verbose=args.verbose, distance_method=args.distance_method,
+                                                   clustering=args.clustering, config_file=args.config,
+                                                   metrics=metrics, executor=executor if args.track else None)
+            tracker = tracking.ObstacleTracker(dss) if args.track else None
+            read_ahead = 2 * max(args.workers, 1)
+            frame_map = route_map.RouteMap() if args.map_file else None
+            if args.stream.endswith(recording.extension):
+                # the frames are read from the memory-mapped recording
+                with streaming.open_stream(args.output_file or '-', 'w') as output_stream:
+                    streaming.run_stream(dss, None, output_stream, None if args.track else executor, read_ahead,
+                                         tracker, frames=recording.Recording(args.stream), frame_map=frame_map,
+                                         sink=sink)
+            else:
+                with streaming.open_stream(args.stream, 'r') as input_stream, \
+                        streaming.open_stream(args.output_file or '-', 'w') as output_stream:
+                    streaming.run_stream(dss, input_stream, output_stream, None if args.track else executor,
+                                         read_ahead, tracker, frame_map=frame_map, sink=sink)
+            if frame_map is not None:
+                frame_map.save(args.map_file)
+        elif args.feeds is not None:
+            dss = decision_support.DetectionMerger(verbose=args.verbose, distance_method=args.distance_method,
+                                                   clustering=args.clustering, config_file=args.config,
+                                                   metrics=metrics, executor=executor)
+            service = sensor_service.SensorService(dss, args.deadline, args.queue_size, args.overflow,
+                                                   tracker=tracking.ObstacleTracker(dss) if args.track else None)
+            with streaming.open_stream(args.output_file or '-', 'w') as output_stream:
+                stats = sensor_service.run_service(service, args.feeds, output_stream, args.follow)
+            print(json.dumps(stats), file=sys.stderr)
+        elif args.batch is not None:
+            dss = decision_support.DetectionMerger(verbose=args.verbose, distance_method=args.distance_method,
+                                                   clustering=args.clustering, config_file=args.config)
+            output_file = args.output_file or os.path.join(os.path.curdir, "dss_results.jsonl")
+            batch.run_batch(dss, args.batch, output_file, args.timing_file, executor=executor,
+                            read_ahead=2 * max(args.workers, 1))
+        else:
+            output_file = args.output_file
+            if output_file is None and sink is None:
+                output_file = os.path.join(os.path.curdir, "dss_results.json")
+            dss = decision_support.DetectionMerger(args.rgb1_path, args.rgb4_path, args.monochrome_path,
+                                                   args.thermal_path, args.swir_path, args.uav_path,
+                                                   args.train_current, args.train_prev, args.verbose, args.show_map,
+                                                   output_file, args.distance_method, executor, args.clustering,
+                                                   args.config, metrics, args.map_file, sink)
+            dss.run()
+        if metrics is not None:
+            metrics.write(args.metrics)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+        if sink is not None:
+            sink.close()
 
 
 if __name__ == '__main__':
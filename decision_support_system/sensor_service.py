@@ -0,0 +1,344 @@
+import asyncio
+import json
+import logging
+import time
+
+import decision_support
+import ingest
+import streaming
+
+logger = logging.getLogger(__name__)
+
+# The sensors of a frame. A frame is merged once all of them have reported or once the deadline has passed since the
+# first report of the frame, with the sensors that have reported until then.
+sensor_cameras = ("RGB1", "RGB4", "Monochrome", "Thermal", "SWIR", "UAV")
+overflow_policies = ("drop_oldest", "block")
+
+# Every feed is a stream of newline-delimited JSON messages. A sensor message is the data of one sensor in the same
+# format as the JSON file of the sensor and is routed to the queue of its camera, so one feed can carry any number of
+# sensors. A position message updates the train's GPS fix that is used for the next merged frames. If it has no
+# train_prev, or the train has not moved, the last different position of the train is used for the heading of the
+# train, so the heading is kept while the train stands still or no new fix arrives. Frames whose reports arrive before
+# the heading of the train is known are dropped:
+#
+#   {"sensorId": "onboard", "camera": "RGB1", "imagesize": {...}, "objects": [...]}
+#   {"train_current": [53.0861622, 8.7816742], "train_prev": [53.086040, 8.781514]}
+
+
+class SensorService(object):
+    """
+    Asyncio ingestion front end of a DetectionMerger.
+
+    The sensors report at different rates and with jitter through any number of feeds, e.g. TCP or Unix socket
+    connections or tailed files. Each report is put into the bounded queue of its sensor. A frame starts with the first
+    report after the previous frame and takes one report from the queue of each sensor. It is merged as soon as all
+    sensors have reported, or when the deadline after its first report has passed with the reports that have arrived
+    until then, so the latency of a frame is bounded by the deadline plus the time of the merge instead of depending on
+    the slowest sensor. When the queue of a sensor is full, either its oldest report is dropped (drop_oldest) or the
+    feed waits until there is space in the queue (block), which pushes the backpressure back to the sensor. The drops,
+    blocked reports, missing sensors and latencies are counted in the stats of the service, as well as the frames that
+    are dropped because the heading of the train is not known yet.
+    """
+
+    def __init__(self, merger, deadline=0.2, queue_size=4, overflow="drop_oldest", cameras=sensor_cameras,
+                 tracker=None, backend=None):
+        """
+        Initializes the service.
+
+        Args:
+        merger (DetectionMerger): The DetectionMerger used to merge the frames.
+        deadline (float): The time in seconds after the first report of a frame after which the frame is merged with
+        the sensors that have reported, or None to always wait for all sensors.
+        queue_size (int): The maximum number of reports waiting in the queue of each sensor.
+        overflow (str): What happens to a report when the queue of its sensor is full, one of overflow_policies.
+        cameras (tuple): The cameras of the sensors that make up a complete frame.
+        tracker (ObstacleTracker): Tracker of the obstacles across frames, which has to use the given merger. If given,
+        the frames are fused into its tracked obstacles instead of merged independently.
+        backend (str): The JSON decoder used to read the messages, see ingest.backends.
+        """
+        if overflow not in overflow_policies:
+            raise ValueError(f"Unknown overflow policy '{overflow}', expected one of {overflow_policies}")
+        self.merger = merger
+        self.deadline = deadline
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.cameras = tuple(cameras)
+        self.tracker = tracker
+        self.backend = backend
+        self.queues = None
+        self.reported = None
+        self.train_current = merger.train_current
+        self.train_prev = merger.train_prev
+        self.frame_id = 0
+        self.stats = {"frames": 0, "complete_frames": 0, "deadline_frames": 0, "no_heading_frames": 0, "reports": 0,
+                      "unknown_messages": 0,
+                      "sensors": {camera: {"reports": 0, "dropped": 0, "blocked": 0, "missing": 0, "max_queued": 0}
+                                  for camera in self.cameras},
+                      "latency": {"max": 0.0, "total": 0.0}}
+
+    def _start(self):
+        # the queues belong to the running event loop
+        if self.queues is None:
+            self.queues = {camera: asyncio.Queue(self.queue_size) for camera in self.cameras}
+            self.reported = asyncio.Event()
+
+    async def put(self, message):
+        """Puts one decoded message, the data of a sensor or a position of the train, into the service."""
+        self._start()
+        if "camera" not in message:
+            if "train_current" in message:
+                self.update_position(message["train_current"], message.get("train_prev"))
+            else:
+                self.stats["unknown_messages"] += 1
+            return
+        queue = self.queues.get(message["camera"])
+        if queue is None:
+            self.stats["unknown_messages"] += 1
+            return
+        stats = self.stats["sensors"][message["camera"]]
+        report = (time.perf_counter(), ingest.sensor_from_dict(message))
+        if queue.full():
+            if self.overflow == "block":
+                stats["blocked"] += 1
+                await queue.put(report)
+            else:
+                queue.get_nowait()
+                stats["dropped"] += 1
+                queue.put_nowait(report)
+        else:
+            queue.put_nowait(report)
+        stats["reports"] += 1
+        stats["max_queued"] = max(stats["max_queued"], queue.qsize())
+        self.stats["reports"] += 1
+        self.reported.set()
+
+    def update_position(self, train_current, train_prev=None):
+        """
+        Updates the train's GPS fix. Without a previous position that differs from the current one, the previous
+        position only moves forward to the last position of the train if the train has moved, so that the heading of
+        the train is kept for fixes of a train that stands still and for frames without a new fix.
+        """
+        train_current = decision_support.parse_coordinates(train_current)
+        train_prev = decision_support.parse_coordinates(train_prev)
+        if train_prev is None or train_prev == train_current:
+            train_prev = self.train_current if train_current != self.train_current else self.train_prev
+        self.train_current = train_current
+        self.train_prev = train_prev
+
+    def has_heading(self):
+        """Returns whether the train's positions give its heading, which is needed to merge a frame."""
+        return self.train_current is not None and self.train_prev is not None and self.train_prev != self.train_current
+
+    async def read_feed(self, reader):
+        """Reads the messages of a feed, an asyncio StreamReader of newline-delimited JSON, until it is closed."""
+        while True:
+            line = await reader.readline()
+            if not line:
+                return
+            line = line.strip()
+            if line:
+                await self.put(ingest.loads(line, self.backend))
+
+    async def tail_file(self, path, follow=False, poll_interval=0.05):
+        """
+        Reads the messages of a file of newline-delimited JSON. If follow is set, new lines appended to the file are
+        read as they are written, like tail -f, otherwise the feed ends at the end of the file.
+        """
+        with open(path, "rb") as f:
+            pending = b""
+            while True:
+                line = f.readline()
+                if not line or not line.endswith(b"\n"):
+                    # an incomplete line is kept until the rest of it is written
+                    pending += line
+                    if not follow:
+                        line, pending = pending, b""
+                        if line.strip():
+                            await self.put(ingest.loads(line, self.backend))
+                        return
+                    await asyncio.sleep(poll_interval)
+                    continue
+                line, pending = (pending + line).strip(), b""
+                if line:
+                    await self.put(ingest.loads(line, self.backend))
+                # let the other feeds and the merging run between the lines of a file that is read at once
+                await asyncio.sleep(0)
+
+    def _take_reports(self, reports):
+        """Takes one report from the queue of each sensor that has not reported in the frame yet."""
+        for camera, queue in self.queues.items():
+            if camera not in reports and not queue.empty():
+                reports[camera] = queue.get_nowait()
+        self.reported.clear()
+        # reports that arrived while the queues were read
+        if any(camera not in reports and not queue.empty() for camera, queue in self.queues.items()):
+            self.reported.set()
+
+    async def collect_frame(self, closed=None):
+        """
+        Waits for the reports of the next frame and returns them by camera, with the time of the first report. The
+        frame is complete once every sensor has reported, or closed once the deadline has passed or the given event is
+        set, i.e. all feeds are closed. Returns None if the feeds were closed before any report of the frame.
+        """
+        self._start()
+        reports = {}
+        first_report = None
+        while len(reports) < len(self.cameras):
+            self._take_reports(reports)
+            if reports and first_report is None:
+                first_report = min(arrival for arrival, _ in reports.values())
+            if len(reports) == len(self.cameras):
+                break
+            if closed is not None and closed.is_set():
+                # no more reports will arrive, the rest of the queues make up the following frames
+                break
+            timeout = None
+            if first_report is not None and self.deadline is not None:
+                timeout = first_report + self.deadline - time.perf_counter()
+                if timeout <= 0:
+                    break
+            waits = [asyncio.ensure_future(self.reported.wait())]
+            if closed is not None:
+                waits.append(asyncio.ensure_future(closed.wait()))
+            done, pending = await asyncio.wait(waits, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            for wait in pending:
+                wait.cancel()
+        if not reports:
+            return None
+        return first_report, reports
+
+    def _count_frame(self, reports, first_report):
+        stats = self.stats
+        stats["frames"] += 1
+        if len(reports) == len(self.cameras):
+            stats["complete_frames"] += 1
+        else:
+            stats["deadline_frames"] += 1
+        missing = [camera for camera in self.cameras if camera not in reports]
+        for camera in missing:
+            stats["sensors"][camera]["missing"] += 1
+        latency = time.perf_counter() - first_report
+        stats["latency"]["max"] = max(stats["latency"]["max"], latency)
+        stats["latency"]["total"] += latency
+        return missing, latency
+
+    def merge_reports(self, reports, train_current, train_prev, frame_id):
+        """Merges the sensor records of one frame with the DetectionMerger or tracker and returns the result record."""
+        sensor_data = [reports[camera][1] for camera in self.cameras if camera in reports]
+        frame = streaming.create_frame(sensor_data, train_current, train_prev, frame_id)
+        if self.tracker is not None:
+            return next(streaming.track_frames(self.tracker, [frame]))
+        return streaming.merge_frame(self.merger, frame)
+
+    async def run(self, feeds, output_stream):
+        """
+        Run
+
+        This function reads the given feeds concurrently and merges their reports frame by frame until all feeds are
+        closed. The merging runs in a worker thread, so that the feeds are read and queued while a frame is merged.
+        Frames collected before the heading of the train is known are dropped, counted and logged.
+        The result record of each frame is written to the output stream as one line of JSON, with the cameras of the
+        sensors that were missing in the frame and the latency from the first report of the frame to its result.
+
+        Args:
+        feeds (list): Coroutines reading the feeds, e.g. read_feed or tail_file of this service.
+        output_stream (file): The stream the result records are written to.
+
+        Returns:
+        dict: The stats of the service.
+        """
+        self._start()
+        loop = asyncio.get_running_loop()
+        closed = asyncio.Event()
+        readers = asyncio.ensure_future(asyncio.gather(*feeds))
+        readers.add_done_callback(lambda _: closed.set())
+        try:
+            while True:
+                collected = await self.collect_frame(closed)
+                if collected is None:
+                    break
+                first_report, reports = collected
+                if not self.has_heading():
+                    # the reports arrived before a fix that gives the heading of the train
+                    self.stats["no_heading_frames"] += 1
+                    logger.warning("Dropped a frame of %d reports, the heading of the train is not known yet",
+                                   len(reports))
+                    continue
+                record = await loop.run_in_executor(None, self.merge_reports, reports, self.train_current,
+                                                    self.train_prev, self.frame_id)
+                self.frame_id += 1
+                record["missing"], record["latency"] = self._count_frame(reports, first_report)
+                output_stream.write(json.dumps(record) + "\n")
+                output_stream.flush()
+        finally:
+            if not readers.done():
+                readers.cancel()
+        # raises the errors of the feeds
+        if not readers.cancelled():
+            readers.result()
+        return self.stats
+
+    async def serve(self, host, port, output_stream):
+        """
+        Serves the feeds of the sensors that connect to the given TCP address, or to the Unix socket at the given path
+        if port is None, and merges their reports until the service is cancelled.
+        """
+        self._start()
+        never_closed = asyncio.get_running_loop().create_future()
+
+        async def handle(reader, writer):
+            try:
+                await self.read_feed(reader)
+            finally:
+                writer.close()
+
+        if port is None:
+            server = await asyncio.start_unix_server(handle, host)
+        else:
+            server = await asyncio.start_server(handle, host, port)
+        async with server:
+            return await self.run([never_closed], output_stream)
+
+    def summary(self):
+        """Returns the stats of the service with the mean latency of the frames."""
+        stats = json.loads(json.dumps(self.stats))
+        stats["latency"]["mean"] = stats["latency"].pop("total") / stats["frames"] if stats["frames"] else 0.0
+        return stats
+
+
+def parse_source(source):
+    """
+    Parses a feed source, tcp://host:port or unix://path for a socket the sensors connect to, or the path of a file.
+    Returns the kind of the source and its address.
+    """
+    if source.startswith("tcp://"):
+        host, _, port = source[len("tcp://"):].rpartition(":")
+        return "tcp", (host or "0.0.0.0", int(port))
+    if source.startswith("unix://"):
+        return "unix", (source[len("unix://"):], None)
+    return "file", source
+
+
+def run_service(service, sources, output_stream, follow=False):
+    """
+    Runs the service on the given sources until the files are read, or until it is interrupted if it serves a socket.
+    Only one socket can be served, but it can be combined with files. Returns the summary of the stats.
+    """
+    async def main():
+        sockets = [address for kind, address in map(parse_source, sources) if kind != "file"]
+        files = [service.tail_file(address, follow) for kind, address in map(parse_source, sources) if kind == "file"]
+        if len(sockets) > 1:
+            raise ValueError("Only one socket can be served")
+        if sockets:
+            # the sensors connected to the socket report until the service is interrupted
+            for feed in files:
+                asyncio.ensure_future(feed)
+            await service.serve(*sockets[0], output_stream)
+        else:
+            await service.run(files, output_stream)
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
+    return service.summary()
@@ -0,0 +1,82 @@
+import math
+from collections import defaultdict
+
+import numpy as np
+
+# the local projection may underestimate geodesic distances by a fraction of a percent, the cells are made slightly
+# larger than the search radius so that no pair within the radius can fall into non-adjacent cells
+cell_margin = 1.05
+
+
+def get_cell_size(radius):
+    """Returns the side of the cells of a grid with the given search radius in meters."""
+    return max(radius, 1e-6) * cell_margin
+
+
+class DetectionGrid(object):
+    """
+    Uniform grid over locally projected GPS coordinates.
+
+    Detections are inserted with an index, a bucket key (e.g. the objectclass) and their estimated GPS coordinates.
+    The coordinates are projected onto the local east-north plane in meters of a geodetic context (e.g. of the train's
+    current position, see GeodeticContext.project) and put into square cells whose side is slightly larger than the
+    search radius. Two detections that are closer than the search radius are then always in the same or in
+    neighbouring cells of the same bucket, so only those cells have to be checked instead of every possible pair.
+    """
+
+    def __init__(self, radius, context):
+        """
+        Initializes an empty grid.
+
+        Args:
+        radius (float): The search radius in meters.
+        context (GeodeticContext): The geodetic context whose local projection is used, e.g. of the train's positions
+        of the frame.
+        """
+        self.cell_size = get_cell_size(radius)
+        self.context = context
+        self.cells = defaultdict(list)
+        self.items = []
+
+    def insert(self, index, key, coordinates):
+        """Adds the item with the given index to the cell of its bucket key that contains its coordinates."""
+        x, y = self.context.project(coordinates).tolist()
+        cell = (key, math.floor(x / self.cell_size), math.floor(y / self.cell_size))
+        self.cells[cell].append(index)
+        self.items.append((index, cell))
+
+    def insert_all(self, keys, coordinates):
+        """
+        Adds the items with the indices 0 to n - 1, with the given bucket keys and coordinates with shape (n, 2),
+        projecting all coordinates at once.
+        """
+        cells = np.floor(self.context.project(coordinates) / self.cell_size).astype(np.int64).tolist()
+        for index, (key, (cell_x, cell_y)) in enumerate(zip(keys, cells)):
+            cell = (key, cell_x, cell_y)
+            self.cells[cell].append(index)
+            self.items.append((index, cell))
+
+    def neighbours(self, cell):
+        """Returns the indices of all items in the given cell and its eight neighbouring cells."""
+        key, cell_x, cell_y = cell
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                found.extend(self.cells.get((key, cell_x + dx, cell_y + dy), ()))
+        return found
+
+    def candidate_pairs(self):
+        """
+        Generates candidate pairs of nearby items.
+
+        Every pair of items in the same bucket whose projected positions are within the search radius is generated
+        exactly once as (i, j) with i < j. The pairs are generated in lexicographic order, which is the same order in
+        which itertools.combinations visits them, but pairs that are clearly too far apart are skipped. Pairs that are
+        slightly further apart than the radius can still be generated, so the caller has to apply its own distance test.
+
+        Yields:
+        tuple: A pair of item indices.
+        """
+        for index, cell in sorted(self.items):
+            for other in sorted(j for j in self.neighbours(cell) if j > index):
+                yield index, other
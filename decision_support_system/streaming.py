@@ -0,0 +1,170 @@
+import copy
+import json
+import sys
+from collections import deque
+from contextlib import contextmanager
+
+import decision_support
+import ingest
+
+# Each frame of a stream is one line of JSON in the following format. The sensors are in the same format as the JSON
+# files of each sensor and are told apart by their camera. Sensors without detections in the frame can be left out.
+# If train_prev is left out, the train_current of the previous frame is used.
+#
+#   {"frame_id": 17, "train_current": [53.0861622, 8.7816742], "train_prev": [53.086040, 8.781514],
+#    "sensors": [{"sensorId": "onboard", "camera": "RGB1", "imagesize": {...}, "objects": [...]}, ...]}
+
+
+def read_frames(stream, backend=None):
+    """
+    Reads frames from a stream of newline-delimited JSON, skipping empty lines. The sensors of each frame are decoded
+    into sensor records with the given or the fastest available JSON decoder, see ingest.decode_frame.
+    """
+    for line in stream:
+        line = line.strip()
+        if line:
+            yield ingest.decode_frame(line, backend)
+
+
+def create_frame(sensor_data, train_current, train_prev=None, frame_id=None):
+    """Creates a frame from the sensor data of all sensors and the train's GPS fixes."""
+    frame = {"frame_id": frame_id, "train_current": decision_support.parse_coordinates(train_current),
+             "sensors": sensor_data}
+    if train_prev is not None:
+        frame["train_prev"] = decision_support.parse_coordinates(train_prev)
+    return frame
+
+
+def merge_frame(merger, frame, sources=False):
+    """
+    Merges the detections of a frame and returns the result record of the frame, with the zone id and cameras of every
+    result under the key sources if sources is set, see DetectionMerger.result_sources.
+    """
+    results = merger.merge_frame(frame["sensors"], frame["train_current"], frame.get("train_prev"))
+    record = {"frame_id": frame.get("frame_id"), "train_current": merger.train_current, "results": results}
+    if sources:
+        record["sources"] = merger.result_sources()
+    return record
+
+
+def merge_frame_copy(merger, frame, sources=False):
+    """Merges a frame with a copy of the merger's configuration, so that frames can be merged concurrently."""
+    return merge_frame(copy.copy(merger), frame, sources)
+
+
+def merge_frames(merger, frames, executor=None, read_ahead=16, sources=False):
+    """
+    Merge frames
+
+    This function merges a sequence of frames and yields the result record of each frame in the order of the frames.
+    If an executor is given, the frames are merged concurrently on its workers, each frame with its own copy of the
+    merger's configuration. At most read_ahead frames are merged ahead of the frame whose result is yielded next, so
+    the frames can come from an endless stream. Since the frames are merged independently, a missing train_prev is
+    filled in from the previous frame before the frame is handed to a worker, and a train_prev that is the same as
+    the frame's train_current with the last different position of the train, which keeps the heading of the train.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is used to merge the frames.
+    frames (iterable): The frames to merge.
+    executor (Executor): Thread or process pool used to merge the frames concurrently.
+    read_ahead (int): The maximum number of frames being merged at the same time.
+    sources (bool): Whether to add the zone id and cameras of every result to the result records, see merge_frame.
+
+    Returns:
+    generator: The result records of the frames.
+    """
+    if executor is None:
+        for frame in frames:
+            yield merge_frame(merger, frame, sources)
+        return
+    pending = deque()
+    # the last position of the train and the position before it, which gives the heading of the train as long as it
+    # does not move, as the copies of the merger do not know the heading of earlier frames
+    position = decision_support.parse_coordinates(merger.train_current)
+    train_prev = decision_support.parse_coordinates(merger.train_prev)
+    for frame in frames:
+        train_current = decision_support.parse_coordinates(frame["train_current"])
+        frame_prev = decision_support.parse_coordinates(frame.get("train_prev"))
+        if train_current != position:
+            train_prev, position = position, train_current
+        if frame_prev is not None and frame_prev != train_current:
+            train_prev = frame_prev
+        else:
+            if train_prev is None:
+                raise ValueError("The previous position of the train is needed to estimate its heading")
+            # the caller's frame is left as it is, as it can be replayed or read again
+            frame = {**frame, "train_prev": train_prev}
+        pending.append(executor.submit(merge_frame_copy, merger, frame, sources))
+        if len(pending) >= read_ahead:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def track_frames(tracker, frames):
+    """
+    Fuses a sequence of frames into the obstacles of a tracking.ObstacleTracker one after another and yields the
+    record of the tracked obstacles after each frame.
+    """
+    for frame in frames:
+        tracks = tracker.merge_frame(frame["sensors"], frame["train_current"], frame.get("train_prev"))
+        yield {"frame_id": frame.get("frame_id"), "train_current": tracker.merger.train_current, "tracks": tracks}
+
+
+def run_stream(merger, input_stream, output_stream, executor=None, read_ahead=16, tracker=None, frames=None,
+               frame_map=None, sink=None):
+    """
+    Run stream
+
+    This function merges the frames read from a stream of newline-delimited JSON one by one, using the same
+    DetectionMerger for all frames. The result record of each frame is written to the output stream as one line of
+    JSON as soon as the frame is merged. If an executor is given, the frames are merged concurrently in batches, see
+    merge_frames. If a tracker is given, the frames are fused into its tracked obstacles instead, and the tracked
+    obstacles are written after each frame, see track_frames. Frames that are already decoded, e.g. the frames of a
+    memory-mapped recording.Recording, can be given instead of the input stream. If a route map is given, the results
+    of every frame are added to it, with the estimated detections of the frame unless the frames are merged
+    concurrently. If a results sink is given, the records of the merged detections of every frame, with their zones and
+    cameras, are appended to it as well, see results_sink.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger used to merge the frames.
+    input_stream (file): The stream the frames are read from, e.g. stdin or a FIFO.
+    output_stream (file): The stream the result records are written to.
+    executor (Executor): Thread or process pool used to merge the frames concurrently.
+    read_ahead (int): The maximum number of frames being merged at the same time.
+    tracker (ObstacleTracker): Tracker of the obstacles across frames, which has to use the given merger.
+    frames (iterable): The frames to merge instead of the frames read from the input stream.
+    frame_map (RouteMap): The route map the frames are added to, see route_map.
+    sink (ResultsSink): The sink the records of the merged detections are appended to; Not supported with a tracker.
+
+    Returns:
+    int: The number of merged frames.
+    """
+    num_frames = 0
+    if frames is None:
+        frames = read_frames(input_stream)
+    if tracker is not None:
+        if sink is not None:
+            raise ValueError("The tracked obstacles cannot be written to a results sink")
+        records = track_frames(tracker, frames)
+    else:
+        records = merge_frames(merger, frames, executor, read_ahead, sink is not None)
+    for record in records:
+        if sink is not None:
+            sink.write_frame(record, record.pop("sources"))
+        if frame_map is not None:
+            frame_map.add_frame(record, merger.detections if executor is None and tracker is None else None)
+        output_stream.write(json.dumps(record) + "\n")
+        output_stream.flush()
+        num_frames += 1
+    return num_frames
+
+
+@contextmanager
+def open_stream(path, mode):
+    """Opens the file or FIFO at the given path, or stdin / stdout if the path is '-'."""
+    if path == "-":
+        yield sys.stdin if "r" in mode else sys.stdout
+    else:
+        with open(path, mode) as f:
+            yield f
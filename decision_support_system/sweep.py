@@ -0,0 +1,380 @@
+"""
+Parameter sweep of the merging stages of the DetectionMerger.
+
+The estimated coordinates, distances and relative bearings of the detections do not depend on the thresholds, zones
+and weights of the merging algorithm, so the detections of every frame or recorded set are estimated once and cached,
+and only the zoning and merging stages are run for every combination of the parameters of a grid, on a pool of
+workers that each receive the cached detections once. The grid is a JSON file with a list of values for each of the
+sweep_parameters that is swept, e.g.
+
+    {"distance_threshold": [5, 10, 20, 30], "angle_threshold": [5, 10, 20],
+     "zone_boundaries": [[0, 50, 100, 150, 200, 250, 400], [0, 100, 200, 400]],
+     "weights": [null, {"RGB1": [100, 80, 60, 40], ...}]}
+
+Zone boundaries or a weights table of null keep those of the merger's configuration. The zone boundaries (and with them
+the zone mapping) and the weights are swept together, leaving out the combinations whose weights do not have one weight
+per zone, which are counted in the stats of run_sweep_file; zone boundaries without any matching weights are an error.
+Every combination is merged over all frames and yields one row of the results table, with the parameters, the number of
+detections and merged results, the time of the merging stages and, if the detections carry their actual coordinates, the
+position error of the merged results (see evaluation).
+"""
+import copy
+import hashlib
+import itertools
+import json
+import os
+import time
+
+import numpy as np
+
+import decision_support
+import detection_table
+import evaluation
+
+# parameters of the DetectionMerger that can be swept, in the order in which they are applied
+sweep_parameters = ("clustering", "distance_threshold", "angle_threshold", "zone_boundaries", "weights")
+
+# the merger and the estimated frames of a worker of the sweep, see _initialize_worker
+_worker_state = {}
+
+
+class EstimatedFrame(object):
+    """The detections of a frame with their estimated coordinates, and their actual coordinates if known."""
+    __slots__ = ("frame_id", "detections", "train_current", "train_prev", "actual")
+
+    def __init__(self, frame_id, detections, train_current, train_prev, actual=None):
+        self.frame_id = frame_id
+        self.detections = detections
+        self.train_current = train_current
+        self.train_prev = train_prev
+        self.actual = actual
+
+
+def estimate_frames(merger, frames):
+    """
+    Estimate frames
+
+    This function runs the estimation stages of the DetectionMerger (estimate_detection_coordinates and
+    prepare_uav_detections) once for every frame and returns the estimated detections of the frames. The UAV
+    distances are calculated with the merger's distance method, so the estimates are only valid for that method.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger used to estimate the detections.
+    frames (iterable): Frames in the format of the frames of a stream, with the sensors as dictionaries.
+
+    Returns:
+    list: The EstimatedFrame of every frame.
+    """
+    estimates = []
+    for frame in frames:
+        records, actual, train_current, train_prev = evaluation.prepare_frame(frame)
+        merger.load_frame(records, train_current, train_prev)
+        merger.estimate_detection_coordinates()
+        merger.prepare_uav_detections()
+        estimates.append(EstimatedFrame(frame.get("frame_id"), merger.detections, merger.train_current,
+                                        merger.train_prev, actual if np.isfinite(actual).any() else None))
+    return estimates
+
+
+def estimates_source(merger, source=None, num_frames=None):
+    """
+    Returns what the estimated frames of a sweep depend on, which is saved with them (see save_estimates): the path
+    of the file or directory the frames are read from, the total size and latest modification time of the files they
+    are read from (see evaluation.source_files) and a digest of the path, size and modification time of every file, so
+    that a set file of a directory that is rewritten in place is noticed as well, the number of frames if known and the
+    distance method of the merger.
+    """
+    description = {"source": None, "size": None, "mtime_ns": None, "digest": None, "frames": num_frames,
+                   "distance_method": merger.distance_method}
+    if source is not None:
+        files = [(os.path.relpath(path, source) if path != source else os.path.basename(path), os.stat(path))
+                 for path in evaluation.source_files(source)]
+        digest = hashlib.sha1(json.dumps([(path, stat.st_size, stat.st_mtime_ns) for path, stat in files]).encode())
+        description.update(source=os.path.abspath(source), size=sum(stat.st_size for _, stat in files),
+                           mtime_ns=max((stat.st_mtime_ns for _, stat in files), default=None),
+                           digest=digest.hexdigest())
+    return description
+
+
+def save_estimates(estimates, path, source=None):
+    """
+    Saves estimated frames to a .npz file, with the columns of the detections of all frames concatenated and the
+    object classes stored by name, so that the detections of a sweep are estimated only once across runs. The
+    description of the frames and distance method they were estimated from (see estimates_source) is saved with them,
+    with the number of frames.
+    """
+    source = dict(source or {}, frames=len(estimates))
+    tables = [estimate.detections for estimate in estimates]
+    classes = tables[0].classes.names if tables else []
+    columns = {name: np.concatenate([getattr(table, name) for table in tables]) if tables
+               else np.zeros(0, dtype=dtype) for name, dtype in detection_table.column_types.items()}
+    actual = [estimate.actual if estimate.actual is not None else np.full((len(estimate.detections), 2), np.nan)
+              for estimate in estimates]
+    np.savez(path, offsets=np.cumsum([0] + [len(table) for table in tables]), classes=np.array(classes, dtype=str),
+             train_current=np.array([estimate.train_current for estimate in estimates], dtype=float).reshape(-1, 2),
+             train_prev=np.array([estimate.train_prev for estimate in estimates], dtype=float).reshape(-1, 2),
+             actual=np.concatenate(actual) if actual else np.zeros((0, 2)),
+             frame_ids=np.array(json.dumps([estimate.frame_id for estimate in estimates])),
+             source=np.array(json.dumps(source)),
+             **{f"column_{name}": values for name, values in columns.items()})
+
+
+def load_estimates(path, source=None):
+    """
+    Loads the estimated frames saved with save_estimates. If the description of their source is given, see
+    estimates_source, a ValueError is raised if the frames were estimated from another source, with another distance
+    method or, if given, another number of frames.
+    """
+    with np.load(path, allow_pickle=False) as data:
+        if source is not None:
+            saved = json.loads(data["source"].item()) if "source" in data else {}
+            mismatched = [name for name, value in source.items()
+                          if (value is not None or name != "frames") and saved.get(name) != value]
+            if mismatched:
+                raise ValueError(f"The estimates in {path} do not match the frames of the sweep, different "
+                                 f"{', '.join(mismatched)}: {[saved.get(name) for name in mismatched]} instead of "
+                                 f"{[source[name] for name in mismatched]}")
+        # the object classes are coded again in the string table of this process
+        class_codes = np.array([detection_table.object_classes.code(name) for name in data["classes"].tolist()],
+                               dtype=np.int32)
+        columns = {name: data[f"column_{name}"] for name in detection_table.column_types}
+        if len(class_codes):
+            columns["objectclass"] = class_codes[columns["objectclass"]]
+        offsets = data["offsets"].tolist()
+        estimates = []
+        for index, frame_id in enumerate(json.loads(data["frame_ids"].item())):
+            start, end = offsets[index], offsets[index + 1]
+            actual = data["actual"][start:end]
+            estimates.append(EstimatedFrame(
+                frame_id,
+                detection_table.DetectionTable(**{name: values[start:end] for name, values in columns.items()}),
+                tuple(data["train_current"][index].tolist()), tuple(data["train_prev"][index].tolist()),
+                actual if np.isfinite(actual).any() else None))
+    return estimates
+
+
+def read_grid(path):
+    """Reads a grid of parameters from a JSON file, see parameter_grid."""
+    return decision_support.read_json(path)
+
+
+def parameter_grid(grid, merger):
+    """
+    Returns every combination of the values of a grid of parameters as dictionaries. Combinations whose weights do
+    not have one weight per zone of their zone boundaries are left out, so that several zone boundaries can be swept
+    together with weights for each of them, see skipped_combinations. A ValueError is raised if none of the weights
+    match the zones of one of the zone boundaries, whose combinations would all be left out.
+
+    Args:
+    grid (dict): The list of values of every swept parameter, one of sweep_parameters, by parameter name.
+    merger (DetectionMerger): The DetectionMerger whose zones and weights are used where the grid has None.
+
+    Returns:
+    list: The parameters of every combination, by parameter name.
+    """
+    unknown = [name for name in grid if name not in sweep_parameters]
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters {unknown}, expected some of {sweep_parameters}")
+    names = [name for name in sweep_parameters if name in grid]
+    combinations = []
+    matched = set()
+    for values in itertools.product(*(grid[name] for name in names)):
+        parameters = dict(zip(names, values))
+        zone_boundaries = parameters.get("zone_boundaries")
+        num_zones = len(merger.zones) if zone_boundaries is None else len(zone_boundaries)
+        weights = parameters.get("weights") or merger.weights
+        if all(len(camera_weights) == num_zones for camera_weights in weights.values()):
+            combinations.append(parameters)
+            matched.add(json.dumps(zone_boundaries))
+    unmatched = [zone_boundaries for zone_boundaries in grid.get("zone_boundaries", ())
+                 if json.dumps(zone_boundaries) not in matched]
+    if unmatched:
+        raise ValueError(f"No weights of the sweep have one weight per zone of the zone boundaries {unmatched}")
+    return combinations
+
+
+def skipped_combinations(grid, combinations):
+    """Returns the number of combinations of a grid that parameter_grid left out, as their weights and zones differ."""
+    return int(np.prod([len(values) for values in grid.values()])) - len(combinations)
+
+
+def apply_parameters(merger, parameters):
+    """
+    Sets the parameters of a combination of a sweep on the merger. New zone boundaries are set together with the
+    weights, which have to match the number of zones; the merger's weights are kept if the weights are None.
+    """
+    for name in ("clustering", "distance_threshold", "angle_threshold"):
+        if name in parameters:
+            setattr(merger, name, parameters[name])
+    if merger.clustering not in decision_support.clustering_strategies:
+        raise ValueError(f"Unknown clustering strategy '{merger.clustering}', "
+                         f"expected one of {decision_support.clustering_strategies}")
+    if parameters.get("zone_boundaries") is not None:
+        merger.set_zone_boundaries(parameters["zone_boundaries"])
+    if parameters.get("zone_boundaries") is not None or parameters.get("weights") is not None:
+        merger.set_weights(parameters.get("weights") or merger.weights)
+    return merger
+
+
+def merge_combination(merger, estimates, index, parameters, keep_results=False, errors=True):
+    """
+    Merge combination
+
+    This function merges all estimated frames with a copy of the merger with the parameters of one combination and
+    returns the row of the combination in the results table. Only the time of the zoning and merging stages is
+    measured; the position errors are collected afterwards.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is the base of the combination.
+    estimates (list): The estimated frames, see estimate_frames.
+    index (int): The index of the combination in the grid.
+    parameters (dict): The parameters of the combination.
+    keep_results (bool): Whether the merged detections of every frame are added to the row.
+    errors (bool): Whether the position errors of the merged detections are collected for frames with actual
+    coordinates.
+
+    Returns:
+    dict: The row of the combination.
+    """
+    merger = apply_parameters(copy.copy(merger), parameters)
+    collector = evaluation.ErrorCollector()
+    elapsed = 0.0
+    detections = results = 0
+    frame_results = []
+    for estimate in estimates:
+        start = time.perf_counter()
+        merged = merger.merge_estimated(estimate.detections, estimate.train_current, estimate.train_prev)
+        elapsed += time.perf_counter() - start
+        detections += len(estimate.detections)
+        results += len(merged)
+        if keep_results:
+            frame_results.append({"frame_id": estimate.frame_id, "results": list(merged)})
+        if errors and estimate.actual is not None:
+            collector.add_results(merger, estimate.actual)
+    row = {"combination": index, **parameters, "frames": len(estimates), "detections": detections,
+           "results": results, "objects": collector.objects, "merge_s": elapsed,
+           "error": evaluation.summarize_errors(collector.after["all"])}
+    if keep_results:
+        row["frame_results"] = frame_results
+    return row
+
+
+def _initialize_worker(merger, estimates, keep_results, errors):
+    _worker_state.update(merger=merger, estimates=estimates, keep_results=keep_results, errors=errors)
+
+
+def _merge_combinations(combinations):
+    return [merge_combination(_worker_state["merger"], _worker_state["estimates"], index, parameters,
+                              _worker_state["keep_results"], _worker_state["errors"])
+            for index, parameters in combinations]
+
+
+def run_sweep(merger, estimates, combinations, workers=0, executor_type="process", keep_results=False, errors=True):
+    """
+    Run sweep
+
+    This function merges the estimated frames with every combination of parameters and yields the rows of the
+    combinations in their order. All combinations are checked before the sweep starts, so that an invalid one, e.g.
+    weights that do not match the zones, does not stop the sweep halfway. With workers, the combinations are merged in
+    chunks on a thread or process pool whose workers receive the merger and the estimated frames once when they are
+    started, instead of with every chunk.
+
+    Args:
+    merger (DetectionMerger): The DetectionMerger whose configuration is the base of every combination.
+    estimates (list): The estimated frames, see estimate_frames.
+    combinations (list): The parameters of every combination, see parameter_grid.
+    workers (int): The number of workers; the combinations are merged one after another if 0.
+    executor_type (str): The type of pool, one of decision_support.executor_types.
+    keep_results (bool): Whether the merged detections of every frame are added to the rows.
+    errors (bool): Whether the position errors of the merged detections are collected, see merge_combination.
+
+    Returns:
+    generator: The rows of the combinations.
+    """
+    for parameters in combinations:
+        apply_parameters(copy.copy(merger), parameters)
+    combinations = list(enumerate(combinations))
+    if workers <= 0:
+        _initialize_worker(merger, estimates, keep_results, errors)
+        try:
+            for combination in combinations:
+                yield from _merge_combinations([combination])
+        finally:
+            _worker_state.clear()
+        return
+    # a few chunks per worker balance the load while keeping the number of tasks small
+    chunk_size = max(1, len(combinations) // (4 * workers))
+    chunks = [combinations[start:start + chunk_size] for start in range(0, len(combinations), chunk_size)]
+    with decision_support.executor_types[executor_type](max_workers=workers, initializer=_initialize_worker,
+                                                        initargs=(merger, estimates, keep_results, errors)) as executor:
+        for rows in executor.map(_merge_combinations, chunks):
+            yield from rows
+
+
+def write_jsonl(rows, path):
+    """Writes the rows of a sweep as one line of JSON per combination and returns the number of rows."""
+    count = 0
+    with open(path, "w") as f:
+        for row in rows:
+            f.write(json.dumps(row) + "\n")
+            count += 1
+    return count
+
+
+def write_parquet(rows, path):
+    """
+    Writes the rows of a sweep into a Parquet file with one row per combination and returns the number of rows. The
+    error summary is flattened into columns error_mean, error_p95 etc., and the zone boundaries, weights and merged
+    results are stored as JSON text. Requires pyarrow.
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Writing Parquet files requires pyarrow, install it with 'pip install pyarrow'")
+    table = []
+    for row in rows:
+        row = dict(row)
+        row.update((f"error_{name}", value) for name, value in row.pop("error").items())
+        for name in ("zone_boundaries", "weights", "frame_results"):
+            if name in row:
+                row[name] = json.dumps(row[name])
+        table.append(row)
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(table), path)
+    return len(table)
+
+
+def run_sweep_file(merger, frames, grid_file, output_file, workers=0, executor_type="process", estimates_file=None,
+                   keep_results=False, source=None):
+    """
+    Runs a sweep of the grid of a JSON file over frames and writes the results table to a JSONL file, or to a Parquet
+    file if the output file ends with .parquet. If an estimates file is given, the estimated frames are loaded from
+    it if it exists and was estimated from the same source file or directory of the frames with the same distance
+    method, or estimated and saved to it otherwise. Returns the number of frames, of combinations and of combinations
+    left out as their weights do not match their zones, the time spent on the estimation and on the sweep, and
+    whether the estimates were loaded or why they were estimated again.
+    """
+    grid = read_grid(grid_file)
+    combinations = parameter_grid(grid, merger)
+    start = time.perf_counter()
+    description = estimates_source(merger, source, len(frames) if hasattr(frames, "__len__") else None)
+    estimates = None
+    stats = {"estimates": "estimated"}
+    if estimates_file is not None and os.path.exists(estimates_file):
+        try:
+            estimates = load_estimates(estimates_file, description)
+            stats["estimates"] = "loaded"
+        except ValueError as error:
+            # stale estimates of other frames or another distance method are estimated again
+            stats["estimates"] = f"estimated again: {error}"
+    if estimates is None:
+        estimates = estimate_frames(copy.copy(merger), frames)
+        if estimates_file is not None:
+            save_estimates(estimates, estimates_file, description)
+    estimate_time = time.perf_counter()
+    rows = run_sweep(merger, estimates, combinations, workers, executor_type, keep_results)
+    write = write_parquet if output_file.endswith(".parquet") else write_jsonl
+    write(rows, output_file)
+    return {"frames": len(estimates), "combinations": len(combinations),
+            "skipped_combinations": skipped_combinations(grid, combinations), "estimate_s": estimate_time - start,
+            "sweep_s": time.perf_counter() - estimate_time, **stats}
@@ -0,0 +1,203 @@
+import json
+import random
+
+import numpy as np
+
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+# cameras of the on-board sensors, with the image size of the recorded sets
+onboard_cameras = ("RGB1", "RGB4", "Monochrome", "Thermal", "SWIR")
+image_size = {"image_height": 1349, "image_width": 2495}
+# the objects are spread evenly over the zones of the default configuration, the last zone reaching up to max_distance
+zone_boundaries = (0, 50, 100, 150, 200, 250, 400)
+max_distance = 500
+train_current = (53.0861622, 8.7816742)
+train_prev = (53.086040, 8.781514)
+
+
+class FrameGenerator(object):
+    """
+    Generator of synthetic frames of all six cameras.
+
+    Every frame contains randomly placed objects around the train, spread evenly over the zones and within the field
+    of view ahead of the train. Each object is detected by one randomly chosen camera, and with the duplicate rate also
+    by one to all of the other cameras, which the DetectionMerger should merge again. The on-board sensors see the
+    objects as bounding boxes and distances in the same schema and image size as the recorded sets, from which the
+    estimation recovers the position of the object, and the UAV sees their GPS coordinates. The detections carry
+    small measurement noise and the actual coordinates of the object.
+    """
+
+    def __init__(self, objects=50, duplicate_rate=0.5, field_of_view=30.0, distance_noise=0.01, angle_noise=0.5,
+                 uav_noise=1.0, seed=0):
+        """
+        Initializes the generator.
+
+        Args:
+        objects (int): The number of objects in each frame.
+        duplicate_rate (float): The fraction of the objects that are detected by more than one camera.
+        field_of_view (float): The maximum angle of the objects to the left and right of the train's heading in degrees.
+        distance_noise (float): The standard deviation of the distances measured by the on-board sensors, relative to
+        the distance.
+        angle_noise (float): The standard deviation of the angles seen by the on-board sensors in degrees.
+        uav_noise (float): The standard deviation of the GPS coordinates estimated by the UAV in meters.
+        seed (int): The seed of the random numbers, frames are reproducible for the same seed.
+        """
+        self.objects = objects
+        self.duplicate_rate = duplicate_rate
+        self.field_of_view = field_of_view
+        self.distance_noise = distance_noise
+        self.angle_noise = angle_noise
+        self.uav_noise = uav_noise
+        self.rng = random.Random(seed)
+
+    def random_distance(self):
+        """Returns the distance of an object in a randomly chosen zone."""
+        zone = self.rng.randrange(len(zone_boundaries))
+        zone_end = zone_boundaries[zone + 1] if zone + 1 < len(zone_boundaries) else max_distance
+        return self.rng.uniform(max(zone_boundaries[zone], 1.0), zone_end)
+
+    def onboard_detection(self, objectclass, distance, angle, actual_coordinates):
+        """Returns the detection of an object seen by an on-board sensor at the given distance and angle."""
+        distance *= 1 + self.rng.gauss(0, self.distance_noise)
+        angle += self.rng.gauss(0, self.angle_noise)
+        # the estimation takes the angle to the object from the center of the bottom edge of its bounding box, relative
+        # to the center of the bottom edge of the image
+        height = self.rng.uniform(20, 200)
+        width = self.rng.uniform(10, 200)
+        y = self.rng.uniform(10, 600)
+        x_center = image_size["image_width"] / 2 + y * np.tan(np.radians(angle))
+        y_max = image_size["image_height"] - y
+        return {"objectclass": objectclass,
+                "x_min": str(round(x_center - width / 2)), "y_min": str(round(y_max - height)),
+                "x_max": str(round(x_center + width / 2)), "y_max": str(round(y_max)),
+                "height": str(round(height, 5)), "width": str(round(width, 5)),
+                "confidence": str(round(self.rng.uniform(0.3, 1.0), 3)), "distance": str(round(distance, 1)),
+                "entering_ROI": True, "moving": self.rng.random() < 0.2,
+                "actual_coordinates": f"({actual_coordinates[0]:.6f}, {actual_coordinates[1]:.6f})"}
+
+    def uav_detection(self, objectclass, actual_coordinates):
+        """Returns the detection of an object seen by the UAV."""
+        angle = self.rng.uniform(0, 360)
+        latitude, longitude = geographic_estimations.calculate_destination_coordinates(
+            actual_coordinates, abs(self.rng.gauss(0, self.uav_noise)), angle)
+        x_min = self.rng.uniform(0, image_size["image_width"] - 200)
+        y_min = self.rng.uniform(0, image_size["image_height"] - 200)
+        width = self.rng.uniform(10, 200)
+        height = self.rng.uniform(10, 200)
+        return {"objectclass": objectclass,
+                "x_min": str(round(x_min, 4)), "y_min": str(round(y_min, 4)),
+                "x_max": str(round(x_min + width, 4)), "y_max": str(round(y_min + height, 4)),
+                "height": str(round(height, 5)), "width": str(round(width, 5)),
+                "confidence": str(round(self.rng.uniform(0.3, 1.0), 3)),
+                "GPS_object": {"latitude": str(latitude), "longitude": str(longitude)},
+                "entering_ROI": True, "moving": False,
+                "actual_coordinates": f"({actual_coordinates[0]:.6f}, {actual_coordinates[1]:.6f})"}
+
+    def generate_world(self, num_objects, length, start=train_current, previous=train_prev, width=60.0):
+        """
+        Generates static objects along the track of a train driving straight ahead.
+
+        Args:
+        num_objects (int): The number of objects.
+        length (float): The length of the track section in meters, starting at the start position.
+        start (tuple): The position of the train at the start of the track section.
+        previous (tuple): A previous position of the train, which gives the direction of the track.
+        width (float): The maximum distance of the objects to the left and right of the track in meters.
+
+        Returns:
+        list: The object class and actual coordinates of every object.
+        """
+        heading = geographic_estimations.calculate_compass_bearing(previous, start)
+        world = []
+        for _ in range(num_objects):
+            objectclass = self.rng.choice(geographic_estimations.categories)
+            along = geographic_estimations.calculate_destination_coordinates(start, self.rng.uniform(0, length),
+                                                                            heading)
+            offset = self.rng.uniform(-width, width)
+            coordinates = geographic_estimations.calculate_destination_coordinates(along, abs(offset),
+                                                                                  heading + (90 if offset > 0 else -90))
+            world.append((objectclass, coordinates))
+        return world
+
+    def visible_objects(self, world, current, heading):
+        """Returns the objects of the world that are within the field of view and max_distance ahead of the train."""
+        visible = []
+        for objectclass, coordinates in world:
+            distance = geographic_estimations.calculate_distance(current, coordinates, "haversine")
+            angle = (geographic_estimations.calculate_compass_bearing(current, coordinates) - heading + 180) % 360 - 180
+            if 1.0 <= distance < max_distance and abs(angle) <= self.field_of_view:
+                visible.append((objectclass, distance, angle, coordinates))
+        return visible
+
+    def detect(self, detections, objectclass, distance, angle, actual_coordinates):
+        """Adds the detections of an object by one randomly chosen camera and, with the duplicate rate, others."""
+        cameras = onboard_cameras + ("UAV",)
+        seen_by = [self.rng.choice(cameras)]
+        if self.rng.random() < self.duplicate_rate:
+            others = [camera for camera in cameras if camera != seen_by[0]]
+            seen_by += self.rng.sample(others, self.rng.randint(1, len(others)))
+        for camera in seen_by:
+            if camera == "UAV":
+                detections[camera].append(self.uav_detection(objectclass, actual_coordinates))
+            else:
+                detections[camera].append(self.onboard_detection(objectclass, distance, angle, actual_coordinates))
+
+    def generate_sensor_data(self, current=train_current, previous=train_prev, world=None):
+        """
+        Generates the sensor data of one frame.
+
+        Args:
+        current (tuple): The current position of the train.
+        previous (tuple): The previous position of the train, which gives the heading of the train.
+        world (list): Static objects (see generate_world) of which the visible ones are detected. If not given, the
+        given number of objects is placed randomly in the field of view.
+
+        Returns:
+        list: The data of the five on-board sensors and the UAV, in the same format as the JSON files of the sensors.
+        """
+        heading = geographic_estimations.calculate_compass_bearing(previous, current)
+        detections = {camera: [] for camera in onboard_cameras + ("UAV",)}
+        if world is None:
+            for _ in range(self.objects):
+                objectclass = self.rng.choice(geographic_estimations.categories)
+                distance = self.random_distance()
+                angle = self.rng.uniform(-self.field_of_view, self.field_of_view)
+                actual_coordinates = geographic_estimations.calculate_destination_coordinates(current, distance,
+                                                                                             heading + angle)
+                self.detect(detections, objectclass, distance, angle, actual_coordinates)
+        else:
+            for objectclass, distance, angle, actual_coordinates in self.visible_objects(world, current, heading):
+                self.detect(detections, objectclass, distance, angle, actual_coordinates)
+        sensor_data = [{"sensorId": "onboard", "camera": camera, "imagesize": dict(image_size),
+                        "objects": detections[camera]} for camera in onboard_cameras]
+        sensor_data.append({"sensorId": "uav", "camera": "UAV",
+                            "GPS_drone": {"latitude": str(current[0]), "longitude": str(current[1])},
+                            "imagesize": dict(image_size), "objects": detections["UAV"]})
+        return sensor_data
+
+    def generate_frames(self, num_frames, speed=20.0, world=None):
+        """
+        Generates frames of a train driving straight ahead.
+
+        Args:
+        num_frames (int): The number of frames.
+        speed (float): The distance the train moves between frames in meters.
+        world (list): Static objects along the track, see generate_sensor_data.
+
+        Returns:
+        generator: The frames, in the format of the frames of a stream, see streaming.
+        """
+        previous, current = train_prev, train_current
+        for frame_id in range(num_frames):
+            yield {"frame_id": frame_id, "train_current": list(current), "train_prev": list(previous),
+                   "sensors": self.generate_sensor_data(current, previous, world)}
+            heading = geographic_estimations.calculate_compass_bearing(previous, current)
+            previous, current = current, geographic_estimations.calculate_destination_coordinates(current, speed,
+                                                                                                  heading)
+
+
+def write_frames(frames, path):
+    """Writes frames to a file as newline-delimited JSON, which can be merged with run_dss.py --stream."""
+    with open(path, "w") as f:
+        for frame in frames:
+            f.write(json.dumps(frame) + "\n")
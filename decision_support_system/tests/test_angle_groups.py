@@ -0,0 +1,89 @@
+"""
+Checks the degenerate cases of DetectionMerger.group_similar_detections_by_angle: in all of them every detection has to
+be in exactly one group, within the range of its key.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import detection_table
+
+
+@pytest.fixture
+def merger():
+    return decision_support.DetectionMerger()
+
+
+def group(merger, bearings, objectclasses=None):
+    objectclasses = [0] * len(bearings) if objectclasses is None else objectclasses
+    table = detection_table.DetectionTable(objectclass=objectclasses, relative_bearing=bearings)
+    similar_detections = {}
+    for index, objectclass in enumerate(objectclasses):
+        similar_detections.setdefault(objectclass, []).append(index)
+    return table, merger.group_similar_detections_by_angle(similar_detections, table)
+
+
+def assert_grouped(table, groups):
+    """Asserts that every detection is in exactly one group and within the range of the group's key."""
+    assert sorted(index for indices in groups.values() for index in indices) == list(range(len(table)))
+    for (start, end), indices in groups.items():
+        for index in indices:
+            assert start <= table.relative_bearing[index] < end
+
+
+def test_same_angle(merger):
+    table, groups = group(merger, [12.5, 12.5, 12.5])
+    assert_grouped(table, groups)
+    assert dict(groups) == {(12.5, 12.5 + merger.angle_threshold): [0, 1, 2]}
+
+
+def test_single_detection(merger):
+    table, groups = group(merger, [-3.0])
+    assert_grouped(table, groups)
+    assert len(groups) == 1
+
+
+def test_max_at_a_multiple_of_the_threshold(merger):
+    threshold = merger.angle_threshold
+    table, groups = group(merger, [0.0, 5.0, threshold, 2 * threshold])
+    assert_grouped(table, groups)
+    # the detection at the maximum angle starts a range of its own instead of being dropped
+    assert groups[(2 * threshold, 3 * threshold)] == [3]
+
+
+def test_range_boundaries(merger):
+    threshold = merger.angle_threshold
+    bearings = [0.1 + i * threshold for i in range(4)]
+    table, groups = group(merger, bearings)
+    assert_grouped(table, groups)
+    # a detection on the edge between two ranges belongs to the range it starts
+    assert len(groups) == len(bearings)
+    assert all(len(indices) == 1 for indices in groups.values())
+
+
+def test_negative_angles(merger):
+    table, groups = group(merger, [-170.0, -150.5, -149.9, -131.0])
+    assert_grouped(table, groups)
+
+
+def test_object_classes_have_ranges_of_their_own(merger):
+    threshold = merger.angle_threshold
+    table, groups = group(merger, [1.0, 30.0, 2.0, 30.0], [0, 0, 1, 1])
+    assert_grouped(table, groups)
+    # the ranges of each object class start at its own minimum angle
+    assert dict(groups) == {(1.0, 1.0 + threshold): [0], (1.0 + threshold, 1.0 + 2 * threshold): [1],
+                            (2.0, 2.0 + threshold): [2], (2.0 + threshold, 2.0 + 2 * threshold): [3]}
+
+
+def test_object_classes_share_equal_ranges(merger):
+    threshold = merger.angle_threshold
+    table, groups = group(merger, [1.0, 30.0, 1.0, 30.0], [0, 0, 1, 1])
+    assert_grouped(table, groups)
+    # the groups are only keyed by their range, so object classes with the same minimum angle share their groups
+    assert dict(groups) == {(1.0, 1.0 + threshold): [0, 2], (1.0 + threshold, 1.0 + 2 * threshold): [1, 3]}
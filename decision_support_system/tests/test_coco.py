@@ -0,0 +1,60 @@
+"""
+Checks the streaming decoder of the arrays of COCO annotation files, geographic_estimations.coco.iter_json_array.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import io
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geographic_estimations.coco as coco
+
+document = {
+    "info": {"description": "test", "version": 1.0, "nested": [[1, 2], {"a": None}]},
+    "images": [{"id": i, "height": 1349, "width": 2495, "file_name": f"image_ä\\{i}.png"} for i in range(5)],
+    "annotations": [{"id": i, "image_id": i % 5, "bbox": [10.5 * i, -2e-3, 1e10, 0], "flag": i % 2 == 0,
+                     "text": "\U0001d11e \"quoted\" \n"} for i in range(40)],
+}
+
+
+class CountingReader(io.StringIO):
+    """Text file that counts the characters read from it."""
+
+    def __init__(self, text):
+        super().__init__(text)
+        self.characters = 0
+
+    def read(self, size=-1):
+        chunk = super().read(size)
+        self.characters += len(chunk)
+        return chunk
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 1 << 16])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_items_match_json(chunk_size, indent):
+    text = json.dumps(document, indent=indent, ensure_ascii=indent is None)
+    for key in ("images", "annotations"):
+        assert list(coco.iter_json_array(io.StringIO(text), key, chunk_size)) == document[key]
+    with pytest.raises(KeyError):
+        list(coco.iter_json_array(io.StringIO(text), "categories", chunk_size))
+
+
+@pytest.mark.parametrize("error", ['{"id": 1,, "x": 2}', '{"id": 1 "x": 2}', '{"id": 1}x', '{"id": tru}',
+                                   '{"id": "a\tb"}'])
+def test_malformed_item_is_reported_where_it_is(error):
+    items = ['{"id": 0}'] * 10 + [error] + ['{"id": 2, "padding": "%s"}' % ("x" * 100)] * 10000
+    text = '{"annotations": [' + ", ".join(items) + ']}'
+    f = CountingReader(text)
+    with pytest.raises(ValueError) as info:
+        list(coco.iter_json_array(f, "annotations", chunk_size=256))
+    position = text.index(error)
+    offset = int(str(info.value).split(" at character ")[1].split(" ")[0])
+    assert position <= offset < position + len(error)
+    # the decoder stops shortly after the malformed item instead of reading the rest of the file
+    assert f.characters <= position + 1024
@@ -0,0 +1,38 @@
+"""
+Checks the single-frame entry point of DetectionMerger on the recorded sensor data of data/set_2.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+
+data_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                              "set_2")
+sensor_files = [os.path.join(data_directory, name) for name in (
+    "On-board_rgb1.json", "On-board_rgb4.json", "On-board_mono.json", "On-board_thermal.json", "On-board_swir.json",
+    "UAV.json")]
+train_current = "53.0861622, 8.7816742"
+train_prev = "53.086040, 8.781514"
+
+
+def test_run(tmp_path):
+    output_file = str(tmp_path / "dss_results.json")
+    merger = decision_support.DetectionMerger(*sensor_files, train_current, train_prev, output_file=output_file)
+    merger.run()
+    assert merger.final_results
+    assert os.path.isfile(output_file)
+
+
+def test_stationary_train_raises(tmp_path):
+    # the heading of a train whose previous position is its current one is unknown in a single frame
+    output_file = str(tmp_path / "dss_results.json")
+    merger = decision_support.DetectionMerger(*sensor_files, train_current, train_current, output_file=output_file)
+    with pytest.raises(ValueError, match="heading of the train"):
+        merger.run()
+    assert not os.path.exists(output_file)
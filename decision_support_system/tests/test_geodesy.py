@@ -0,0 +1,170 @@
+"""
+Checks the array geodesy kernels of geographic_estimations against the scalar functions and the math based reference
+formulas they replaced, on fixed points including coincident and antipodal pairs.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import os
+import sys
+import math
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+train_current = (53.0861622, 8.7816742)
+train_prev = (53.086040, 8.781514)
+im_size = {"image_height": 1349, "image_width": 2495}
+
+# pairs of points: near the train, coincident, nearly and exactly antipodal, across the date line and near the poles
+point_pairs = [
+    (train_current, (53.0866, 8.7822)),
+    (train_current, (53.0990, 8.8010)),
+    (train_current, train_current),
+    ((0.0, 0.0), (0.0, 0.0)),
+    ((0.0, 0.0), (0.0, 180.0)),
+    ((10.0, 20.0), (-10.0, -160.0)),
+    ((0.0, 0.0), (0.5, 179.7)),
+    ((89.9, 0.0), (-89.9, 180.0)),
+    ((-33.9, 151.2), (51.5, -0.1)),
+    ((0.0, 179.9), (0.0, -179.9)),
+]
+starts = np.array([start for start, _ in point_pairs])
+ends = np.array([end for _, end in point_pairs])
+
+
+def reference_compass_bearing(start_point, end_point):
+    start_latitude = math.radians(start_point[0])
+    end_latitude = math.radians(end_point[0])
+    delta_longitude = math.radians(end_point[1] - start_point[1])
+    x = math.sin(delta_longitude) * math.cos(end_latitude)
+    y = math.cos(start_latitude) * math.sin(end_latitude) - (math.sin(start_latitude) * math.cos(end_latitude)
+                                                             * math.cos(delta_longitude))
+    return (math.degrees(math.atan2(x, y)) + 360) % 360
+
+
+def reference_destination_coordinates(starting_point, distance, angle):
+    start_lat = math.radians(starting_point[0])
+    start_long = math.radians(starting_point[1])
+    angle = math.radians(angle)
+    delta = distance / geographic_estimations.earth_radius
+    des_lat = math.asin((math.sin(start_lat) * math.cos(delta)) + (math.cos(start_lat) * math.sin(delta)
+                                                                   * math.cos(angle)))
+    des_long = start_long + math.atan2(math.sin(angle) * math.sin(delta) * math.cos(start_lat),
+                                       math.cos(delta) - math.sin(start_lat) * math.sin(des_lat))
+    return math.degrees(des_lat), math.degrees(des_long)
+
+
+def angle_difference(a, b):
+    return np.abs((np.asarray(a) - np.asarray(b) + 180) % 360 - 180)
+
+
+@pytest.mark.parametrize("method", geographic_estimations.distance_methods)
+def test_distances_match_scalar(method):
+    distances = geographic_estimations.calculate_distances(starts, ends, method, train_current)
+    expected = np.array([geographic_estimations.calculate_distance(start, end, method, train_current)
+                         for start, end in point_pairs])
+    # within a millimeter, or a relative error of 1e-7 for the distances across the globe
+    np.testing.assert_allclose(distances, expected, rtol=1e-7, atol=1e-3)
+
+
+@pytest.mark.parametrize("method", geographic_estimations.distance_methods)
+def test_coincident_points_have_no_distance(method):
+    points = np.array([train_current, (0.0, 0.0), (89.9, 0.0)])
+    np.testing.assert_array_equal(geographic_estimations.calculate_distances(points, points, method), 0.0)
+
+
+def test_antipodal_geodesic_distance():
+    # Vincenty's iteration does not converge for antipodal points, half the meridian of the WGS-84 ellipsoid
+    distances = geographic_estimations.calculate_distances([(0.0, 0.0), (10.0, 20.0)], [(0.0, 180.0), (-10.0, -160.0)])
+    np.testing.assert_allclose(distances, 20003931.4586, atol=1e-3)
+
+
+def test_bearings_match_reference():
+    bearings = geographic_estimations.calculate_compass_bearings(starts, ends)
+    expected = [reference_compass_bearing(start, end) for start, end in point_pairs]
+    assert angle_difference(bearings, expected).max() < 1e-9
+    scalar = [geographic_estimations.calculate_compass_bearing(start, end) for start, end in point_pairs]
+    assert angle_difference(bearings, scalar).max() == 0.0
+    assert np.all((bearings >= 0) & (bearings < 360))
+
+
+def test_coincident_points_bearing():
+    assert geographic_estimations.calculate_compass_bearing(train_current, train_current) == 0.0
+
+
+@pytest.mark.parametrize("start", [train_current, (0.0, 0.0), (89.9, 0.0), (0.0, 179.9)])
+def test_destinations_match_reference(start):
+    distances = np.array([0.0, 20.0, 1500.0, 1e6, math.pi * geographic_estimations.earth_radius])
+    angles = np.array([0.0, 45.0, 90.0, 180.0, 359.5])
+    destinations = geographic_estimations.calculate_destinations(start, distances, angles)
+    expected = np.array([reference_destination_coordinates(start, distance, angle)
+                         for distance, angle in zip(distances.tolist(), angles.tolist())])
+    np.testing.assert_allclose(destinations, expected, rtol=0, atol=1e-9)
+    scalar = [geographic_estimations.calculate_destination_coordinates(start, distance, angle)
+              for distance, angle in zip(distances.tolist(), angles.tolist())]
+    np.testing.assert_array_equal(destinations, scalar)
+
+
+def test_destination_round_trip():
+    # the destination at the distance and bearing of a point is the point itself, with the distance on the sphere the
+    # destinations are calculated on
+    ends_near = ends[:2]
+    distances = geographic_estimations.calculate_distances(train_current, ends_near, "haversine")
+    distances *= geographic_estimations.earth_radius / geographic_estimations.mean_earth_radius
+    bearings = geographic_estimations.calculate_compass_bearings(train_current, ends_near)
+    destinations = geographic_estimations.calculate_destinations(train_current, distances, bearings)
+    np.testing.assert_allclose(destinations, ends_near, rtol=0, atol=1e-6)
+
+
+def test_coordinates_from_image_boxes_match_scalar():
+    rng = np.random.default_rng(0)
+    x_min = rng.integers(0, im_size["image_width"] - 100, 50).astype(float)
+    x_max = x_min + rng.integers(1, 100, 50)
+    y_max = rng.integers(0, im_size["image_height"] - 1, 50).astype(float)
+    distances = rng.uniform(1, 2000, 50)
+    coordinates = geographic_estimations.calculate_coordinates_from_image_boxes(
+        x_min, x_max, y_max, distances, im_size, train_current, train_prev)
+    scalar = [geographic_estimations.calculate_coordinates_from_image_data(
+        {"x_min": x0, "x_max": x1, "y_max": y, "distance": distance}, im_size, train_current, train_prev)
+        for x0, x1, y, distance in zip(x_min.tolist(), x_max.tolist(), y_max.tolist(), distances.tolist())]
+    np.testing.assert_array_equal(coordinates, scalar)
+    heading = reference_compass_bearing(train_prev, train_current)
+    expected = [reference_destination_coordinates(
+        train_current, distance,
+        math.degrees(math.atan((((int(x0) + int(x1)) / 2) - im_size["image_width"] / 2)
+                               / (im_size["image_height"] - int(y)))) + heading)
+        for x0, x1, y, distance in zip(x_min.tolist(), x_max.tolist(), y_max.tolist(), distances.tolist())]
+    np.testing.assert_allclose(coordinates, expected, rtol=0, atol=1e-9)
+
+
+def test_stationary_train_keeps_heading():
+    context = geographic_estimations.GeodeticContext(train_current, train_current, heading=42.0)
+    assert context.heading == 42.0
+    assert not geographic_estimations.GeodeticContext(train_current).has_heading
+    moving = geographic_estimations.GeodeticContext(train_current, train_prev, heading=42.0)
+    assert moving.heading == geographic_estimations.calculate_compass_bearing(train_prev, train_current)
+
+
+@pytest.mark.parametrize("previous", [train_current, None])
+def test_unknown_heading_raises(previous):
+    detection = {"x_min": 1000, "x_max": 1100, "y_max": 900, "distance": 50.0}
+    with pytest.raises(ValueError, match="heading of the train"):
+        geographic_estimations.calculate_coordinates_from_image_data(detection, im_size, train_current, previous)
+    with pytest.raises(ValueError, match="heading of the train"):
+        geographic_estimations.GeodeticContext(train_current, previous).heading
+
+
+def test_detection_on_the_bottom_edge_raises():
+    # a bounding box whose bottom is the bottom of the image has no angle to the camera's axis
+    with pytest.raises(ValueError, match="bottom edge"):
+        geographic_estimations.calculate_coordinates_from_image_boxes(
+            [1000.0, 1200.0], [1100.0, 1300.0], [900.0, im_size["image_height"]], [50.0, 50.0], im_size,
+            train_current, train_prev)
+    with pytest.raises(ValueError, match="bottom edge"):
+        geographic_estimations.get_angle_to_detected_obj(0.0, 0)
+    np.testing.assert_array_equal(geographic_estimations.get_angles_to_detected_objs([-100.0, 0.0, 100.0], 100.0),
+                                  [-45.0, 0.0, 45.0])
@@ -0,0 +1,69 @@
+"""
+Checks the records written by the results sinks and when they reach the file.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import results_sink
+
+record = {"frame_id": 3, "train_current": (53.0861622, 8.7816742),
+          "results": [{"person": (53.0866, 8.7822)}, {"car": (53.0870, 8.7830)}]}
+sources = [(1, ["RGB1", "Thermal"]), (2, ["UAV"])]
+
+
+def test_sink_is_abstract(tmp_path):
+    with pytest.raises(TypeError):
+        results_sink.ResultsSink(str(tmp_path / "results.jsonl"))
+
+
+@pytest.mark.parametrize("extension", [".jsonl", ".arrows"])
+@pytest.mark.parametrize("max_bytes", [None, 200])
+def test_records_are_read_back(tmp_path, extension, max_bytes):
+    if extension == ".arrows":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / ("results" + extension))
+    expected = []
+    with results_sink.open_sink(path, batch_size=3, max_bytes=max_bytes) as sink:
+        for frame_id in range(10):
+            frame = {**record, "frame_id": frame_id}
+            sink.write_frame(frame, sources, timestamp=float(frame_id))
+            expected.extend(results_sink.frame_records(frame, sources, timestamp=float(frame_id)))
+    assert list(results_sink.read_records(path)) == expected
+    assert len(results_sink.sink_files(path)) == (1 if max_bytes is None and extension == ".jsonl"
+                                                  else len(sink.summary()["segments"]))
+
+
+def test_single_records_are_written_when_a_sync_is_due(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    records = results_sink.frame_records(record, sources, timestamp=1.0)
+    with results_sink.open_sink(path, batch_size=1024, fsync_interval=0) as sink:
+        sink.write(records[0])
+        # a sync is always due, so the record is not held back until the batch is full
+        assert list(results_sink.read_records(path)) == records[:1]
+        sink.write(records[1])
+        assert list(results_sink.read_records(path)) == records
+
+
+def test_arrow_stream_is_complete_when_synced(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "results.arrows")
+    synced_sizes = []
+    fsync = os.fsync
+
+    def record_fsync(fd):
+        synced_sizes.append(os.fstat(fd).st_size)
+        fsync(fd)
+
+    monkeypatch.setattr(results_sink.os, "fsync", record_fsync)
+    with results_sink.open_sink(path, batch_size=2, fsync_interval=3600) as sink:
+        sink.write_frame(record, sources, timestamp=1.0)
+    segment, = sink.summary()["segments"]
+    # the end-of-stream marker is written before the file is synced when it is closed
+    assert synced_sizes == [os.path.getsize(segment)]
+    assert len(list(results_sink.read_records(path))) == 2
@@ -0,0 +1,37 @@
+"""
+Checks the merging of a sequence of frames by streaming.merge_frames.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import copy
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import streaming
+import synthetic
+
+
+def stationary_frames():
+    """Returns synthetic frames of a train that stops after its first frame, without train_prev after the first."""
+    frames = list(synthetic.FrameGenerator(objects=5).generate_frames(4))
+    for frame in frames[1:]:
+        frame["train_current"] = frames[0]["train_current"]
+        del frame["train_prev"]
+    return frames
+
+
+def test_concurrent_frames_are_not_modified():
+    frames = stationary_frames()
+    original = copy.deepcopy(frames)
+    merger = decision_support.DetectionMerger(distance_method="equirectangular")
+    with ThreadPoolExecutor(2) as executor:
+        records = list(streaming.merge_frames(merger, frames, executor, read_ahead=2))
+    assert frames == original
+    # the frames are merged the same way one by one, keeping the heading of the first frame
+    sequential = list(streaming.merge_frames(decision_support.DetectionMerger(distance_method="equirectangular"),
+                                             frames))
+    assert records == sequential
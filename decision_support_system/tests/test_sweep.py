@@ -0,0 +1,63 @@
+"""
+Checks the cached estimates and the parameter grid of a sweep over the recorded set of data/set_2.
+
+    python3 -m pytest decision_support_system/tests
+"""
+import json
+import os
+import shutil
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import decision_support
+import evaluation
+import sweep
+
+set_directory = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "data",
+                             "set_2")
+
+
+def run(merger, root, grid, tmp_path):
+    grid_file = str(tmp_path / "grid.json")
+    with open(grid_file, "w") as f:
+        json.dump(grid, f)
+    return sweep.run_sweep_file(merger, evaluation.read_frames(root), grid_file, str(tmp_path / "sweep.jsonl"),
+                                estimates_file=str(tmp_path / "estimates.npz"), source=root)
+
+
+def test_estimates_of_a_rewritten_set_file_are_estimated_again(tmp_path):
+    root = tmp_path / "sets"
+    shutil.copytree(set_directory, root / "set_2")
+    root = str(root)
+    merger = decision_support.DetectionMerger(distance_method="equirectangular")
+    grid = {"distance_threshold": [10, 20]}
+    assert run(merger, root, grid, tmp_path)["estimates"] == "estimated"
+    assert run(merger, root, grid, tmp_path)["estimates"] == "loaded"
+    # a set file rewritten in place changes neither the size nor the modification time of the directory
+    path = os.path.join(root, "set_2", "UAV.json")
+    stat = os.stat(path)
+    with open(path, "r+") as f:
+        text = f.read()
+        f.seek(0)
+        f.write(text)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert run(merger, root, grid, tmp_path)["estimates"].startswith("estimated again")
+    assert run(merger, root, grid, tmp_path)["estimates"] == "loaded"
+
+
+def test_combinations_whose_weights_do_not_match_their_zones_are_counted(tmp_path):
+    merger = decision_support.DetectionMerger(distance_method="equirectangular")
+    weights = {camera: [100, 80, 60, 40] for camera in merger.weights}
+    grid = {"distance_threshold": [10, 20], "zone_boundaries": [None, [0, 100, 200, 400]], "weights": [None, weights]}
+    assert len(sweep.parameter_grid(grid, merger)) == 4
+    stats = run(merger, set_directory, grid, tmp_path)
+    assert (stats["combinations"], stats["skipped_combinations"]) == (4, 4)
+
+
+def test_zone_boundaries_without_matching_weights_raise():
+    merger = decision_support.DetectionMerger()
+    with pytest.raises(ValueError, match=r"\[\[0, 100, 200, 400\]\]"):
+        sweep.parameter_grid({"zone_boundaries": [None, [0, 100, 200, 400]]}, merger)
@@ -0,0 +1,313 @@
+import math
+
+import numpy as np
+
+import detection_table
+import spatial_index
+import geographic_estimations.geographic_estimations as geographic_estimations
+
+
+class Obstacle(object):
+    """An obstacle tracked across frames, with the weighted average of the positions of its detections."""
+    __slots__ = ("id", "objectclass", "latitude", "longitude", "weight", "hits", "missed", "first_frame", "last_frame",
+                 "cell")
+
+    def __init__(self, obstacle_id, objectclass, coordinates, weight, frame):
+        self.id = obstacle_id
+        self.objectclass = objectclass
+        self.latitude, self.longitude = coordinates
+        self.weight = weight
+        self.hits = 1
+        self.missed = 0
+        self.first_frame = frame
+        self.last_frame = frame
+        self.cell = None
+
+    @property
+    def coordinates(self):
+        return self.latitude, self.longitude
+
+    def to_dict(self):
+        """Returns the obstacle as a dictionary, in the format of the tracks of a frame."""
+        return {"id": self.id, "objectclass": detection_table.object_classes[self.objectclass],
+                "coordinates": self.coordinates, "hits": self.hits, "missed": self.missed,
+                "first_frame": self.first_frame, "last_frame": self.last_frame}
+
+
+class ObstacleCache(object):
+    """
+    Persistent cache of the obstacles seen in previous frames.
+
+    The obstacles are kept in a uniform grid over the locally projected GPS coordinates, bucketed by object class (see
+    spatial_index.DetectionGrid), so the cached obstacle a new detection belongs to is found by looking only at the
+    obstacles of the same class in the cell of the detection and its neighbouring cells. The coordinates are projected
+    with the geodetic context of the train's position the grid is anchored at, and the grid is anchored again at the
+    train's current position once the train has moved more than anchor_distance from it, so that the scale error of the
+    local projection stays small on long routes. Cells without obstacles are removed, so the grid does not grow with
+    the length of the route. A detection is associated with
+    the nearest cached obstacle of its class within the radius, and the position of the obstacle is updated with the
+    weighted average of its associated detections. Obstacles are evicted once they have not been detected for more
+    than max_missed frames or are behind the train.
+    """
+
+    def __init__(self, radius=20, max_missed=3, max_weight=10.0, distance_method="geodesic", anchor_distance=1000.0):
+        """
+        Initializes an empty cache.
+
+        Args:
+        radius (float): The maximum distance between a detection and the obstacle it is associated with in meters.
+        max_missed (int): The number of frames an obstacle is kept without being detected.
+        max_weight (float): The maximum accumulated weight of the position of an obstacle, in units of the weight of
+        a detection by the camera with the highest weight. The lower it is, the faster the position follows the new
+        detections of the obstacle.
+        distance_method (str): Method used to calculate distances, one of geographic_estimations.distance_methods.
+        anchor_distance (float): The distance in meters the train can move away from the position the grid is anchored
+        at before the grid is anchored at its current position again.
+        """
+        self.radius = radius
+        self.max_missed = max_missed
+        self.max_weight = max_weight
+        self.distance_method = distance_method
+        self.anchor_distance = anchor_distance
+        self.cell_size = spatial_index.get_cell_size(radius)
+        self.anchor = None  # geodetic context of the train's position the grid is anchored at
+        self.origin = None  # the train's position of the current frame
+        self.cells = {}
+        self.obstacles = {}
+        self.next_id = 0
+        self.frame = -1
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def _cell(self, objectclass, coordinates):
+        x, y = self.anchor.project(coordinates).tolist()
+        return objectclass, math.floor(x / self.cell_size), math.floor(y / self.cell_size)
+
+    def _remove(self, obstacle):
+        """Removes the obstacle from its cell, and the cell if it is empty then."""
+        cell = self.cells[obstacle.cell]
+        cell.discard(obstacle.id)
+        if not cell:
+            del self.cells[obstacle.cell]
+        obstacle.cell = None
+
+    def _place(self, obstacle):
+        """Moves the obstacle into the cell of its current position."""
+        cell = self._cell(obstacle.objectclass, obstacle.coordinates)
+        if cell != obstacle.cell:
+            if obstacle.cell is not None:
+                self._remove(obstacle)
+            self.cells.setdefault(cell, set()).add(obstacle.id)
+            obstacle.cell = cell
+
+    def start_frame(self, context):
+        """
+        Starts a new frame. The grid is anchored at the train's position of the first frame, and again at its current
+        position once it has moved more than anchor_distance away, with the obstacles placed into their new cells.
+
+        Args:
+        context (GeodeticContext): The geodetic context of the train's positions of the frame.
+        """
+        self.origin = context.train_current
+        if self.anchor is None or math.hypot(*context.project(self.anchor.train_current).tolist()) > \
+                self.anchor_distance:
+            self.anchor = context
+            self.cells = {}
+            for obstacle in self.obstacles.values():
+                obstacle.cell = None
+                self._place(obstacle)
+        self.frame += 1
+
+    def candidates(self, objectclass, coordinates):
+        """Returns the ids of the cached obstacles of the given class in the cell of the coordinates and around it."""
+        key, cell_x, cell_y = self._cell(objectclass, coordinates)
+        found = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                found.extend(self.cells.get((key, cell_x + dx, cell_y + dy), ()))
+        return found
+
+    def associate(self, detections, weights):
+        """
+        Associates the detections of the current frame with the cached obstacles.
+
+        Every detection is associated with the nearest obstacle of its class within the radius. The distances of all
+        candidate pairs of detections and obstacles from the grid are calculated at once. The position of each obstacle
+        with associated detections is updated with the weighted average of the detections, blended with its previous
+        position by the accumulated weight of the obstacle.
+
+        Args:
+        detections (DetectionTable): The detections of the frame with their estimated coordinates.
+        weights (numpy.ndarray): The weight of every detection, relative to the weight of the camera with the highest
+        weight.
+
+        Returns:
+        numpy.ndarray: Whether each detection is associated with a cached obstacle.
+        """
+        associated = np.zeros(len(detections), dtype=bool)
+        if not self.obstacles:
+            return associated
+        coordinates = detections.coordinates
+        pair_detections = []
+        pair_obstacles = []
+        for index, objectclass in enumerate(detections.objectclass.tolist()):
+            found = self.candidates(objectclass, coordinates[index])
+            pair_detections.extend([index] * len(found))
+            pair_obstacles.extend(found)
+        if not pair_detections:
+            return associated
+        pair_detections = np.asarray(pair_detections)
+        obstacle_coordinates = np.array([self.obstacles[obstacle_id].coordinates for obstacle_id in pair_obstacles])
+        distances = geographic_estimations.calculate_distances(coordinates[pair_detections], obstacle_coordinates,
+                                                               self.distance_method, self.origin)
+        # the nearest obstacle within the radius of each detection: the first pair of each detection by distance
+        within = np.flatnonzero(distances < self.radius)
+        order = within[np.lexsort((distances[within], pair_detections[within]))]
+        _, first = np.unique(pair_detections[order], return_index=True)
+        updates = {}
+        for pair in order[first].tolist():
+            index = int(pair_detections[pair])
+            associated[index] = True
+            weight = float(weights[index])
+            update = updates.setdefault(pair_obstacles[pair], [0.0, 0.0, 0.0])
+            update[0] += weight
+            update[1] += weight * coordinates[index, 0]
+            update[2] += weight * coordinates[index, 1]
+        for obstacle_id, (weight, latitude, longitude) in updates.items():
+            obstacle = self.obstacles[obstacle_id]
+            if weight > 0:
+                total = obstacle.weight + weight
+                obstacle.latitude = (obstacle.weight * obstacle.latitude + latitude) / total
+                obstacle.longitude = (obstacle.weight * obstacle.longitude + longitude) / total
+                obstacle.weight = min(total, self.max_weight)
+                self._place(obstacle)
+            obstacle.hits += 1
+            obstacle.missed = 0
+            obstacle.last_frame = self.frame
+        return associated
+
+    def add(self, objectclass, coordinates, weight=1.0):
+        """
+        Adds a new obstacle of the given class code at the given coordinates and returns it. The weight of its position
+        is the summed weight of the detections it was merged from, relative to the weight of the camera with the
+        highest weight, up to max_weight.
+        """
+        obstacle = Obstacle(self.next_id, objectclass, coordinates, min(weight, self.max_weight), self.frame)
+        self.next_id += 1
+        self.obstacles[obstacle.id] = obstacle
+        self._place(obstacle)
+        return obstacle
+
+    def evict(self, context):
+        """
+        Ages the obstacles that were not detected in the current frame and evicts the obstacles that have been missed
+        for more than max_missed frames or are behind the train, i.e. more than 90° away from its heading.
+
+        Args:
+        context (GeodeticContext): The geodetic context of the train's current and previous positions.
+
+        Returns:
+        list: The evicted obstacles.
+        """
+        if not self.obstacles:
+            return []
+        obstacles = list(self.obstacles.values())
+        bearings = context.bearings([obstacle.coordinates for obstacle in obstacles])
+        behind = np.abs((bearings - context.heading + 180) % 360 - 180) > 90
+        evicted = []
+        for obstacle, is_behind in zip(obstacles, behind.tolist()):
+            if obstacle.last_frame != self.frame:
+                obstacle.missed += 1
+            if is_behind or obstacle.missed > self.max_missed:
+                del self.obstacles[obstacle.id]
+                self._remove(obstacle)
+                evicted.append(obstacle)
+        return evicted
+
+    def tracks(self):
+        """Returns the cached obstacles as dictionaries, ordered by their id."""
+        return [obstacle.to_dict() for obstacle in sorted(self.obstacles.values(), key=lambda obstacle: obstacle.id)]
+
+
+class ObstacleTracker(object):
+    """
+    Incremental multi-frame fusion of the detections of a DetectionMerger.
+
+    Instead of merging every frame from scratch, the detections of each frame are first associated with the obstacles
+    in the ObstacleCache, which updates the positions of the known obstacles. Only the detections of new obstacles are
+    merged by the merging algorithm of the DetectionMerger, and its final detections are added to the cache as new
+    obstacles. The obstacles keep their id across frames.
+    """
+
+    def __init__(self, merger, **cache_options):
+        """
+        Initializes the tracker.
+
+        Args:
+        merger (DetectionMerger): The DetectionMerger used to estimate and merge the detections of each frame. Its
+        distance threshold and distance method are used for the cache unless given in the cache options.
+        cache_options: Options of the ObstacleCache.
+        """
+        self.merger = merger
+        cache_options.setdefault("radius", merger.distance_threshold)
+        cache_options.setdefault("distance_method", merger.distance_method)
+        self.cache = ObstacleCache(**cache_options)
+
+    def detection_weights(self, detections):
+        """Returns the weight of every detection by its camera and zone, relative to the highest weight."""
+        merger = self.merger
+        highest = np.nanmax(merger.weight_matrix)
+        return merger.get_weights(detections.camera, merger.get_zones(detections.distance)) / highest
+
+    def result_weights(self):
+        """
+        Returns the summed weight of the detections every final detection of the merger was merged from, by their
+        cameras and zone, relative to the highest weight.
+        """
+        merger = self.merger
+        highest = np.nanmax(merger.weight_matrix)
+        return [float(merger.get_weights([detection_table.cameras.code(camera) for camera in cameras], zone_id).sum())
+                / highest for zone_id, cameras in merger.result_sources()]
+
+    def merge_frame(self, sensor_data, train_current, train_prev=None):
+        """
+        Merge frame
+
+        This function fuses the detections of one frame into the tracked obstacles. The coordinates of the detections
+        are estimated by the DetectionMerger, the detections that belong to cached obstacles update those obstacles,
+        and the remaining detections are grouped into zones and merged by the DetectionMerger. Its final detections
+        become new obstacles, with the summed weight of the detections they were merged from. Finally, obstacles that
+        have been missed for too many frames or are behind the train are evicted from the cache.
+
+        Args:
+        sensor_data (list): The sensor data of the frame, see DetectionMerger.merge_frame.
+        train_current (str or tuple): The current position of the train.
+        train_prev (str or tuple): The previous position of the train.
+
+        Returns:
+        list: The tracked obstacles after the frame, see Obstacle.to_dict.
+        """
+        merger = self.merger
+        merger.load_frame(sensor_data, train_current, train_prev)
+        with merger.metrics.stage("estimate"):
+            merger.estimate_detection_coordinates()
+        with merger.metrics.stage("uav"):
+            merger.prepare_uav_detections()
+        self.cache.start_frame(merger.get_context())
+        with merger.metrics.stage("associate"):
+            associated = self.cache.associate(merger.detections, self.detection_weights(merger.detections))
+            merger.detections = merger.detections.take(np.flatnonzero(~associated))
+        with merger.metrics.stage("zoning"):
+            merger.group_detections_into_zones()
+        with merger.metrics.stage("merging"):
+            merger.run_onboard_merging_algorithm()
+        with merger.metrics.stage("cache"):
+            for final_detection, weight in zip(merger.final_results, self.result_weights()):
+                for objectclass, coordinates in final_detection.items():
+                    self.cache.add(detection_table.object_classes.code(objectclass), coordinates, weight)
+            self.cache.evict(merger.get_context())
+        merger.metrics.count({"detections_associated": int(associated.sum()),
+                              "obstacles_added": len(merger.final_results)})
+        merger.metrics.end_frame()
+        return self.cache.tracks()